@@ -6,8 +6,7 @@
 import os
 import codecs
 import sys
-import itertools
-from multiprocessing import Pool, cpu_count
+from multiprocessing import Pool, Queue, cpu_count
 
 # related third party imports
 # none
@@ -25,20 +24,22 @@ def stream_preprocessing(stream_processing_job):
     ----------
     stream_processing_job : dict
         This parameter has to be filled with items associated to the following keys
-        'nodes_to_analyze', 'file_path', 'preprocessing', 'remove_stopwords'
+        'file_path', 'preprocessing', 'remove_stopwords'. The nodes and NLP resources are loaded
+        by init_worker_nlp.
 
     Returns
     -------
-    assets : list
+    asset_count : int
+        number of assets sent to the parent process, see open_asset_stream
     """
-    assets = []
-    nodes_to_analyze = stream_processing_job.get('nodes_to_analyze')
+    start = timeit.default_timer()
     file_path = stream_processing_job.get('file_path')
+    asset_stream = open_asset_stream(file_path)
     preprocessing = stream_processing_job.get('preprocessing')
     remove_stopwords = stream_processing_job.get('remove_stopwords')
-    nlp = NLP(nodes_to_analyze)
-
-    start = timeit.default_timer()
+    nodes_to_analyze, nlp = get_worker_nlp()
+    filtered_out = 0
+    startup = timeit.default_timer() - start
 
     wos_file = codecs.open(file_path, "r", "utf-8")
     skip_header = True
@@ -56,19 +57,24 @@ def stream_preprocessing(stream_processing_job):
         abstract = spl[21]
         keywords = spl[19]
 
+        # records without the words of any synonym cannot match a node and are skipped before tokenization
+        if not nlp.raw_text_filter.matches(title + '\n' + abstract):
+            filtered_out = filtered_out + 1
+            continue
+
+        # every section is analyzed at most once
+        title_analysis = nlp.analyze_section(title)
+        abstract_analysis = nlp.analyze_section(abstract)
+
         if preprocessing == "sentences_with_lemmas":
-            title_sentences = nlp.tokenize_into_sentences(title)
-            abstract_sentences = nlp.tokenize_into_sentences(abstract)
             title_sentences_with_lemmas = []
-            for sentence in title_sentences:
-                lemmatized_sentence = nlp.lemmatize_words(sentence)
+            for lemmatized_sentence in title_analysis.lemmatized_sentences():
                 if remove_stopwords == "Nltk-Stopwords":
                     lemmatized_sentence = nlp.list_based_stopword_removal(lemmatized_sentence)
                 title_sentences_with_lemmas.append(lemmatized_sentence)
 
             abstract_sentences_with_lemmas = []
-            for sentence in abstract_sentences:
-                lemmatized_sentence = nlp.lemmatize_words(sentence)
+            for lemmatized_sentence in abstract_analysis.lemmatized_sentences():
                 if remove_stopwords == "Nltk-Stopwords":
                     lemmatized_sentence = nlp.list_based_stopword_removal(lemmatized_sentence)
                 abstract_sentences_with_lemmas.append(lemmatized_sentence)
@@ -77,11 +83,11 @@ def stream_preprocessing(stream_processing_job):
                                                 abstract_sentences=abstract_sentences_with_lemmas,
                                                 keywords=keywords)
             if asset.matches_any_node():
-                assets.append(asset)
+                asset_stream.append(asset)
 
         elif preprocessing == "word_tokenize":
-            tokenized_title = nlp.tokenize_into_words(title)
-            tokenized_abstract = nlp.tokenize_into_words(abstract)
+            tokenized_title = title_analysis.words()
+            tokenized_abstract = abstract_analysis.words()
             if remove_stopwords == "Nltk-Stopwords":
                 tokenized_title = nlp.list_based_stopword_removal(tokenized_title)
                 tokenized_abstract = nlp.list_based_stopword_removal(tokenized_abstract)
@@ -91,11 +97,11 @@ def stream_preprocessing(stream_processing_job):
                                            tokenized_abstract=tokenized_abstract,
                                            keywords=keywords)
             if asset.matches_any_node():
-                assets.append(asset)
+                asset_stream.append(asset)
 
         elif preprocessing == "pos_tag":
-            pos_tagged_title = nlp.pos_tag_words(title)
-            pos_tagged_abstract = nlp.pos_tag_words(abstract)
+            pos_tagged_title = title_analysis.pos_tagged_words()
+            pos_tagged_abstract = abstract_analysis.pos_tagged_words()
             if remove_stopwords == "Nltk-Stopwords":
                 pos_tagged_title = nlp.list_based_stopword_removal_for_pos_tagged_words(pos_tagged_title)
                 pos_tagged_abstract = nlp.list_based_stopword_removal_for_pos_tagged_words(pos_tagged_abstract)
@@ -105,11 +111,11 @@ def stream_preprocessing(stream_processing_job):
                                        pos_tagged_abstract=pos_tagged_abstract,
                                        keywords=keywords)
             if asset.matches_any_node():
-                assets.append(asset)
+                asset_stream.append(asset)
 
         elif preprocessing == "lemmatize":
-            lemmatized_title = nlp.lemmatize_words(title)
-            lemmatized_abstract = nlp.lemmatize_words(abstract)
+            lemmatized_title = title_analysis.lemmatized_words()
+            lemmatized_abstract = abstract_analysis.lemmatized_words()
             if remove_stopwords == "Nltk-Stopwords":
                 lemmatized_title = nlp.list_based_stopword_removal(lemmatized_title)
                 lemmatized_abstract = nlp.list_based_stopword_removal(lemmatized_abstract)
@@ -119,18 +125,21 @@ def stream_preprocessing(stream_processing_job):
                                         lemmatized_abstract=lemmatized_abstract,
                                         keywords=keywords)
             if asset.matches_any_node():
-                assets.append(asset)
+                asset_stream.append(asset)
 
         else:
             sys.exit("Pipeline should never reach this point!")
     wos_file.close()
+    asset_stream.close()
 
     # Logfile
     stop = timeit.default_timer()
     runtime = stop - start
-    print('Finished: ' + file_path + " with: " + str(len(assets)) + ' Assets  Duration: '
-          + str(runtime))
-    return assets
+    print('Finished: ' + file_path + " with: " + str(asset_stream.count) + ' Assets  Duration: '
+          + str(runtime) + ' (startup: ' + str(startup) + ') ' + str(filtered_out)
+          + ' records filtered out by search expressions. Lemma cache hit rate: '
+          + str(nlp.lemma_cache.hit_rate()))
+    return asset_stream.count
 
 
 class AcademicData:
@@ -139,7 +148,8 @@ class AcademicData:
         self.logfile_path = logfile_path
 
     def preprocess_wos_articles_from_dir(self, data_dir, preprocessing,
-                                         remove_stopwords, nodes_to_analyze):
+                                         remove_stopwords, nodes_to_analyze, lemma_cache_path=None,
+                                         tokenizer=TOKENIZER_NLTK):
         """Method to extract, load and preprocess article metadata provided
         by Web of Science with support for multiprocessing.
 
@@ -156,12 +166,26 @@ class AcademicData:
         nodes_to_analyze: Nodes
             nodes that have to be analyzed
 
+        lemma_cache_path: str
+            file of the lemma cache of the workers. If given, the workers warm-start their lemma cache
+            from the file and their lemmas are merged into it when they exit, so that later runs reuse them.
+
+        tokenizer: str
+            Specifies the tokenizer. Supported strings: 'nltk' (Punkt and Treebank) and 'regex', a faster
+            approximation of the nltk tokenizers. Their agreement and speed are measured by
+            benchmarks/bench_tokenizer.py.
+
         Returns
         -------
-        assets : list(Asset)
+        asset_count : int
+            number of assets written into the nodes
 
         """
         start = timeit.default_timer()
+        stop_words = stream_stop_words(preprocessing, remove_stopwords)
+        if len(stop_words) > 0:
+            # the stopwords are removed from the word ids of the assets by this process
+            remove_stopwords = None
         stream_processing_jobs = []
 
         for root, dirs, files in os.walk(data_dir):
@@ -169,27 +193,31 @@ class AcademicData:
                 file_path = data_dir + name
                 stream_processing_job = {"preprocessing": preprocessing,
                                          "remove_stopwords": remove_stopwords,
-                                         'file_path': file_path,
-                                         'nodes_to_analyze': nodes_to_analyze,
-                                         'stopwords': self.stop_words}
+                                         'file_path': file_path}
                 stream_processing_jobs.append(stream_processing_job)
 
-        p = Pool(processes=cpu_count() - 1)
-        assets = p.map(stream_preprocessing, stream_processing_jobs)
+        # the nodes and NLP resources are loaded once per worker process and reused for all files,
+        # the assets are written into the nodes while the workers preprocess
+        asset_queue = Queue(maxsize=ASSET_QUEUE_SIZE)
+        p = Pool(processes=max(cpu_count() - 1, 1), initializer=init_worker_nlp,
+                 initargs=(nodes_to_analyze, lemma_cache_path, asset_queue, tokenizer))
+        asset_count = stream_assets_into_nodes(p, stream_preprocessing, stream_processing_jobs, asset_queue,
+                                               nodes_to_analyze, stop_words)
         p.close()
         p.join()
-        assets = list(itertools.chain.from_iterable(assets))
+        if lemma_cache_path is not None:
+            merge_worker_lemma_caches(lemma_cache_path)
 
         # Logfile
         stop = timeit.default_timer()
         runtime = stop - start
         event_title = "Load and preprocess Academic Data from Directory"
         event_description = \
-            "Importing " + str(len(assets)) + \
-            " academic assets from directory into assetlist." \
+            "Importing " + str(asset_count) + \
+            " academic assets from directory into nodes." \
             + " Preprocessing = " + str(preprocessing)
         append_logfile(logfile_path=self.logfile_path,
                        event_title=event_title,
                        event_description=event_description,
                        runtime=runtime)
-        return assets
+        return asset_count
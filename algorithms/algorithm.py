@@ -39,7 +39,7 @@ class Algorithm:
         return result[0][0]
 
     def get_documents_from_nodelist(self, node_list, year):
-        """ get a list of words for all assets belonging to each node in the node_list
+        """ get a list of word ids for all assets belonging to each node in the node_list
 
         Parameters
         ----------
@@ -51,16 +51,18 @@ class Algorithm:
 
         Returns
         ----------
-        all_documents : Array of List of Words
+        all_documents : Array of List of Word Ids
+            ids of the vocabulary of the nodes, the vectorizers count them like words
 
         """
         all_documents = []
         for node in node_list:
             if self.cumulative:
-                words = node.get_words_cumulative(year)
+                # the counts of the years before are reused, the vectorizers only count the ids
+                word_ids = node.get_word_id_counts_cumulative(year).elements()
             else:
-                words = node.get_words(year)
-            all_documents.append(words)
+                word_ids = node.get_word_ids(year)
+            all_documents.append(word_ids)
         return all_documents
 
     def calc_document_similarity(self, year, nodelist, document_term_matrix, results):
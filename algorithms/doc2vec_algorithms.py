@@ -3,7 +3,7 @@
 """
 
 # standard library imports
-import collections
+import collections.abc
 
 # related third party imports
 from gensim import models
@@ -12,7 +12,7 @@ from gensim import models
 from algorithms.algorithm import *
 
 
-class Doc2vecIterator(collections.Iterator):
+class Doc2vecIterator(collections.abc.Iterator):
     def __init__(self, nodelist, cumulative, year):
         self.node_index = 0
         self.cumulative = cumulative
@@ -23,10 +23,9 @@ class Doc2vecIterator(collections.Iterator):
 
     @staticmethod
     def get_assets_from_node_cumulative(node, year_cum):
-        for year in node.asset_count:
-            if year <= year_cum:
-                for asset in node.get_assets(year):
-                    yield asset
+        # the assets of the years before are kept in memory by the cumulative view of the nodes
+        for asset in node.get_assets_cumulative(year_cum):
+            yield asset
         return
 
     @staticmethod
@@ -4,11 +4,15 @@ and their associated methods.
 """
 
 # standard library imports
-import collections
+import os
+import collections.abc
+import mmap
+from collections import OrderedDict
 import pickle
-import operator
-import functools as ft
+import struct
+from array import array
 import timeit
+import zlib
 
 # related third party imports
 # None
@@ -39,7 +43,8 @@ class Asset:
 
     def find_nodes(self, nodes):
         """Associate node names to the asset
-        If any synonym of a node is found in the asset, the name of the node is added to the node_names list.
+        If any synonym of a node is found in the asset and the query of the node matches, the name of the node
+        is added to the node_names list.
 
         Parameters
         ----------
@@ -49,52 +54,477 @@ class Asset:
         -------
         None
         """
-        found_node_words = {}
-        for word in self.words_to_analyze():
-            found_nodes = nodes.get_nodes_by_synonym(word)
-            if found_nodes is not None:
-                for node in found_nodes:
-                    if node not in found_node_words:
-                        found_node_words[node] = {}
-                    node_words = found_node_words[node]
-                    if word not in node_words:
-                        node_words[word] = 0
-        # evaluate boolean conditions
-        self.node_names = []
-        for node in found_node_words.keys():
-            if node.node_matches_found_synonyms(found_node_words[node]):
-                self.node_names.append(node.name)
+        self.node_names = nodes.find_node_names(self.words_to_analyze())
+
+
+class Vocabulary:
+    def __init__(self, file_path=None):
+        """Maps the words of the assets to int32 ids and back
+
+        Ids are assigned in order of appearance and never change. The words are appended to the vocabulary
+        file by flush, so the ids of assets written to disk stay valid.
+
+        Parameters
+        ----------
+        file_path : str
+            file of the vocabulary, None keeps the vocabulary in memory only
+        """
+        self.file_path = file_path
+        self.words = []
+        self.ids = {}
+        # number of words written to the vocabulary file
+        self.flushed = 0
+        # size of the vocabulary file as loaded or written by this vocabulary
+        self.file_bytes = 0
+
+    def __len__(self):
+        return len(self.words)
+
+    def word_id(self, word):
+        """Returns the id of a word, unknown words are added to the vocabulary"""
+        word_id = self.ids.get(word)
+        if word_id is None:
+            word_id = len(self.words)
+            self.ids[word] = word_id
+            self.words.append(word)
+        return word_id
+
+    def word_ids(self, words):
+        """Returns the ids of a list of words, unknown words are added to the vocabulary
+
+        Parameters
+        ----------
+        words : list(str)
+
+        Returns
+        -------
+        word_ids : array('i')
+        """
+        ids = self.ids
+        word_ids = array('i')
+        for word in words:
+            word_id = ids.get(word)
+            if word_id is None:
+                word_id = self.word_id(word)
+            word_ids.append(word_id)
+        return word_ids
+
+    def words_of(self, word_ids):
+        """Returns the words of a list of ids
+
+        Parameters
+        ----------
+        word_ids : array('i')
+
+        Returns
+        -------
+        words : list(str)
+        """
+        words = self.words
+        return [words[word_id] for word_id in word_ids]
+
+    def flush(self):
+        """Appends the words added since the last flush to the vocabulary file
+
+        The vocabulary file has to be loaded before, otherwise the ids of the appended words would not
+        match their position in the file.
+        """
+        if self.file_path is None or self.flushed == len(self.words):
+            return
+        if not self.is_synchronized():
+            raise RuntimeError('the vocabulary file ' + self.file_path + ' holds words that were not loaded')
+        with open(self.file_path, 'ab') as fp:
+            pickle.dump(self.words[self.flushed:], fp, pickle.HIGHEST_PROTOCOL)
+            self.file_bytes = fp.tell()
+        self.flushed = len(self.words)
+
+    def is_synchronized(self):
+        """Returns True if the vocabulary file holds the words loaded or flushed by this vocabulary"""
+        return self.file_size() == self.file_bytes
+
+    def file_size(self):
+        """Returns the size of the vocabulary file in bytes"""
+        if self.file_path is None or not os.path.exists(self.file_path):
+            return 0
+        return os.path.getsize(self.file_path)
+
+    def load(self, file_size=None):
+        """Reads the vocabulary file, the words in memory are replaced
+
+        Parameters
+        ----------
+        file_size : int
+            committed size of the vocabulary file, words flushed after the last commit are truncated
+        """
+        self.clear()
+        if self.file_path is None or not os.path.exists(self.file_path):
+            return
+        if file_size is not None and os.path.getsize(self.file_path) > file_size:
+            os.truncate(self.file_path, file_size)
+        with open(self.file_path, 'rb') as fp:
+            try:
+                while True:
+                    for word in pickle.load(fp):
+                        self.word_id(word)
+            except EOFError:
+                pass
+        self.flushed = len(self.words)
+        self.file_bytes = self.file_size()
+
+    def clear(self):
+        """Removes all words, the vocabulary file is left untouched"""
+        self.words = []
+        self.ids = {}
+        self.flushed = 0
+        self.file_bytes = 0
+
+
+class AssetStore:
+    # prefix of the segment files, followed by the year
+    SEGMENT_FILE_PREFIX = 'Assets_'
+    # file of the manifest of the committed segments
+    MANIFEST_FILE_NAME = 'manifest'
+    # version of the format of the segments, stored in the manifest
+    FORMAT_VERSION = 2
+    # every record of a segment is the size of the pickled asset followed by the pickled asset
+    RECORD_HEADER = struct.Struct('<I')
+
+    def __init__(self, directory):
+        """Append-only store of the assets of all nodes with one segment file per year
+
+        Every asset is stored once, regardless of the number of nodes it matches. It is addressed by its
+        year and the byte offset of its record in the segment of the year; the nodes keep these offsets as
+        postings. The records are length-prefixed, so any asset can be read directly from a memory map of
+        the segment, and several processes can read the same segment. The segments are written by an
+        AssetStoreWriter.
+
+        Parameters
+        ----------
+        directory : str
+            directory of the segment files, ending with '/'
+        """
+        self.directory = directory
+
+    def segment_path(self, year):
+        return self.directory + self.SEGMENT_FILE_PREFIX + str(year)
+
+    def read(self, year, offsets):
+        """Reads the assets at the given offsets of the segment of a year
+
+        Parameters
+        ----------
+        year : int
+        offsets : iterable(int)
+            offsets of records, ascending offsets keep the reads sequential
+
+        Returns
+        -------
+        assets : generator(Asset)
+        """
+        header = self.RECORD_HEADER
+        with open(self.segment_path(year), 'rb') as fp, \
+                mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as segment:
+            for offset in offsets:
+                start = offset + header.size
+                yield pickle.loads(segment[start:start + header.unpack_from(segment, offset)[0]])
+
+    def read_manifest(self):
+        """Returns the manifest of the last commit, see write_manifest
+
+        Returns
+        -------
+        manifest : dict
+            None if the store was never committed
+        """
+        file_path = self.directory + self.MANIFEST_FILE_NAME
+        if not os.path.exists(file_path):
+            return None
+        with open(file_path, 'rb') as fp:
+            return pickle.load(fp)
+
+    def write_manifest(self, manifest):
+        """Commits the store by replacing the manifest atomically
+
+        The manifest records the size and checksum of every segment under 'segments'. Data written after
+        these sizes is ignored by readers and truncated by writers, so a crash while writing leaves the store
+        in the state of its last manifest. The other items are kept for the owner of the store.
+
+        Parameters
+        ----------
+        manifest : dict
+        """
+        file_path = self.directory + self.MANIFEST_FILE_NAME
+        with open(file_path + '.tmp', 'wb') as fp:
+            pickle.dump(manifest, fp, pickle.HIGHEST_PROTOCOL)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(file_path + '.tmp', file_path)
+
+    def verify(self, segments, checksums=False):
+        """Checks that the segment files contain the committed data of a manifest
+
+        Parameters
+        ----------
+        segments : dict
+            'size' and 'checksum' of the segment of every year, see write_manifest
+        checksums : bool
+            compare the checksums, this reads the segments. Otherwise only the sizes of the files are compared
+
+        Returns
+        -------
+        errors : list(str)
+        """
+        errors = []
+        for year, segment in segments.items():
+            file_path = self.segment_path(year)
+            if not os.path.exists(file_path) or os.path.getsize(file_path) < segment['size']:
+                errors.append(file_path + ' is missing or shorter than ' + str(segment['size']) + ' bytes')
+            elif checksums:
+                checksum = 0
+                with open(file_path, 'rb') as fp:
+                    remaining = segment['size']
+                    while remaining > 0:
+                        block = fp.read(min(remaining, 1 << 20))
+                        checksum = zlib.crc32(block, checksum)
+                        remaining = remaining - len(block)
+                if checksum != segment['checksum']:
+                    errors.append(file_path + ' does not match the checksum of the manifest')
+        return errors
+
+
+class AssetStoreWriter:
+    # maximum number of open segment files
+    MAX_OPEN_SEGMENTS = 16
+    # size of the pickled assets of a segment that are written at once
+    WRITE_BATCH_SIZE = 1 << 20
+
+    def __init__(self, store, max_open_segments=MAX_OPEN_SEGMENTS, write_batch_size=WRITE_BATCH_SIZE):
+        """Buffered writer of an AssetStore
+
+        The pickled assets are collected per segment and written in large batches. The segment files stay
+        open, the least recently written one is closed if more than max_open_segments are open. Nothing is
+        committed until the owner writes a manifest with the sizes and checksums of the writer, see
+        AssetStore.write_manifest.
+
+        Parameters
+        ----------
+        store : AssetStore
+        max_open_segments : int
+        write_batch_size : int
+            bytes of pickled assets of a segment that are collected before they are written
+        """
+        self.store = store
+        self.max_open_segments = max_open_segments
+        self.write_batch_size = write_batch_size
+        # size of every segment including the pending assets
+        manifest = store.read_manifest()
+        segments = manifest['segments'] if manifest is not None else {}
+        self.sizes = {year: segment['size'] for year, segment in segments.items()}
+        # crc32 of every segment including the pending assets
+        self.checksums = {year: segment['checksum'] for year, segment in segments.items()}
+        # size of every segment file as written by this writer
+        self.written = dict(self.sizes)
+        self.batches = {}
+        self.files = OrderedDict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def append(self, asset):
+        """Appends an asset to the segment of its year
+
+        Parameters
+        ----------
+        asset : Asset
+
+        Returns
+        -------
+        offset : int
+            byte offset of the record of the asset in the segment
+        size : int
+            size of the record in bytes
+        """
+        data = pickle.dumps(asset, pickle.HIGHEST_PROTOCOL)
+        data = self.store.RECORD_HEADER.pack(len(data)) + data
+        year = asset.year
+        offset = self.sizes.get(year, 0)
+        self.sizes[year] = offset + len(data)
+        self.checksums[year] = zlib.crc32(data, self.checksums.get(year, 0))
+        batch = self.batches.get(year)
+        if batch is None:
+            batch = self.batches[year] = bytearray()
+        batch.extend(data)
+        if len(batch) >= self.write_batch_size:
+            self._write(year)
+        return offset, len(data)
+
+    def segments(self):
+        """Returns the size and checksum of every segment including the pending assets, see write_manifest"""
+        return {year: {'size': size, 'checksum': self.checksums[year]} for year, size in self.sizes.items()}
+
+    def _open(self, year):
+        fp = self.files.get(year)
+        if fp is not None:
+            self.files.move_to_end(year)
+            return fp
+        if len(self.files) >= self.max_open_segments:
+            self._close_file(*self.files.popitem(last=False))
+        file_path = self.store.segment_path(year)
+        # data of a crashed writer after the last commit is overwritten
+        written = self.written.get(year, 0)
+        if os.path.exists(file_path) and os.path.getsize(file_path) > written:
+            os.truncate(file_path, written)
+        fp = self.files[year] = open(file_path, 'ab', buffering=0)
+        return fp
+
+    @staticmethod
+    def _close_file(year, fp):
+        os.fsync(fp.fileno())
+        fp.close()
+
+    def _write(self, year):
+        batch = self.batches.pop(year)
+        self._open(year).write(batch)
+        self.written[year] = self.written.get(year, 0) + len(batch)
+
+    def flush(self):
+        """Writes the pending assets of all segments, so they can be read"""
+        for year in list(self.batches):
+            self._write(year)
+
+    def sync(self):
+        """Writes the pending assets of all segments and forces them to disk, e.g. before a commit"""
+        self.flush()
+        for fp in self.files.values():
+            os.fsync(fp.fileno())
+
+    def close(self):
+        """Writes the pending assets and closes the segment files"""
+        self.flush()
+        while self.files:
+            self._close_file(*self.files.popitem(last=False))
 
 
 class AssetWords(Asset):
-    def __init__(self, year, asset):
+    def __init__(self, year, asset, vocabulary):
+        """Words of an asset stored as ids of a vocabulary
+
+        Parameters
+        ----------
+        year : int
+        asset : Asset
+        vocabulary : Vocabulary
+            assigns the ids. It is not pickled with the asset and has to be set after loading
+        """
         Asset.__init__(self, year)
-        self.words = asset.words_to_analyze()
+        self.vocabulary = vocabulary
+        self.word_ids = vocabulary.word_ids(asset.words_to_analyze())
         self.node_names = asset.node_names
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['vocabulary']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.vocabulary = None
+
     def asset_type(self):
         return "AssetWords"
 
     def words_to_analyze(self):
-        return self.words
+        return self.vocabulary.words_of(self.word_ids)
 
+    def find_nodes(self, nodes):
+        """Associate node names to the asset, the word ids are matched with the synonym ids of the nodes
 
-class SentenceLemmatizedAcademicAsset(Asset):
-    def __init__(self, nodes, year, authors, title_sentences, abstract_sentences, keywords):
+        Parameters
+        ----------
+        nodes: Nodes
+            nodes sharing the vocabulary of the asset
+
+        Returns
+        -------
+        None
+        """
+        self.node_names = nodes.find_node_names_by_ids(self.word_ids)
+
+
+class SentenceLemmatizedAsset(Asset):
+    def __init__(self, year, sections):
+        """Base class of assets made of lemmatized sentences
+
+        The tokens of all sentences are stored in one flat list. The sentences are slices of it given by
+        sentence offsets, and the sections (e.g. title and abstract) are ranges of sentences.
+
+        Parameters
+        ----------
+        year : int
+        sections : list(list(list(str)))
+            the sentences of every section
+        """
         Asset.__init__(self, year)
-        self.title_sentences = title_sentences
-        self.abstract_sentences = abstract_sentences
+        self.tokens = []
+        # start of every sentence in tokens, followed by the end of the last sentence
+        self.sentence_offsets = array('i', [0])
+        # first sentence of every section, followed by the number of sentences
+        self.section_offsets = array('i', [0])
+        for sentences in sections:
+            for sentence in sentences:
+                self.tokens.extend(sentence)
+                self.sentence_offsets.append(len(self.tokens))
+            self.section_offsets.append(len(self.sentence_offsets) - 1)
+
+    def sentences(self, first, stop):
+        """Returns the sentences from index first to stop (exclusive) as slices of the tokens"""
+        tokens = self.tokens
+        offsets = self.sentence_offsets
+        return [tokens[offsets[index]:offsets[index + 1]] for index in range(first, stop)]
+
+    def section_sentences(self, section):
+        """Returns the sentences of a section
+
+        Parameters
+        ----------
+        section : int
+            index of the section in the sections given to the constructor
+
+        Returns
+        -------
+        sentences : list(list(str))
+        """
+        return self.sentences(self.section_offsets[section], self.section_offsets[section + 1])
+
+    def sentences_to_analyze(self):
+        return self.sentences(0, len(self.sentence_offsets) - 1)
+
+    def words_to_analyze(self):
+        """Returns the tokens of all sentences, the list must not be modified"""
+        return self.tokens
+
+
+class SentenceLemmatizedAcademicAsset(SentenceLemmatizedAsset):
+    def __init__(self, nodes, year, authors, title_sentences, abstract_sentences, keywords):
+        SentenceLemmatizedAsset.__init__(self, year, [title_sentences, abstract_sentences])
         self.keywords = keywords
         self.authors = authors
         self.find_nodes(nodes)
 
+    @property
+    def title_sentences(self):
+        return self.section_sentences(0)
+
+    @property
+    def abstract_sentences(self):
+        return self.section_sentences(1)
+
     def asset_type(self):
         return "AcademicAsset"
 
-    def words_to_analyze(self):
-        sentences = self.title_sentences + self.abstract_sentences
-        return ft.reduce(operator.add, sentences)
-
 
 class WordTokenizedAcademicAsset(Asset):
     def __init__(self, nodes, year, authors, tokenized_title, tokenized_abstract, keywords):
@@ -147,29 +577,34 @@ class LemmatizedAcademicAsset(Asset):
         return words
 
 
-class SentenceLemmatizedPatentAsset(Asset):
+class SentenceLemmatizedPatentAsset(SentenceLemmatizedAsset):
     def __init__(self, year, nodes, assignees, title_sentences, abstract_sentences,
                  claims_sentences, description_sentences, cpc, ipc):
-        Asset.__init__(self, year)
-        self.title_sentences = title_sentences
-        self.abstract_sentences = abstract_sentences
-        self.claims_sentences = claims_sentences
-        self.description_sentences = description_sentences
+        SentenceLemmatizedAsset.__init__(self, year, [title_sentences, abstract_sentences,
+                                                      claims_sentences, description_sentences])
         self.assignees = assignees
         self.cpc = cpc
         self.ipc = ipc
         self.find_nodes(nodes)
 
-    def asset_type(self):
-        return "PatentAsset"
+    @property
+    def title_sentences(self):
+        return self.section_sentences(0)
 
-    def sentences_to_analyze(self):
-        sentences = self.title_sentences + self.abstract_sentences + \
-                    self.claims_sentences + self.description_sentences
-        return sentences
+    @property
+    def abstract_sentences(self):
+        return self.section_sentences(1)
 
-    def words_to_analyze(self):
-        return ft.reduce(operator.add, self.sentences_to_analyze())
+    @property
+    def claims_sentences(self):
+        return self.section_sentences(2)
+
+    @property
+    def description_sentences(self):
+        return self.section_sentences(3)
+
+    def asset_type(self):
+        return "PatentAsset"
 
 
 class WordTokenizedPatentAsset(Asset):
@@ -270,7 +705,7 @@ def filter_assetlist_by_start_year(assetlist, year):
     return newlist
 
 
-class AssetWordIterator(collections.Iterator):
+class AssetWordIterator(collections.abc.Iterator):
     def __init__(self, assetlist):
         self.index = -1
         self.assetlist = assetlist
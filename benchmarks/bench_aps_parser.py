@@ -0,0 +1,152 @@
+"""Throughput benchmark of the table-driven APS parser.
+
+Compares APSHandler with the previous parser that ran every line through a chain of startswith checks
+(ReferenceAPSHandler below). Both parse the records of a synthetic pftaps bulk, and the benchmark verifies
+that they return identical patent dicts, also with text field projection and patent filter, before it
+reports records/s and MB/s.
+
+Run from the repository root:
+    python -m benchmarks.bench_aps_parser [records]
+
+"""
+
+# standard library imports
+import sys
+import pickle
+import datetime
+import timeit
+
+# related third party imports
+# None
+
+# local application/library specific imports
+from patent_parser.aps_parser import APSHandler
+from patent_parser.parse_options import PatentFilter, DocumentRejected
+from patent_parser.document_splitter import split_aps_records
+from benchmarks.synthetic_bulks import SyntheticPatentGenerator, FORMAT_APS
+
+
+class ReferenceAPSHandler(APSHandler):
+    """The APS parser before the dispatch table, kept as reference"""
+
+    def __init__(self, text_fields=None, patent_filter=None):
+        super().__init__(text_fields, patent_filter)
+        self.paragraph_codes = ['PAR', 'PAC', 'PAL', 'PA1', 'PA2', 'PA3', 'PA4', 'PA5',
+                                'FNT', 'TBL', 'EQU']
+
+    def feed(self, text):
+        lines = text.split('\n')
+        for line in lines:
+            line = line.rstrip()
+            data = ''
+            if ' ' in line:  # data field
+                data = line[3:]
+                if len(data) == 0 or data[0] != ' ':
+                    data = line[1:]
+                data = data.lstrip()
+            else:  # change state
+                if line in self.states:
+                    self.state = line
+                    if line == 'PATN':
+                        self.clear()
+                    elif line in self.text_states and self.patent_filter is not None:
+                        if not self.patent_filter.accepts_classifications(self.internationalClassifications, []):
+                            raise DocumentRejected()
+
+            if line.startswith('WKU'):
+                if self.state == 'PATN':
+                    self.currentPatent['publicationNumber'] = data
+
+            if line.startswith('APN'):
+                if self.state == 'PATN':
+                    self.currentPatent['applicationNumber'] = data
+
+            if line.startswith('APT'):
+                if self.state == 'PATN':
+                    if data.startswith('4'):
+                        self.patentType = "design"
+                    elif data.startswith('6'):
+                        self.patentType = "plant"
+                    else:
+                        self.patentType = 'utility'
+                    self.currentPatent['patentType'] = self.patentType
+                    if self.patent_filter is not None and not self.patent_filter.accepts_patent_type(self.patentType):
+                        raise DocumentRejected()
+
+            if line.startswith('APD'):
+                if self.state == 'PATN':
+                    try:
+                        self.document_date = datetime.datetime.strptime(data, "%Y%m%d").date()
+                    except ValueError:
+                        self.document_date = datetime.date(1337, 1, 1)
+                    self.currentPatent['date'] = self.document_date
+                    if self.patent_filter is not None and not self.patent_filter.accepts_date(self.document_date):
+                        raise DocumentRejected()
+
+            if line.startswith('ISD'):
+                if self.state == 'PATN':
+                    try:
+                        self.document_date = datetime.datetime.strptime(data, "%Y%m%d").date()
+                    except ValueError:
+                        self.document_date = datetime.date(1337, 1, 1)
+                    self.currentPatent['publicationDate'] = self.document_date
+
+            elif line.startswith('TTL'):
+                if self.state == 'PATN':
+                    self.currentPatent['title'] = data
+
+            elif line.startswith('NAM'):
+                if self.state == 'INVT':
+                    tokens = data.split(';')
+                    if len(tokens) > 1:
+                        name = tokens[1].strip() + ' ' + tokens[0].strip()
+                    else:
+                        name = tokens[0].strip()
+                    self.inventors.append(name)
+
+                elif self.states['ASSG'] == 1:
+                    self.assignees.append(data)
+
+            elif line.startswith('ICL'):
+                if self.state == 'CLAS':
+                    self.internationalClassifications.append(data)
+
+            else:
+                is_paragrapf = self.is_paragraph_code(line)
+                if is_paragrapf or line[:4] == '    ':
+                    self.add_paragraph_data(data, is_paragrapf)
+
+
+def parse_records(handler_class, records, text_fields=None, patent_filter=None):
+    patents = []
+    for record in records:
+        handler = handler_class(text_fields, patent_filter)
+        try:
+            handler.feed(record)
+            patents.append(handler.output())
+        except DocumentRejected:
+            patents.append(None)
+    return patents
+
+
+def check_identical(records):
+    settings = [(None, None), (('abstract',), None), (None, PatentFilter()),
+                (('claims',), PatentFilter(date_from=datetime.date(1974, 1, 1)))]
+    for text_fields, patent_filter in settings:
+        reference = parse_records(ReferenceAPSHandler, records, text_fields, patent_filter)
+        patents = parse_records(APSHandler, records, text_fields, patent_filter)
+        if pickle.dumps(reference) != pickle.dumps(patents):
+            raise AssertionError('APSHandler output differs for text_fields=%s' % str(text_fields))
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    name, content = SyntheticPatentGenerator().bulk_member(FORMAT_APS, count, datetime.date(1976, 1, 6))
+    aps_records = [content[start:end].decode('utf-8') for start, end in split_aps_records(content)]
+    check_identical(aps_records)
+    print('identical output for ' + str(len(aps_records)) + ' records')
+    megabytes = len(content) / 1e6
+    for handler_class in (ReferenceAPSHandler, APSHandler):
+        seconds = min(timeit.repeat(lambda: parse_records(handler_class, aps_records), number=1, repeat=3))
+        print('%-20s %10.1f records/s %8.1f MB/s' % (handler_class.__name__, len(aps_records) / seconds,
+                                                     megabytes / seconds))
@@ -0,0 +1,68 @@
+"""Throughput benchmark of the document splitters for USPTO bulk files.
+
+Compares the line-based splitters XMLFileHandler and APSFileHandler with the offset splitters over a
+memory-mapped member (document_splitter) and reports MB/s of decompressed data. Both variants read the
+member from the same zip file and materialize every document as bytes, as needed by the parser.
+
+Run from the repository root:
+    python -m benchmarks.bench_document_splitter
+
+"""
+
+# standard library imports
+import tempfile
+import timeit
+import zipfile
+
+# related third party imports
+# None
+
+# local application/library specific imports
+from patent_parser.uspto_xml_parser import XMLFileHandler
+from patent_parser.aps_parser import APSFileHandler
+from patent_parser.document_splitter import MemberBuffer, split_xml_documents, split_aps_records
+from benchmarks.synthetic_bulks import SyntheticPatentGenerator, FORMAT_XML_V4, FORMAT_APS
+
+
+def line_based_split(zip_path, name, aps):
+    with zipfile.ZipFile(zip_path, 'r') as zfile:
+        if aps:
+            documents = APSFileHandler(zfile.open(name, 'r'))
+        else:
+            documents = XMLFileHandler(zfile.open(name, 'r'))
+        count = 0
+        for document in documents.list_xmls():
+            document.getvalue()
+            count += 1
+    return count
+
+
+def offset_split(zip_path, name, aps):
+    with zipfile.ZipFile(zip_path, 'r') as zfile:
+        with MemberBuffer(zfile, name) as buffer:
+            if aps:
+                document_ranges = split_aps_records(buffer)
+            else:
+                document_ranges = split_xml_documents(buffer)
+            count = 0
+            for start, end in document_ranges:
+                buffer[start:end]
+                count += 1
+    return count
+
+
+def run_benchmark(bulk_format, patents, tmp_dir):
+    zip_path, member_size = SyntheticPatentGenerator().write_bulk(tmp_dir, bulk_format, patents)
+    with zipfile.ZipFile(zip_path, 'r') as zfile:
+        name = zfile.namelist()[0]
+    megabytes = member_size / 1e6
+    for splitter in (line_based_split, offset_split):
+        seconds = min(timeit.repeat(lambda: splitter(zip_path, name, bulk_format == FORMAT_APS), number=1,
+                                    repeat=3))
+        print('%-26s %-18s %10.1f MB %10.1f MB/s' % (name, splitter.__name__, megabytes, megabytes / seconds))
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        run_benchmark(FORMAT_XML_V4, 5000, tmp)
+        run_benchmark(FORMAT_APS, 5000, tmp)
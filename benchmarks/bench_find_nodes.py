@@ -0,0 +1,118 @@
+"""Throughput benchmark of Asset.find_nodes with many complex node queries.
+
+Compares the bitset matcher of Nodes (Asset.find_nodes) with the previous per node evaluation of the found
+synonyms (reference_find_nodes below), both with queries compiled once (Node) and with queries compiled
+with eval on every evaluation (ReferenceNode below). Hundreds of queries in the style of the 'Affective
+computing' example are evaluated on synthetic assets, the benchmark verifies that all variants find the
+same nodes in the same order before it reports assets/s.
+
+Requires the nltk data package 'punkt'.
+
+Run from the repository root:
+    python -m benchmarks.bench_find_nodes [queries] [assets]
+
+"""
+
+# standard library imports
+import sys
+import random
+import tempfile
+import timeit
+
+# related third party imports
+# None
+
+# local application/library specific imports
+from nodes import *
+from benchmarks.synthetic_bulks import WORDS
+
+TERMS = ('emotions', 'human affects', 'affective', 'computing', 'artificial intelligence', 'machine learning',
+         'neural network', 'neural net', 'learning', 'training', 'robot', 'robots', 'robotic', 'autonomous',
+         'anomaly', 'anomalies', 'detecting', 'detect', 'cloud', 'blockchain', 'augmented reality', 'quantum',
+         'encryption', 'wireless', 'sensor', 'battery', 'semiconductor', 'laser', 'image', 'vehicle')
+
+
+class ReferenceNode(Node):
+    """Node that compiles its query on every evaluation, kept as reference"""
+
+    def node_matches_found_synonyms(self, words):
+        exp_as_func = eval('lambda words: ' + self.expression)
+        return exp_as_func(words)
+
+
+class WordListAsset(Asset):
+    def __init__(self, year, words):
+        Asset.__init__(self, year)
+        self.words = words
+
+    def words_to_analyze(self):
+        return self.words
+
+
+def random_query(rng):
+    """Returns a query like '("emotions" OR "affective") AND ("computing" OR "Artificial Intelligence")'"""
+    def alternatives():
+        return '(' + ' OR '.join('"' + term + '"' for term in rng.sample(TERMS, rng.randint(2, 4))) + ')'
+    query = alternatives() + ' AND ' + alternatives()
+    if rng.random() < 0.3:
+        query = query + ' AND NOT "' + rng.choice(TERMS) + '"'
+    if rng.random() < 0.5:
+        query = '"' + ' '.join(rng.sample(TERMS, 2)) + '" OR (' + query + ')'
+    return query
+
+
+def create_nodes(node_class, queries, asset_dir):
+    nodes = Nodes(asset_dir)
+    for number, query in enumerate(queries):
+        nodes.add_node(node_class('Node %d' % number, query))
+    return nodes
+
+
+def reference_find_nodes(asset, nodes):
+    """Asset.find_nodes before the bitset matcher: the found synonyms are collected per node"""
+    found_node_words = {}
+    for word in asset.words_to_analyze():
+        found_nodes = nodes.get_nodes_by_synonym(word)
+        if found_nodes is not None:
+            for node in found_nodes:
+                if node not in found_node_words:
+                    found_node_words[node] = {}
+                node_words = found_node_words[node]
+                if word not in node_words:
+                    node_words[word] = 0
+    asset.node_names = []
+    for node in found_node_words.keys():
+        if node.node_matches_found_synonyms(found_node_words[node]):
+            asset.node_names.append(node.name)
+
+
+def find_nodes(assets, nodes, find_nodes_function):
+    for asset in assets:
+        find_nodes_function(asset, nodes)
+    return [asset.node_names for asset in assets]
+
+
+if __name__ == '__main__':
+    query_count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    asset_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    rng = random.Random(0)
+    queries = [random_query(rng) for _ in range(query_count)]
+    synonym_keys = [synonym_key(term) for term in TERMS]
+    assets = [WordListAsset(2000, [rng.choice(WORDS) for _ in range(200)] + rng.sample(synonym_keys, 3))
+              for _ in range(asset_count)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        reference_nodes = create_nodes(ReferenceNode, queries, tmp + '/')
+        compiled_nodes = create_nodes(Node, queries, tmp + '/')
+    variants = (('eval per evaluation', reference_nodes, reference_find_nodes),
+                ('compiled once', compiled_nodes, reference_find_nodes),
+                ('bitset matcher', compiled_nodes, Asset.find_nodes))
+    reference = find_nodes(assets, reference_nodes, reference_find_nodes)
+    for name, nodes, find_nodes_function in variants[1:]:
+        if find_nodes(assets, nodes, find_nodes_function) != reference:
+            raise AssertionError(name + ' finds other nodes')
+    print('identical nodes for %d assets and %d queries, %.1f nodes per asset'
+          % (asset_count, query_count, sum(len(node_names) for node_names in reference) / asset_count))
+    for name, nodes, find_nodes_function in variants:
+        seconds = min(timeit.repeat(lambda: find_nodes(assets, nodes, find_nodes_function), number=1, repeat=3))
+        print('%-20s %10.1f assets/s' % (name, asset_count / seconds))
@@ -0,0 +1,113 @@
+"""Benchmark suite of the USPTO bulk parser on synthetic bulks.
+
+Writes synthetic bulks in all three formats (see synthetic_bulks) and measures the decoding of
+
+    job     _run_decoding_job on a single bulk in the calling process
+    zip     PatentExtractor.decode_patent_zip on a single bulk with the given number of processes
+    folder  PatentExtractor.decode_patent_folder on a folder with bulks of all formats
+
+Every case runs in a fresh process and reports patents/s, MB/s of decompressed bulk data and the peak
+resident set size of the decoding process and of its worker processes.
+
+Run from the repository root:
+    python -m benchmarks.bench_parser [patents per bulk] [processes]
+
+"""
+
+# standard library imports
+import os
+import sys
+import shutil
+import resource
+import tempfile
+import multiprocessing
+from time import time
+
+# related third party imports
+# None
+
+# local application/library specific imports
+from patent_parser.uspto_xml_parser import PatentExtractor, _run_decoding_job
+from benchmarks.synthetic_bulks import write_bulks, BULK_FORMATS
+
+
+def _measure(target, args, connection):
+    """Runs a benchmark case in a child process and sends its timing and peak memory to the parent"""
+    sys.stdout = open(os.devnull, 'w')
+    start = time()
+    try:
+        target(*args)
+        error = None
+    except Exception as e:
+        error = repr(e)
+    seconds = time() - start
+    # ru_maxrss is reported in kilobytes on Linux
+    connection.send({'seconds': seconds, 'error': error,
+                     'rss_self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                     'rss_workers': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024})
+    connection.close()
+
+
+def measure(target, *args):
+    """Runs target(*args) in a fresh process
+
+    Returns
+    -------
+    measurement : dict
+        'seconds', 'error', 'rss_self' and 'rss_workers' (peak resident set sizes in MB)
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_measure, args=(target, args, sender))
+    process.start()
+    measurement = receiver.recv()
+    process.join()
+    return measurement
+
+
+def decode_job(zip_path, file_out):
+    _run_decoding_job({'zip_file': zip_path, 'file_out': file_out})
+
+
+def decode_zip(zip_path, file_out, processes):
+    PatentExtractor().decode_patent_zip(zip_path, file_out, processes)
+
+
+def decode_folder(folder_in, folder_out):
+    PatentExtractor().decode_patent_folder(folder_in, folder_out)
+
+
+def report(case, bulk_format, patents, megabytes, measurement):
+    if measurement['error'] is not None:
+        print('%-7s %-9s failed: %s' % (case, bulk_format, measurement['error']))
+        return
+    seconds = measurement['seconds']
+    print('%-7s %-9s %9d %9.1f %9.2f %11.1f %9.2f %12.1f %12.1f'
+          % (case, bulk_format, patents, megabytes, seconds, patents / seconds, megabytes / seconds,
+             measurement['rss_self'], measurement['rss_workers']))
+
+
+def run_benchmarks(patents_per_bulk, processes, tmp_dir):
+    folder_in = os.path.join(tmp_dir, 'bulks')
+    bulks = write_bulks(folder_in, patents_per_bulk)
+    print('%-7s %-9s %9s %9s %9s %11s %9s %12s %12s' % ('case', 'format', 'patents', 'MB', 'seconds', 'patents/s',
+                                                        'MB/s', 'peak RSS MB', 'workers MB'))
+    for bulk_format, zip_path, member_size in bulks:
+        file_out = os.path.join(tmp_dir, 'job_' + bulk_format)
+        report('job', bulk_format, patents_per_bulk, member_size / 1e6, measure(decode_job, zip_path, file_out))
+    for bulk_format, zip_path, member_size in bulks:
+        file_out = os.path.join(tmp_dir, 'zip_' + bulk_format)
+        report('zip', bulk_format, patents_per_bulk, member_size / 1e6,
+               measure(decode_zip, zip_path, file_out, processes))
+    folder_out = os.path.join(tmp_dir, 'parsed')
+    report('folder', 'all', patents_per_bulk * len(bulks), sum(bulk[2] for bulk in bulks) / 1e6,
+           measure(decode_folder, folder_in, folder_out))
+    shutil.rmtree(folder_out, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    patents = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    pool_processes = int(sys.argv[2]) if len(sys.argv) > 2 else max(multiprocessing.cpu_count() - 1, 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        print(', '.join(BULK_FORMATS) + ': ' + str(patents) + ' patents per bulk, '
+              + str(pool_processes) + ' processes for decode_patent_zip')
+        run_benchmarks(patents, pool_processes, tmp)
@@ -0,0 +1,48 @@
+"""Micro-benchmark of the text accumulation in the patent handlers.
+
+Parses a synthetic patent with a growing number of description paragraphs and reports the parse time per
+paragraph. With linear-time accumulation the time per paragraph stays constant when the patent grows.
+
+Run from the repository root:
+    python -m benchmarks.bench_text_accumulation
+
+"""
+
+# standard library imports
+import timeit
+
+# related third party imports
+from lxml import etree
+
+# local application/library specific imports
+from patent_parser.xml_handler_V4 import SimpleXMLHandler
+from patent_parser.xml_handler_V2_5 import SimpleXMLHandlerV25
+from patent_parser.aps_parser import APSHandler
+from benchmarks.synthetic_bulks import SyntheticPatentGenerator
+
+
+def time_xml_handler(handler_class, document, repeat=3):
+    def parse():
+        parser = etree.XMLParser(target=handler_class(), resolve_entities=False, load_dtd=False, recover=True)
+        etree.fromstring(document, parser)
+    return min(timeit.repeat(parse, number=1, repeat=repeat))
+
+
+def time_aps_handler(document, repeat=3):
+    def parse():
+        handler = APSHandler()
+        handler.feed(document)
+        handler.output()
+    return min(timeit.repeat(parse, number=1, repeat=repeat))
+
+
+if __name__ == '__main__':
+    print('%-8s %12s %12s %18s' % ('format', 'paragraphs', 'seconds', 'us per paragraph'))
+    for paragraphs in (1000, 4000, 16000, 64000):
+        generator = SyntheticPatentGenerator(description_paragraphs=paragraphs, paragraph_words=16,
+                                             claims=paragraphs // 10 + 1, claim_words=16)
+        timings = [('v4', time_xml_handler(SimpleXMLHandler, generator.v4_document(0))),
+                   ('v2.5', time_xml_handler(SimpleXMLHandlerV25, generator.v25_document(0))),
+                   ('aps', time_aps_handler(generator.aps_record(0)))]
+        for name, seconds in timings:
+            print('%-8s %12d %12.4f %18.2f' % (name, paragraphs, seconds, seconds / paragraphs * 1e6))
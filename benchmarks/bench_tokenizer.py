@@ -0,0 +1,103 @@
+"""Agreement and speed of the regex tokenizer compared with the nltk tokenizers.
+
+Splits the text sections of a sample corpus into sentences and words with both tokenizers of NLP
+('nltk': Punkt and Treebank, 'regex': RegexTokenizer) and reports the token-level agreement (precision
+and recall of the regex tokens against the nltk tokens, share of identically tokenized sections) and the
+speedup of the regex tokenizer. The sample corpus is a parsed patent file given on the command line, or
+synthetic patents mixed with sentences in the style of real patents.
+
+Requires the nltk data package 'punkt'.
+
+Run from the repository root:
+    python -m benchmarks.bench_tokenizer [parsed patent file] [sections]
+
+"""
+
+# standard library imports
+import sys
+import timeit
+import tempfile
+import itertools
+import collections
+
+# related third party imports
+# None
+
+# local application/library specific imports
+from preprocessing_methods import *
+from patent_data_acquisition import read_patents
+from benchmarks.synthetic_bulks import SyntheticPatentGenerator
+
+# sentences with the punctuation, abbreviations, numbers and quotes of real patents and articles
+SAMPLE_SENTENCES = ('As shown in FIG. 3, the controller 12 receives a signal (e.g., a voltage of 3.5 V) '
+                    'from the sensor.',
+                    'See U.S. Pat. No. 5,123,456 to Smith et al., which is incorporated herein by reference.',
+                    'The "neural network" is trained on 1,000 images; the error rate doesn\'t exceed 2%.',
+                    'A system comprising: a processor; and a memory storing instructions that, when executed, '
+                    'cause the processor to determine a state-of-charge of the battery.',
+                    "The robot's gripper can't grasp objects heavier than 5 kg, i.e. the payload is limited.",
+                    'Methods and apparatus for wireless transmission are disclosed herein.',
+                    'What is claimed is: 1. A method for encrypting data, the method comprising the steps of...',
+                    'The user (Mr. O\'Neill) cannot access the cloud computing resources!',
+                    'Results were compared with those of Dr. Tanaka [12] and Zhang et al. [13].',
+                    'Is the quantum-dot layer thicker than 10 nm? Measurements show it is not.')
+
+
+def sample_corpus(file_path=None, sections=2000):
+    """Returns the text sections of the sample corpus"""
+    if file_path is not None:
+        texts = []
+        for patent in read_patents(file_path):
+            texts.extend(patent.get(field) for field in ('title', 'abstract', 'claims', 'description')
+                         if patent.get(field))
+            if len(texts) >= sections:
+                break
+        return texts[:sections]
+    generator = SyntheticPatentGenerator(description_paragraphs=2, paragraph_words=60)
+    sample_sentences = itertools.cycle(SAMPLE_SENTENCES)
+    texts = []
+    for index in itertools.count():
+        fields = generator.patent_fields(index)
+        for text in (fields['title'], fields['abstract']) + tuple(fields['description']):
+            texts.append(text + ' ' + next(sample_sentences) + ' ' + next(sample_sentences))
+            if len(texts) >= sections:
+                return texts
+
+
+def tokenize(nlp, texts):
+    return [[word for sentence in nlp.sent_tokenize(text) for word in nlp.word_tokenize(sentence)]
+            for text in texts]
+
+
+def agreement(reference_sections, sections):
+    """Returns precision and recall of the tokens of the sections and the share of identical sections"""
+    common = reference_count = count = identical = 0
+    for reference_words, words in zip(reference_sections, sections):
+        common = common + sum((collections.Counter(reference_words) & collections.Counter(words)).values())
+        reference_count = reference_count + len(reference_words)
+        count = count + len(words)
+        identical = identical + (reference_words == words)
+    return common / max(count, 1), common / max(reference_count, 1), identical / max(len(sections), 1)
+
+
+if __name__ == '__main__':
+    corpus_file = sys.argv[1] if len(sys.argv) > 1 else None
+    section_count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    corpus = sample_corpus(corpus_file, section_count)
+    with tempfile.TemporaryDirectory() as tmp:
+        nodes = Nodes(tmp + '/')
+        nlp_nltk = NLP(nodes, tokenizer=TOKENIZER_NLTK)
+        nlp_regex = NLP(nodes, tokenizer=TOKENIZER_REGEX)
+
+    reference = tokenize(nlp_nltk, corpus)
+    precision, recall, identical = agreement(reference, tokenize(nlp_regex, corpus))
+    print('%d sections, %d nltk tokens' % (len(corpus), sum(len(words) for words in reference)))
+    print('token precision %.4f  recall %.4f  identical sections %.4f' % (precision, recall, identical))
+
+    megabytes = sum(len(text) for text in corpus) / 1e6
+    seconds = {}
+    for tokenizer, nlp in ((TOKENIZER_NLTK, nlp_nltk), (TOKENIZER_REGEX, nlp_regex)):
+        seconds[tokenizer] = min(timeit.repeat(lambda: tokenize(nlp, corpus), number=1, repeat=3))
+        print('%-6s %10.1f sections/s %8.2f MB/s' % (tokenizer, len(corpus) / seconds[tokenizer],
+                                                     megabytes / seconds[tokenizer]))
+    print('speedup %.1fx' % (seconds[TOKENIZER_NLTK] / seconds[TOKENIZER_REGEX]))
@@ -0,0 +1,66 @@
+"""Benchmark of the per-file startup overhead of the preprocessing workers.
+
+Before workers were initialized once per process, every preprocessed file constructed the NLP resources
+(tagger, lemmatizer, stopwords, multi word expressions) and loaded wordnet again, and every job carried
+the pickled nodes. This benchmark reports both costs for the per-file model and for the worker
+initializer model (init_worker_nlp / get_worker_nlp).
+
+Requires the nltk data packages 'averaged_perceptron_tagger', 'wordnet', 'punkt' and 'stopwords'.
+
+Run from the repository root:
+    python -m benchmarks.bench_worker_startup
+
+"""
+
+# standard library imports
+import pickle
+import tempfile
+import timeit
+
+# related third party imports
+# None
+
+# local application/library specific imports
+from preprocessing_methods import *
+
+QUERIES = ['"Active Learning"',
+           '"Activity recognition" OR "Activity detection"',
+           '("emotions" OR "human affects" OR "affective") AND ("computing" OR "Artificial Intelligence")',
+           '"Anomaly detection" OR (("Anomaly" OR "Anomalies") AND ("detecting" OR "detect"))',
+           '"Artificial neural network" OR (("Neural network" OR "Neural net") AND ("learning" OR "training"))',
+           '"augmented reality" OR "augmented-reality"',
+           '"Autonomous" AND ("Robot" OR "Robots" OR "robotic")',
+           '"Bayesian network" OR "Bayes network" OR "Belief network"']
+
+
+def per_file_startup(nodes):
+    """Startup of a file in the per-file model: NLP resources are constructed for every file"""
+    nlp = NLP(nodes)
+    nlp.lemmatizer.lemmatize('networks')
+
+
+def worker_startup():
+    """Startup of a file in the worker initializer model"""
+    get_worker_nlp()
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as tmp:
+        nodes = Nodes(tmp + '/')
+        for number, query in enumerate(QUERIES * 25):
+            nodes.add_node(Node('Node %d' % number, query))
+
+        # the first construction pays the one-time import and corpus loading costs of the process
+        per_file_startup(nodes)
+        per_file = min(timeit.repeat(lambda: per_file_startup(nodes), number=1, repeat=5))
+        init_worker_nlp(nodes)
+        per_worker = min(timeit.repeat(worker_startup, number=1, repeat=5))
+
+        job = {'preprocessing': 'lemmatize', 'remove_stopwords': 'Nltk-Stopwords',
+               'file_path': tmp + '/ipg050104', 'filter_patents_by_node': True}
+        payload_before = len(pickle.dumps(dict(job, nodes_to_analyze=nodes)))
+        payload_after = len(pickle.dumps(job))
+
+        print('%-24s %14s %16s' % ('model', 'startup/file s', 'job payload bytes'))
+        print('%-24s %14.4f %16d' % ('NLP per file', per_file, payload_before))
+        print('%-24s %14.4f %16d' % ('worker initializer', per_worker, payload_after))
@@ -0,0 +1,362 @@
+"""Deterministic generator of synthetic USPTO bulk files.
+
+Writes zipped bulks in the three formats supported by patent_parser:
+
+    'xml_v4'    ipgYYMMDD.zip with one ipgYYMMDD.xml member (SimpleXMLHandler)
+    'xml_v2.5'  pgYYMMDD.zip with one pgYYMMDD.xml member of SGML-derived XML (SimpleXMLHandlerV25)
+    'aps'       pftapsYYYYMMDD_wkNN.zip with one APS text member (APSHandler)
+
+The content of a patent only depends on the seed and its index, so bulks generated with the same settings
+are identical in every format. Patent types, dates and classifications are mixed, so that the default
+PatentFilter of the parser rejects part of the patents as it does for real bulks.
+
+Run from the repository root to write a set of bulks:
+    python -m benchmarks.synthetic_bulks <folder> [patents per bulk]
+
+"""
+
+# standard library imports
+import os
+import sys
+import random
+import datetime
+import zipfile
+
+# related third party imports
+# None
+
+# local application/library specific imports
+# None
+
+FORMAT_APS = 'aps'
+FORMAT_XML_V25 = 'xml_v2.5'
+FORMAT_XML_V4 = 'xml_v4'
+
+BULK_FORMATS = (FORMAT_XML_V4, FORMAT_XML_V25, FORMAT_APS)
+
+WORDS = ('a', 'an', 'the', 'of', 'to', 'and', 'in', 'is', 'for', 'with', 'by', 'that', 'on', 'at', 'each',
+         'method', 'system', 'apparatus', 'device', 'signal', 'data', 'network', 'neural', 'learning', 'machine',
+         'sensor', 'actuator', 'controller', 'memory', 'processor', 'layer', 'output', 'input', 'module', 'unit',
+         'image', 'vehicle', 'robot', 'battery', 'cell', 'circuit', 'wireless', 'transmission', 'receiver',
+         'semiconductor', 'substrate', 'laser', 'optical', 'fiber', 'composition', 'polymer', 'compound',
+         'configured', 'comprising', 'coupled', 'determining', 'generating', 'receiving', 'plurality',
+         'first', 'second', 'wherein', 'based', 'least', 'one', 'active', 'reinforcement', 'autonomous',
+         'blockchain', 'cloud', 'computing', 'augmented', 'reality', 'quantum', 'encryption', 'storage')
+
+FIRST_NAMES = ('John', 'Jane', 'Maria', 'Wei', 'Hiroshi', 'Anna', 'Peter', 'Olga', 'Carlos', 'Priya')
+LAST_NAMES = ('Doe', 'Roe', 'Smith', 'Zhang', 'Tanaka', 'Mueller', 'Garcia', 'Ivanova', 'Kumar', 'Rossi')
+ORGANIZATIONS = ('ACME Corp', 'Globex Inc.', 'Initech LLC', 'Umbrella Ltd.', 'Hooli Inc.', 'Stark Industries')
+
+# classification sections with their share, H, G and Y are accepted by the default PatentFilter
+SECTIONS = 'AABBCCDEFFGGGGHHHHY'
+
+# application types of the XML formats and APS application type codes with their share
+PATENT_TYPES = ('utility',) * 18 + ('design', 'plant')
+APS_TYPE_CODES = {'utility': '1', 'design': '4', 'plant': '6'}
+KIND_CODES = {'utility': 'B1', 'design': 'S1', 'plant': 'P2'}
+
+# publication date of the first weekly bulk of each format
+FIRST_BULK_DATES = {FORMAT_XML_V4: datetime.date(2005, 1, 4),
+                    FORMAT_XML_V25: datetime.date(2002, 1, 1),
+                    FORMAT_APS: datetime.date(1976, 1, 6)}
+
+
+class SyntheticPatentGenerator:
+    def __init__(self, seed=0, title_words=8, abstract_words=120, description_paragraphs=40, paragraph_words=80,
+                 claims=20, claim_words=50, inventors=3, classifications=3):
+        """Generates the documents of synthetic patents
+
+        Parameters
+        ----------
+        seed : int
+        title_words : int
+        abstract_words : int
+        description_paragraphs : int
+            number of paragraphs of the description
+        paragraph_words : int
+            number of words of a description paragraph
+        claims : int
+        claim_words : int
+            number of words of a claim
+        inventors : int
+            maximum number of inventors of a patent
+        classifications : int
+            maximum number of classifications of a patent per classification scheme
+        """
+        self.seed = seed
+        self.title_words = title_words
+        self.abstract_words = abstract_words
+        self.description_paragraphs = description_paragraphs
+        self.paragraph_words = paragraph_words
+        self.claims = claims
+        self.claim_words = claim_words
+        self.inventors = inventors
+        self.classifications = classifications
+
+    def patent_fields(self, index, bulk_date=datetime.date(2005, 1, 4)):
+        """Returns the field values of the patent with the given index
+
+        Parameters
+        ----------
+        index : int
+        bulk_date : datetime.date
+            publication date of the bulk
+
+        Returns
+        -------
+        fields : dict
+        """
+        rng = random.Random(self.seed * 1000003 + index)
+
+        def text(words):
+            return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+        patent_type = rng.choice(PATENT_TYPES)
+        classifications = []
+        for _ in range(rng.randint(1, self.classifications)):
+            classifications.append((rng.choice(SECTIONS), '%02d' % rng.randint(1, 99), rng.choice('ABCFHKLNQ'),
+                                    str(rng.randint(1, 99)), '%02d' % rng.randint(0, 99)))
+        return {'doc_number': '%08d' % (6000000 + index),
+                'application_number': '%08d' % (9000000 + rng.randint(0, 999999)),
+                'kind': KIND_CODES[patent_type],
+                'patent_type': patent_type,
+                'publication_date': bulk_date,
+                'date': bulk_date - datetime.timedelta(days=rng.randint(300, 1500)),
+                'title': text(self.title_words)[:-1],
+                'abstract': text(self.abstract_words),
+                'description': [text(self.paragraph_words) for _ in range(self.description_paragraphs)],
+                'claims': [text(self.claim_words) for _ in range(self.claims)],
+                'inventors': [(rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES))
+                              for _ in range(rng.randint(1, self.inventors))],
+                'assignee': rng.choice(ORGANIZATIONS),
+                'classifications': classifications}
+
+    def v4_document(self, index, bulk_date=datetime.date(2005, 1, 4)):
+        """Returns the XML document (version 4) of a patent as bytes"""
+        fields = self.patent_fields(index, bulk_date)
+        parts = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+                 '<!DOCTYPE us-patent-grant SYSTEM "us-patent-grant-v44-2013-05-16.dtd" [ ]>\n'
+                 '<us-patent-grant lang="EN" dtd-version="v4.4 2013-05-16" file="US%s-%s.XML">\n'
+                 % (fields['doc_number'], bulk_date.strftime('%Y%m%d')),
+                 '<us-bibliographic-data-grant>\n'
+                 '<publication-reference>\n<document-id>\n<country>US</country>\n<doc-number>%s</doc-number>\n'
+                 '<kind>%s</kind>\n<date>%s</date>\n</document-id>\n</publication-reference>\n'
+                 % (fields['doc_number'], fields['kind'], fields['publication_date'].strftime('%Y%m%d')),
+                 '<application-reference appl-type="%s">\n<document-id>\n<country>US</country>\n'
+                 '<doc-number>%s</doc-number>\n<date>%s</date>\n</document-id>\n</application-reference>\n'
+                 % (fields['patent_type'], fields['application_number'], fields['date'].strftime('%Y%m%d')),
+                 '<classifications-ipcr>\n']
+        for section, clazz, subclass, main_group, subgroup in fields['classifications']:
+            parts.append('<classification-ipcr>\n<ipc-version-indicator><date>20060101</date></ipc-version-indicator>\n'
+                         '<classification-level>A</classification-level>\n<section>%s</section>\n'
+                         '<class>%s</class>\n<subclass>%s</subclass>\n<main-group>%s</main-group>\n'
+                         '<subgroup>%s</subgroup>\n<symbol-position>F</symbol-position>\n'
+                         '<classification-value>I</classification-value>\n</classification-ipcr>\n'
+                         % (section, clazz, subclass, main_group, subgroup))
+        parts.append('</classifications-ipcr>\n<classifications-cpc>\n<main-cpc>\n')
+        for section, clazz, subclass, main_group, subgroup in fields['classifications']:
+            parts.append('<classification-cpc>\n<cpc-version-indicator><date>20130101</date></cpc-version-indicator>\n'
+                         '<section>%s</section>\n<class>%s</class>\n<subclass>%s</subclass>\n'
+                         '<main-group>%s</main-group>\n<subgroup>%s</subgroup>\n'
+                         '<symbol-position>F</symbol-position>\n<classification-value>I</classification-value>\n'
+                         '</classification-cpc>\n' % (section, clazz, subclass, main_group, subgroup))
+        parts.append('</main-cpc>\n</classifications-cpc>\n<invention-title id="d2e53">%s</invention-title>\n'
+                     '<us-parties>\n<inventors>\n' % fields['title'])
+        for sequence, (first_name, last_name) in enumerate(fields['inventors']):
+            parts.append('<inventor sequence="%03d" designation="us-only">\n<addressbook>\n'
+                         '<last-name>%s</last-name>\n<first-name>%s</first-name>\n<address>\n'
+                         '<city>Springfield</city>\n<state>IL</state>\n<country>US</country>\n'
+                         '</address>\n</addressbook>\n</inventor>\n' % (sequence, last_name, first_name))
+        parts.append('</inventors>\n</us-parties>\n<assignees>\n<assignee>\n<addressbook>\n'
+                     '<orgname>%s</orgname>\n<role>02</role>\n</addressbook>\n</assignee>\n</assignees>\n'
+                     '</us-bibliographic-data-grant>\n' % fields['assignee'])
+        parts.append('<abstract id="abstract">\n<p id="p-0001" num="0000">%s</p>\n</abstract>\n'
+                     '<description id="description">\n<heading id="h-0001" level="1">BACKGROUND</heading>\n'
+                     % fields['abstract'])
+        for number, paragraph in enumerate(fields['description'], 1):
+            parts.append('<p id="p-%04d" num="%04d">%s</p>\n' % (number + 1, number, paragraph))
+        parts.append('</description>\n<us-claim-statement>What is claimed is:</us-claim-statement>\n'
+                     '<claims id="claims">\n')
+        for number, claim in enumerate(fields['claims'], 1):
+            parts.append('<claim id="CLM-%05d" num="%05d">\n<claim-text>%d. %s</claim-text>\n</claim>\n'
+                         % (number, number, number, claim))
+        parts.append('</claims>\n</us-patent-grant>\n')
+        return ''.join(parts).encode('utf-8')
+
+    def v25_document(self, index, bulk_date=datetime.date(2002, 1, 1)):
+        """Returns the SGML-derived XML document (version 2.5) of a patent as bytes"""
+        fields = self.patent_fields(index, bulk_date)
+        parts = ['<?xml version="1.0" encoding="UTF-8"?>\n'
+                 '<!DOCTYPE PATDOC SYSTEM "ST32-US-Grant-025xml.dtd" [ ]>\n'
+                 '<PATDOC DTD="2.5" STATUS="BUILD 20011231">\n<SDOBI>\n',
+                 '<B100><B110><DNUM><PDAT>%s</PDAT></DNUM></B110><B130><PDAT>%s</PDAT></B130>'
+                 '<B140><DATE><PDAT>%s</PDAT></DATE></B140><B190><PDAT>US</PDAT></B190></B100>\n'
+                 % (fields['doc_number'], fields['kind'], fields['publication_date'].strftime('%Y%m%d')),
+                 '<B200><B210><DNUM><PDAT>%s</PDAT></DNUM></B210><B211US><PDAT>09</PDAT></B211US>'
+                 '<B220><DATE><PDAT>%s</PDAT></DATE></B220></B200>\n'
+                 % (fields['application_number'], fields['date'].strftime('%Y%m%d')),
+                 '<B500><B510>']
+        classifications = ['%s%s%s %s%s' % classification for classification in fields['classifications'][:2]]
+        parts.append('<B511><PDAT>%s</PDAT></B511>' % classifications[0])
+        if len(classifications) > 1:
+            parts.append('<B512><PDAT>%s</PDAT></B512>' % classifications[1])
+        parts.append('<B516><PDAT>7</PDAT></B516></B510>\n<B540><STEXT><PDAT>%s</PDAT></STEXT></B540>\n'
+                     '</B500>\n<B700><B720>' % fields['title'])
+        for first_name, last_name in fields['inventors']:
+            parts.append('<B721><PARTY-US><NAM><FNM><PDAT>%s</PDAT></FNM><SNM><STEXT><PDAT>%s</PDAT></STEXT>'
+                         '</SNM></NAM><ADR><CITY><PDAT>Springfield</PDAT></CITY><STATE><PDAT>IL</PDAT></STATE>'
+                         '</ADR></PARTY-US></B721>' % (first_name, last_name))
+        parts.append('</B720>\n<B730><B731><PARTY-US><NAM><ONM><STEXT><PDAT>%s</PDAT></STEXT></ONM></NAM>'
+                     '</PARTY-US></B731></B730>\n</B700>\n</SDOBI>\n' % fields['assignee'])
+        parts.append('<SDOAB><BTEXT><PARA ID="P-00001"><PTEXT><PDAT>%s</PDAT></PTEXT></PARA></BTEXT></SDOAB>\n'
+                     '<SDODE><BTEXT>\n' % fields['abstract'])
+        for number, paragraph in enumerate(fields['description'], 2):
+            parts.append('<PARA ID="P-%05d" LVL="0"><PTEXT><PDAT>%s</PDAT></PTEXT></PARA>\n' % (number, paragraph))
+        parts.append('</BTEXT></SDODE>\n<SDOCL><H LVL="1"><STEXT><PDAT>What is claimed is:</PDAT></STEXT></H>\n')
+        for number, claim in enumerate(fields['claims'], 1):
+            parts.append('<CL><CLM ID="CLM-%05d"><PARA ID="P-%05d"><PTEXT><PDAT>%d. %s</PDAT></PTEXT></PARA>'
+                         '</CLM></CL>\n' % (number, number, number, claim))
+        parts.append('</SDOCL>\n</PATDOC>\n')
+        return ''.join(parts).encode('utf-8')
+
+    def aps_record(self, index, bulk_date=datetime.date(1976, 1, 6)):
+        """Returns the APS text record of a patent as str"""
+        fields = self.patent_fields(index, bulk_date)
+        lines = ['PATN',
+                 'WKU  %09d' % (3930000 + index),
+                 'SRC  5',
+                 'APN  %s' % fields['application_number'][-7:],
+                 'APT  %s' % APS_TYPE_CODES[fields['patent_type']],
+                 'ART  353',
+                 'APD  %s' % fields['date'].strftime('%Y%m%d')]
+        lines.extend(_aps_field('TTL', fields['title']))
+        lines.extend(['ISD  %s' % fields['publication_date'].strftime('%Y%m%d'),
+                      'NCL  %d' % len(fields['claims'])])
+        for first_name, last_name in fields['inventors']:
+            lines.extend(['INVT', 'NAM  %s; %s' % (last_name, first_name), 'CTY  Springfield', 'STA  IL'])
+        lines.extend(['ASSG', 'NAM  %s' % fields['assignee'], 'CTY  Springfield', 'CLAS', 'OCL  360 35'])
+        for section, clazz, subclass, main_group, subgroup in fields['classifications']:
+            lines.append('ICL  %s%s%s %s/%s' % (section, clazz, subclass, main_group, subgroup))
+        lines.append('ABST')
+        lines.extend(_aps_field('PAL', fields['abstract']))
+        lines.extend(['BSUM', 'PAC  BACKGROUND OF THE INVENTION'])
+        for paragraph in fields['description'][:len(fields['description']) // 2]:
+            lines.extend(_aps_field('PAR', paragraph))
+        lines.append('DETD')
+        for paragraph in fields['description'][len(fields['description']) // 2:]:
+            lines.extend(_aps_field('PAR', paragraph))
+        lines.extend(['CLMS', 'STM  What is claimed is:'])
+        for number, claim in enumerate(fields['claims'], 1):
+            lines.append('NUM  %d.' % number)
+            lines.extend(_aps_field('PAR', '%d. %s' % (number, claim)))
+        return '\n'.join(lines) + '\n'
+
+    def bulk_member(self, bulk_format, patents, bulk_date, first_index=0):
+        """Returns the name and content of the member file of a bulk
+
+        Parameters
+        ----------
+        bulk_format : str
+            'xml_v4', 'xml_v2.5' or 'aps'
+        patents : int
+            number of patents of the bulk
+        bulk_date : datetime.date
+        first_index : int
+            index of the first patent of the bulk
+
+        Returns
+        -------
+        name : str
+        content : bytes
+        """
+        indices = range(first_index, first_index + patents)
+        if bulk_format == FORMAT_XML_V4:
+            return ('ipg%s.xml' % bulk_date.strftime('%y%m%d'),
+                    b''.join(self.v4_document(index, bulk_date) for index in indices))
+        if bulk_format == FORMAT_XML_V25:
+            return ('pg%s.xml' % bulk_date.strftime('%y%m%d'),
+                    b''.join(self.v25_document(index, bulk_date) for index in indices))
+        if bulk_format == FORMAT_APS:
+            records = ''.join(self.aps_record(index, bulk_date) for index in indices)
+            return ('pftaps%s_wk01.txt' % bulk_date.strftime('%Y%m%d'),
+                    ('HHHHHT APS1\n' + records).encode('utf-8'))
+        raise ValueError('unknown bulk format: ' + str(bulk_format))
+
+    def write_bulk(self, folder, bulk_format, patents, bulk_date=None, first_index=0):
+        """Writes a zipped bulk file
+
+        Parameters
+        ----------
+        folder : str
+        bulk_format : str
+            'xml_v4', 'xml_v2.5' or 'aps'
+        patents : int
+        bulk_date : datetime.date
+            None uses a publication date typical for the format
+        first_index : int
+
+        Returns
+        -------
+        zip_path : str
+        member_size : int
+            size of the decompressed member in bytes
+        """
+        if bulk_date is None:
+            bulk_date = FIRST_BULK_DATES[bulk_format]
+        name, content = self.bulk_member(bulk_format, patents, bulk_date, first_index)
+        zip_path = os.path.join(folder, os.path.splitext(name)[0] + '.zip')
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zfile:
+            # a fixed timestamp keeps the zip files byte-identical across runs
+            zfile.writestr(zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0)), content,
+                           compress_type=zipfile.ZIP_DEFLATED)
+        return zip_path, len(content)
+
+
+def _aps_field(code, text, width=70):
+    """Formats a field of an APS record with continuation lines"""
+    lines = []
+    line = ''
+    for word in text.split(' '):
+        if len(line) > 0 and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = word if len(line) == 0 else line + ' ' + word
+    lines.append(line)
+    return [code + '  ' + lines[0]] + ['     ' + line for line in lines[1:]]
+
+
+def write_bulks(folder, patents_per_bulk, bulk_formats=BULK_FORMATS, weeks=1, generator=None):
+    """Writes weekly bulks of all formats into a folder
+
+    Parameters
+    ----------
+    folder : str
+    patents_per_bulk : int
+    bulk_formats : iterable(str)
+    weeks : int
+        number of weekly bulks per format
+    generator : SyntheticPatentGenerator
+        None uses the default sizes
+
+    Returns
+    -------
+    bulks : list((str, str, int))
+        format, zip path and member size of every bulk
+    """
+    generator = SyntheticPatentGenerator() if generator is None else generator
+    os.makedirs(folder, exist_ok=True)
+    bulks = []
+    for bulk_format in bulk_formats:
+        for week in range(weeks):
+            bulk_date = FIRST_BULK_DATES[bulk_format] + datetime.timedelta(weeks=week)
+            zip_path, member_size = generator.write_bulk(folder, bulk_format, patents_per_bulk, bulk_date,
+                                                         first_index=week * patents_per_bulk)
+            bulks.append((bulk_format, zip_path, member_size))
+    return bulks
+
+
+if __name__ == '__main__':
+    for bulk_format, zip_path, member_size in write_bulks(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2
+                                                          else 1000):
+        print('%-10s %s %.1f MB' % (bulk_format, zip_path, member_size / 1e6))
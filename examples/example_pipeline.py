@@ -106,7 +106,9 @@ if __name__ == '__main__':  # prevent execution in parallel processes
     ASSETLIST.extend(ASSETLIST_PATENT_2017)
     ASSETLIST.extend(ASSETLIST_PATENT_2018)
 
-    NODES.enrich_with_assets(ASSETLIST)
+    # the assets are committed to the asset store when the nodes are closed
+    with NODES:
+        NODES.enrich_with_assets(ASSETLIST)
 
     # =============================================================================
     # Run algorithms
@@ -4,14 +4,138 @@
 
 # standard library imports
 import os
-# None
+import re
+import collections
 
 # related third party imports
 from nltk import word_tokenize
 
 # local application/library specific imports
 from assets import *
-# None
+
+# file of the vocabulary of the assets in the asset directory of the nodes
+VOCABULARY_FILE_NAME = 'vocabulary'
+# asset files of the per node format and of segments without manifest
+LEGACY_ASSET_FILE_PREFIXES = ('AssetWords_', AssetStore.SEGMENT_FILE_PREFIX)
+
+
+# tokens of a node query: quoted synonyms, parentheses and operators
+QUERY_TOKEN = re.compile(r'"[^"]*"|\(|\)|[^\s()"]+|"')
+QUERY_OPERATORS = ('AND', 'OR', 'NOT')
+
+
+class QueryParser:
+    def __init__(self, query, synonym_key):
+        """Parses a node query into a tree of conditions
+
+        The query combines quoted synonyms with AND, OR, NOT and parentheses, the operators are case
+        insensitive. NOT binds stronger than AND, and AND binds stronger than OR. The tree is made of
+        the tuples ('synonym', key), ('not', tree), ('and', [trees]) and ('or', [trees]).
+
+        Parameters
+        ----------
+        query : str
+        synonym_key : function(str)
+            returns the key of a synonym in the found words
+        """
+        self.query = query
+        self.synonym_key = synonym_key
+        self.tokens = QUERY_TOKEN.findall(query)
+        self.position = 0
+
+    def parse(self):
+        tree = self.parse_or()
+        if self.position < len(self.tokens):
+            raise ValueError("unexpected '" + self.tokens[self.position] + "'")
+        return tree
+
+    def peek_operator(self):
+        if self.position < len(self.tokens):
+            token = self.tokens[self.position]
+            if token.upper() in QUERY_OPERATORS:
+                return token.upper()
+        return None
+
+    def parse_or(self):
+        operands = [self.parse_and()]
+        while self.peek_operator() == 'OR':
+            self.position = self.position + 1
+            operands.append(self.parse_and())
+        return operands[0] if len(operands) == 1 else ('or', operands)
+
+    def parse_and(self):
+        operands = [self.parse_not()]
+        while self.peek_operator() == 'AND':
+            self.position = self.position + 1
+            operands.append(self.parse_not())
+        return operands[0] if len(operands) == 1 else ('and', operands)
+
+    def parse_not(self):
+        if self.peek_operator() == 'NOT':
+            self.position = self.position + 1
+            return 'not', self.parse_not()
+        return self.parse_operand()
+
+    def parse_operand(self):
+        if self.position >= len(self.tokens):
+            raise ValueError('unexpected end of query')
+        token = self.tokens[self.position]
+        self.position = self.position + 1
+        if token == '(':
+            tree = self.parse_or()
+            if self.position >= len(self.tokens) or self.tokens[self.position] != ')':
+                raise ValueError("missing ')'")
+            self.position = self.position + 1
+            return tree
+        if len(token) >= 2 and token[0] == '"' and token[-1] == '"':
+            return 'synonym', self.synonym_key(token[1:-1])
+        raise ValueError("unexpected '" + token + "'")
+
+
+def query_expression(tree):
+    """Returns the python expression of a parsed query, evaluated on the set of found words 'words'"""
+    if tree[0] == 'synonym':
+        return repr(tree[1]) + ' in words'
+    if tree[0] == 'not':
+        return 'not (' + query_expression(tree[1]) + ')'
+    return (' ' + tree[0] + ' ').join('(' + query_expression(operand) + ')' for operand in tree[1])
+
+
+def query_bit_expression(tree, synonym_bits):
+    """Returns the python expression of a parsed query, evaluated on the bitset of found synonyms 'bits'
+
+    Synonyms combined by OR or AND are tested with a single mask.
+    """
+    if tree[0] == 'synonym':
+        return '(bits & ' + hex(synonym_bits[tree[1]]) + ')'
+    if tree[0] == 'not':
+        return '(not ' + query_bit_expression(tree[1], synonym_bits) + ')'
+    mask = 0
+    operands = []
+    for operand in tree[1]:
+        if operand[0] == 'synonym':
+            mask = mask | synonym_bits[operand[1]]
+        else:
+            operands.append(query_bit_expression(operand, synonym_bits))
+    if mask:
+        if tree[0] == 'or':
+            operands.insert(0, '(bits & ' + hex(mask) + ')')
+        else:
+            operands.insert(0, '((bits & ' + hex(mask) + ') == ' + hex(mask) + ')')
+    return '(' + (' ' + tree[0] + ' ').join(operands) + ')'
+
+
+def synonym_words(synonym):
+    """Returns the lower case words of a synonym
+
+    A synonym is tokenized as one sentence, like every sentence of an asset (see NLP.word_tokenize).
+    """
+    return word_tokenize(synonym.lower(), preserve_line=True)
+
+
+def synonym_key(synonym):
+    """Returns the key of a synonym: its lower case words joined like multi word expressions"""
+    return '_'.join(synonym_words(synonym))
 
 
 class Node:
@@ -23,7 +147,7 @@ class Node:
         name : str
             The name of the node.
         query : str
-            a query with search strings combined with AND, OR, (, ).
+            a query with search strings combined with AND, OR, NOT, (, ).
         """
         self.name = name
         self.nodes = None
@@ -32,46 +156,100 @@ class Node:
 
         # asset counts per year
         self.asset_count = {}
+        # offsets of the assets of the node in the asset store per year
+        self.postings = {}
+        # bytes of the stored assets per year
+        self.asset_bytes = {}
         self.query = query
         self.expression = None
+        self.matches = None
+        self.query_tree = None
+        # query evaluated on the synonym bitset of the nodes, see Nodes.find_node_names
+        self.bit_expression = None
+        self.matches_bits = None
 
         words = query.split('"')
         for i in range(1, len(words), 2):
             self.synonyms.append(words[i])
-        self.build_query_expression()
 
         # fill tokenized synonym dictionary
         for syn in self.synonyms:
-            mwe = [word_tokenize(syn.lower())]
-            self.syndict['_'.join(mwe[0])] = None
+            self.syndict[synonym_key(syn)] = None
 
-        # try to evaluate expression to check correct expression
+        # parse and compile the query once, and evaluate it to check correct expression
         try:
+            self.build_query_expression()
             self.node_matches_found_synonyms(self.synonyms)
         except Exception as e:
             print("Node " + self.name + ": incorrect query '" + self.query + "'")
             print("     " + str(e))
             raise
 
+    def __getstate__(self):
+        # the compiled queries cannot be pickled, they are compiled again from the expressions
+        state = self.__dict__.copy()
+        del state['matches']
+        del state['matches_bits']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.compile_query_expression()
+        self.matches_bits = None
+        if self.bit_expression is not None:
+            self.compile_bit_expression()
+
     def build_query_expression(self):
-        self.expression = self.query
+        """Parses the query into a python expression on the found synonyms and compiles it
 
-        # replace string constants in query with code to evaluate the condition based on the tokenized value
-        for syn in self.synonyms:
-            mwe = [word_tokenize(syn.lower())]
-            token_syn = '_'.join(mwe[0])
-            self.expression = self.expression.replace('"' + syn + '"', "'" + token_syn + "' in words ")
-        self.expression = self.expression.replace(' OR ', ' or ')
-        self.expression = self.expression.replace(' AND ', ' and ')
-        self.expression = self.expression.replace(' NOT ', ' not ')
+        Returns
+        -------
+        expression : str
+        """
+        self.query_tree = QueryParser(self.query, synonym_key).parse()
+        self.expression = query_expression(self.query_tree)
+        self.compile_query_expression()
         return self.expression
 
+    def compile_query_expression(self):
+        # the expression only consists of string constants, 'in words' and boolean operators
+        self.matches = eval(compile('lambda words: ' + self.expression, '<query ' + self.name + '>', 'eval'),
+                            {'__builtins__': {}})
+
+    def build_bit_expression(self, synonym_bits):
+        """Compiles the query into a bitwise program on the synonym bitset of an asset
+
+        Parameters
+        ----------
+        synonym_bits : dict
+            bit of every synonym key
+
+        Returns
+        -------
+        bit_expression : str
+        """
+        self.bit_expression = query_bit_expression(self.query_tree, synonym_bits)
+        self.compile_bit_expression()
+        return self.bit_expression
+
+    def compile_bit_expression(self):
+        # the expression only consists of integer constants, 'bits' and bitwise and boolean operators
+        self.matches_bits = eval(compile('lambda bits: ' + self.bit_expression, '<query ' + self.name + '>', 'eval'),
+                                 {'__builtins__': {}})
+
     def node_matches_found_synonyms(self, words):
-        # starttime = perf_counter()
-        exp_as_func = eval('lambda words: ' + self.expression)
-        result = exp_as_func(words)
-        # print("NodeEvalDuration:" + str (perf_counter() - starttime))
-        return result
+        """Evaluates the query of the node
+
+        Parameters
+        ----------
+        words : dict or set
+            the synonym keys found in an asset
+
+        Returns
+        -------
+        : bool
+        """
+        return self.matches(words)
 
     def node_matches_raw_text(self, text):
         text_to_compare = text.lower()
@@ -89,58 +267,136 @@ class Node:
             return
         return
 
-    def get_assets(self, year):
-        with open(self._pickle_file_path(year), 'rb') as fp:
-            try:
-                while True:
-                    asset = pickle.load(fp)
-                    yield asset
-            except EOFError:
-                return
+    def get_assets(self, year, start=None, stop=None, step=None):
+        """Returns the assets of the node in a year, they are read from the asset store through the postings
 
-    def get_words_cumulative(self, year_cum):
-        for year in self.asset_count:
-            if year <= year_cum:
-                for asset in self.get_assets(year):
-                    for word in asset.words_to_analyze():
-                        yield word
-        return
+        A slice of the assets is read without reading the others, e.g. to sample the assets or to read
+        ranges of them in several processes.
 
-    def _pickle_file_name(self):
-        return "AssetWords_" + self.name.replace("/", "_") + "_"
+        Parameters
+        ----------
+        year : int
+        start : int
+        stop : int
+        step : int
+            slice of the assets of the year, in the order they were added
+
+        Returns
+        -------
+        assets : generator(AssetWords)
+        """
+        offsets = self.postings.get(year)
+        if offsets is None:
+            return
+        if start is not None or stop is not None or step is not None:
+            offsets = offsets[start:stop:step]
+        self.nodes.flush_assets()
+        vocabulary = self.nodes.vocabulary
+        for asset in self.nodes.asset_store.read(year, offsets):
+            asset.vocabulary = vocabulary
+            yield asset
 
-    def _pickle_file_path(self, year):
-        return self.nodes.asset_tmp_dir + self._pickle_file_name() + str(year)
+    def get_word_ids(self, year):
+        """Returns the ids of the words of all assets of a year, see Nodes.vocabulary
+
+        Parameters
+        ----------
+        year : int
+
+        Returns
+        -------
+        word_ids : generator(int)
+        """
+        for asset in self.get_assets(year):
+            yield from asset.word_ids
+
+    def get_word_ids_cumulative(self, year_cum):
+        """Returns the ids of the words of all assets up to a year, see Nodes.vocabulary
+
+        Parameters
+        ----------
+        year_cum : int
+
+        Returns
+        -------
+        word_ids : generator(int)
+        """
+        for asset in self.nodes.cumulative_view.get_assets(self, year_cum):
+            yield from asset.word_ids
+
+    def get_word_id_counts_cumulative(self, year_cum):
+        """Returns the counts of the ids of the words of all assets up to a year, see CumulativeView
+
+        Parameters
+        ----------
+        year_cum : int
+
+        Returns
+        -------
+        word_id_counts : collections.Counter
+        """
+        return self.nodes.cumulative_view.get_word_id_counts(self, year_cum)
+
+    def get_assets_cumulative(self, year_cum):
+        """Returns the assets up to a year, see CumulativeView
+
+        Parameters
+        ----------
+        year_cum : int
+
+        Returns
+        -------
+        assets : generator(AssetWords)
+        """
+        return self.nodes.cumulative_view.get_assets(self, year_cum)
+
+    def get_words_cumulative(self, year_cum):
+        for asset in self.nodes.cumulative_view.get_assets(self, year_cum):
+            for word in asset.words_to_analyze():
+                yield word
+        return
 
     def _update_counts(self, asset):
         if asset.year not in self.asset_count:
             self.asset_count[asset.year] = 0
         self.asset_count[asset.year] = self.asset_count[asset.year] + 1
 
-    def append_asset(self, asset):
-        internal_asset = AssetWords(asset.year, asset)
-        with open(self._pickle_file_path(asset.year), 'ab+') as fp:
-            pickle.dump(internal_asset, fp)
+    def add_posting(self, asset, offset, size):
+        """Associates an asset of the asset store with the node
+
+        Parameters
+        ----------
+        asset : Asset
+        offset : int
+            offset of the asset in the segment of its year, see AssetStore
+        size : int
+            size of the stored asset in bytes
+        """
+        if asset.year not in self.postings:
+            self.postings[asset.year] = array('q')
+            self.asset_bytes[asset.year] = 0
+        self.postings[asset.year].append(offset)
+        self.asset_bytes[asset.year] = self.asset_bytes[asset.year] + size
         self._update_counts(asset)
 
+    def manifest_entry(self):
+        """Returns the count, byte size and offsets of the assets of the node per year, see Nodes.commit_assets"""
+        return {year: {'count': self.asset_count[year], 'bytes': self.asset_bytes[year], 'offsets': offsets}
+                for year, offsets in self.postings.items()}
+
+    def restore_from_manifest(self, entry):
+        """Restores the assets of the node from its manifest entry, see manifest_entry"""
+        self.remove_assets()
+        for year, postings in entry.items():
+            self.postings[year] = postings['offsets']
+            self.asset_count[year] = postings['count']
+            self.asset_bytes[year] = postings['bytes']
+
     def remove_assets(self):
         self.asset_count = {}
+        self.postings = {}
+        self.asset_bytes = {}
 
-    def read_assets(self):
-        start = timeit.default_timer()
-        node_filename = self._pickle_file_name()
-        self.asset_count = {}
-        for file in os.scandir(self.nodes.asset_tmp_dir):
-            if file.name.startswith(node_filename):
-                year = int(file.name[-4:])
-                for asset in self.get_assets(year):
-                    self._update_counts(asset)
-        stop = timeit.default_timer()
-        runtime = stop - start
-        count = 0
-        for year in self.asset_count:
-            count = count + self.asset_count[year]
-        print(self.name + ': finished reading ' + str(count) + ' assets from disk. Duration: ' + str(runtime))
 
 class Nodes:
     def __init__(self, asset_tmp_dir):
@@ -154,6 +410,42 @@ class Nodes:
 
         # dictionary to get the node by any synonym
         self.node_synonyms = {}
+        # bit of every synonym in the synonym bitset of an asset, see find_node_names
+        self.synonym_bits = {}
+        # words removed from the assets when they are stored, see set_stop_words
+        self.stop_words = frozenset()
+        # synonyms by their vocabulary id and ids of the stop words, see word_id_sets
+        self.synonym_ids = self.stop_word_ids = None
+
+        # ids of the words of the assets of all nodes
+        self.vocabulary = Vocabulary(self.asset_tmp_dir + VOCABULARY_FILE_NAME)
+        # assets of all nodes, every asset is stored once and referenced by the postings of its nodes
+        self.asset_store = AssetStore(self.asset_tmp_dir)
+        # buffered writer of the asset store, opened by append_asset and committed by close
+        self.asset_writer = None
+        # True if the nodes hold the committed assets of the store, see read_assets and remove_assets
+        self.assets_restored = False
+        # manifest entries of the nodes in the asset store that are not in the nodelist, see read_assets
+        self.unknown_node_entries = {}
+        # assets and word counts of the nodes up to a year, used by the cumulative algorithms
+        self.cumulative_view = CumulativeView(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard_assets()
+
+    def discard_assets(self):
+        """Closes the asset writer without a commit, the nodes are restored before the next append"""
+        if self.asset_writer is not None:
+            # the assets written since the last commit are discarded when the store is read again
+            self.asset_writer.close()
+            self.asset_writer = None
+        self.assets_restored = False
 
     def add_node(self, node):
         """Adds a new node to the nodelist
@@ -175,7 +467,37 @@ class Nodes:
         for syn in node.syndict.keys():
             if syn not in self.node_synonyms:
                 self.node_synonyms[syn] = []
+                self.synonym_bits[syn] = 1 << len(self.synonym_bits)
             self.node_synonyms[syn].append(node)
+        node.build_bit_expression(self.synonym_bits)
+        self.synonym_ids = None
+
+    def set_stop_words(self, stop_words):
+        """Sets the words that are removed from the assets when they are stored, see append_asset
+
+        Parameters
+        ----------
+        stop_words : iterable(str)
+        """
+        self.stop_words = frozenset(stop_words)
+        self.stop_word_ids = None
+
+    def word_id_sets(self):
+        """Returns the synonyms by their id and the ids of the stop words in the vocabulary
+
+        Both are computed once from the vocabulary and again when its ids change. Synonyms and stop words
+        that are not yet in the vocabulary are added, so words of later assets get the same ids.
+
+        Returns
+        -------
+        synonym_ids : dict(int, str)
+        stop_word_ids : frozenset(int)
+        """
+        if self.synonym_ids is None:
+            self.synonym_ids = {self.vocabulary.word_id(syn): syn for syn in self.synonym_bits}
+        if self.stop_word_ids is None:
+            self.stop_word_ids = frozenset(self.vocabulary.word_id(word) for word in self.stop_words)
+        return self.synonym_ids, self.stop_word_ids
 
     def get_nodes_by_synonym(self, word):
         """Return the nodes, that contains a condition with the given word
@@ -190,6 +512,69 @@ class Nodes:
         """
         return self.node_synonyms.get(word, None)
 
+    def find_node_names(self, words):
+        """Returns the names of the nodes whose query matches the given words
+
+        The synonyms found in the words are collected into a bitset in one pass, then the queries of the
+        nodes with a found synonym are evaluated on the bitset. The nodes are ordered by the first
+        occurrence of one of their synonyms, nodes sharing a synonym in the order they were added.
+
+        Parameters
+        ----------
+        words : list(str)
+
+        Returns
+        -------
+        node_names : list(str)
+        """
+        synonym_bits = self.synonym_bits
+        return self._matching_node_names(dict.fromkeys(word for word in words if word in synonym_bits))
+
+    def find_node_names_by_ids(self, word_ids):
+        """Returns the names of the nodes whose query matches the given word ids, see find_node_names
+
+        Parameters
+        ----------
+        word_ids : array('i')
+            ids of the vocabulary of the nodes
+
+        Returns
+        -------
+        node_names : list(str)
+        """
+        synonym_ids = self.word_id_sets()[0]
+        return self._matching_node_names([synonym_ids[word_id] for word_id in dict.fromkeys(word_ids)
+                                          if word_id in synonym_ids])
+
+    def remove_stop_word_ids(self, word_ids):
+        """Returns the word ids without the ids of the stop words, see set_stop_words
+
+        Parameters
+        ----------
+        word_ids : array('i')
+
+        Returns
+        -------
+        word_ids : array('i')
+        """
+        stop_word_ids = self.word_id_sets()[1]
+        return array('i', [word_id for word_id in word_ids if word_id not in stop_word_ids])
+
+    def _matching_node_names(self, found_synonyms):
+        synonym_bits = self.synonym_bits
+        bits = 0
+        for syn in found_synonyms:
+            bits = bits | synonym_bits[syn]
+        node_names = []
+        evaluated = set()
+        for syn in found_synonyms:
+            for node in self.node_synonyms[syn]:
+                if node not in evaluated:
+                    evaluated.add(node)
+                    if node.matches_bits(bits):
+                        node_names.append(node.name)
+        return node_names
+
     def is_node_in_text(self, words):
         """Returns true if the given list of words contains a synonym of any node
 
@@ -210,6 +595,13 @@ class Nodes:
         """Associate the nodes in the nodelist with the preprocessed assets
         This is necessary to speed up the subsequent edge and node algorithms
 
+        The assets are appended to the asset store but not committed. They can be read by the nodes, but
+        only committed assets are restored by read_assets, so close (or commit_assets) has to be called
+        after the last assets were added, e.g. by using the nodes as context manager:
+
+            with nodes:
+                nodes.enrich_with_assets(assetlist)
+
         Parameters
         ----------
         assetlist: list(Asset)
@@ -220,19 +612,119 @@ class Nodes:
         """
         for asset in assetlist:
             if len(asset.node_names) > 0:
-                for name in asset.node_names:
-                    node = self.nodes[name]
-                    node.append_asset(asset)
+                self.append_asset(asset)
+
+    def append_asset(self, asset):
+        """Stores an asset once in the asset store and adds it to the postings of its nodes
+
+        Parameters
+        ----------
+        asset : Asset
+            asset with the names of its nodes, see Asset.find_nodes
+        """
+        if self.asset_writer is None:
+            if not self.assets_restored or not self.vocabulary.is_synchronized():
+                # the postings and ids continue the committed assets and vocabulary of an existing store
+                self.read_assets()
+            self.asset_writer = AssetStoreWriter(self.asset_store)
+        asset_words = AssetWords(asset.year, asset, self.vocabulary)
+        if len(self.stop_words) > 0:
+            asset_words.word_ids = self.remove_stop_word_ids(asset_words.word_ids)
+            # the queries are evaluated on the words without stop words
+            asset_words.find_nodes(self)
+            if not asset_words.matches_any_node():
+                return
+        offset, size = self.asset_writer.append(asset_words)
+        for name in asset_words.node_names:
+            self.nodes[name].add_posting(asset_words, offset, size)
+        self.cumulative_view.invalidate(asset_words)
+
+    def flush_assets(self):
+        """Writes the buffered assets into the asset store, so they can be read"""
+        if self.asset_writer is not None:
+            self.asset_writer.flush()
+
+    def commit_assets(self):
+        """Forces the written assets and their vocabulary to disk and commits them with a new manifest
+
+        The manifest of the asset store holds the size and checksum of every segment, the size of the
+        vocabulary file and the count, byte size and offsets of the assets of every node per year. After
+        a crash, read_assets restores the nodes with the assets of the last commit.
+        """
+        if self.asset_writer is None:
+            return
+        self.asset_writer.sync()
+        # the ids of the assets have to be known when they are read
+        self.vocabulary.flush()
+        node_entries = dict(self.unknown_node_entries)
+        for node in self.nodelist:
+            node_entries[node.name] = node.manifest_entry()
+        self.asset_store.write_manifest({'version': self.asset_store.FORMAT_VERSION,
+                                         'segments': self.asset_writer.segments(),
+                                         'vocabulary': self.vocabulary.file_size(),
+                                         'nodes': node_entries})
+
+    def close(self):
+        """Commits the written assets and closes the files of the asset store, the nodes stay usable"""
+        if self.asset_writer is None:
+            return
+        self.commit_assets()
+        self.asset_writer.close()
+        self.asset_writer = None
 
     def remove_assets(self):
+        self.discard_assets()
         for file in os.scandir(self.asset_tmp_dir):
             os.unlink(file.path)
+        self.vocabulary.clear()
+        self.synonym_ids = self.stop_word_ids = None
+        self.unknown_node_entries = {}
+        self.cumulative_view.clear()
         for node in self.nodelist:
             node.remove_assets()
+        self.assets_restored = True
 
-    def read_assets(self):
+    def read_assets(self, verify_checksums=False):
+        """Restores the assets of the nodes from the manifest of the asset store, no asset is read
+
+        Assets that were appended but not committed are discarded.
+
+        Parameters
+        ----------
+        verify_checksums : bool
+            compare the segments with the checksums of the manifest, this reads all segments. Otherwise
+            only the sizes of the segment files are checked
+        """
+        start = timeit.default_timer()
+        self.discard_assets()
+        manifest = self.asset_store.read_manifest()
+        if manifest is None:
+            # asset files without manifest are either in an outdated format or were never committed
+            for file in os.scandir(self.asset_tmp_dir):
+                if file.name.startswith(LEGACY_ASSET_FILE_PREFIXES):
+                    raise RuntimeError('the assets in ' + self.asset_tmp_dir + ' have an outdated format or were '
+                                       + 'never committed, they have to be preprocessed again')
+            manifest = {'version': self.asset_store.FORMAT_VERSION, 'segments': {}, 'vocabulary': 0, 'nodes': {}}
+        if manifest.get('version') != self.asset_store.FORMAT_VERSION:
+            raise RuntimeError('the assets in ' + self.asset_tmp_dir + ' have an outdated format, '
+                               + 'they have to be preprocessed again')
+        errors = self.asset_store.verify(manifest['segments'], verify_checksums)
+        if len(errors) > 0:
+            raise RuntimeError('the assets in ' + self.asset_tmp_dir + ' do not match their manifest: '
+                               + '; '.join(errors))
+        self.vocabulary.load(manifest['vocabulary'])
+        self.synonym_ids = self.stop_word_ids = None
+        self.cumulative_view.clear()
+        node_entries = dict(manifest['nodes'])
+        for node in self.nodelist:
+            node.restore_from_manifest(node_entries.pop(node.name, {}))
+        # the store may contain nodes that are no longer analyzed, they are kept in the next manifest
+        self.unknown_node_entries = node_entries
+        self.assets_restored = True
+        runtime = timeit.default_timer() - start
         for node in self.nodelist:
-            node.read_assets()
+            print(node.name + ': finished reading ' + str(sum(node.asset_count.values())) + ' assets from disk.'
+                  + ' Duration: ' + str(runtime))
 
     def get_years(self):
         """Creates a list of years.
@@ -256,3 +748,267 @@ class Nodes:
         max_year = max(int(i) for i in years)
         range_of_years = range(min_year, max_year+1)
         return range_of_years
+
+
+class CumulativeView:
+    # maximum number of word ids of the assets kept in memory
+    MAX_CACHED_WORD_IDS = 100000000
+
+    def __init__(self, nodes, max_cached_word_ids=MAX_CACHED_WORD_IDS):
+        """Cumulative view of the assets of the nodes, the assets of a year are read once and reused for all
+        later years
+
+        The word id counts of a node up to a year are the counts of the years before plus the counts of the
+        new years. The assets of a year are read once for all nodes and kept in memory, until the cached
+        assets exceed max_cached_word_ids word ids. The assets of the years that are not cached are read
+        from the asset store on every request.
+
+        Parameters
+        ----------
+        nodes : Nodes
+        max_cached_word_ids : int
+        """
+        self.nodes = nodes
+        self.max_cached_word_ids = max_cached_word_ids
+        # per node name: the years already counted and the word id counts of these years
+        self.word_id_counts = {}
+        # per year: the assets of all nodes by their offset in the asset store
+        self.assets_by_year = {}
+        self.cached_word_ids = 0
+
+    def clear(self):
+        self.word_id_counts = {}
+        self.assets_by_year = {}
+        self.cached_word_ids = 0
+
+    def invalidate(self, asset):
+        """Drops the cached state that does not include a new asset
+
+        Parameters
+        ----------
+        asset : Asset
+            asset added to the nodes of its node_names
+        """
+        for name in asset.node_names:
+            self.word_id_counts.pop(name, None)
+        assets = self.assets_by_year.pop(asset.year, None)
+        if assets is not None:
+            self.cached_word_ids = self.cached_word_ids - sum(len(cached.word_ids) for cached in assets.values())
+
+    @staticmethod
+    def years(node, year_cum):
+        return [year for year in node.asset_count if year <= year_cum]
+
+    def get_word_id_counts(self, node, year_cum):
+        """Returns the counts of the word ids of all assets of a node up to a year
+
+        The counts of the last request of the node are updated with the years they lack. Requests in
+        ascending order of the years, as the algorithms make them, read every year once.
+
+        Parameters
+        ----------
+        node : Node
+        year_cum : int
+
+        Returns
+        -------
+        word_id_counts : collections.Counter
+            the counts are updated by later requests of the node
+        """
+        years = self.years(node, year_cum)
+        counted_years, counts = self.word_id_counts.get(node.name, (set(), None))
+        if counts is None or not counted_years.issubset(years):
+            counted_years, counts = set(), collections.Counter()
+        for year in years:
+            if year not in counted_years:
+                for asset in self._get_assets_of_year(node, year):
+                    counts.update(asset.word_ids)
+                counted_years.add(year)
+        self.word_id_counts[node.name] = (counted_years, counts)
+        return counts
+
+    def get_assets(self, node, year_cum):
+        """Returns the assets of a node up to a year
+
+        Parameters
+        ----------
+        node : Node
+        year_cum : int
+
+        Returns
+        -------
+        assets : generator(AssetWords)
+        """
+        for year in self.years(node, year_cum):
+            yield from self._get_assets_of_year(node, year)
+
+    def _get_assets_of_year(self, node, year):
+        assets = self.assets_by_year.get(year)
+        if assets is None:
+            assets = self._cache_year(year)
+        if assets is None:
+            return node.get_assets(year)
+        return (assets[offset] for offset in node.postings[year])
+
+    def _cache_year(self, year):
+        # the cached years are never evicted, an evicted year would be read again for every later year
+        if self.cached_word_ids >= self.max_cached_word_ids:
+            return None
+        offsets = set()
+        for node in self.nodes.nodelist:
+            offsets.update(node.postings.get(year, ()))
+        offsets = sorted(offsets)
+        assets = {}
+        vocabulary = self.nodes.vocabulary
+        self.nodes.flush_assets()
+        for offset, asset in zip(offsets, self.nodes.asset_store.read(year, offsets)):
+            asset.vocabulary = vocabulary
+            assets[offset] = asset
+            self.cached_word_ids = self.cached_word_ids + len(asset.word_ids)
+        self.assets_by_year[year] = assets
+        return assets
+
+
+class AhoCorasickAutomaton:
+    def __init__(self, patterns):
+        """Automaton to find all occurrences of a set of patterns in a text in one pass
+
+        Parameters
+        ----------
+        patterns : list(str)
+            non-empty patterns, a match reports the index of the pattern in this list
+        """
+        # trie of the patterns
+        transitions = [{}]
+        outputs = [[]]
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                next_state = transitions[state].get(char)
+                if next_state is None:
+                    next_state = len(transitions)
+                    transitions[state][char] = next_state
+                    transitions.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(index)
+
+        # breadth first: failure links and outputs of the suffixes of every state
+        fail = [0] * len(transitions)
+        queue = collections.deque(transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in transitions[state].items():
+                fallback = fail[state]
+                while fallback and char not in transitions[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = transitions[fallback].get(char, 0)
+                outputs[next_state].extend(outputs[fail[next_state]])
+                queue.append(next_state)
+
+        # complete the transitions over the alphabet of the patterns, so that the scan needs one dict lookup
+        # per character. Characters outside the alphabet lead back to the root
+        alphabet = set(char for pattern in patterns for char in pattern)
+        self.delta = [None] * len(transitions)
+        queue = collections.deque([0])
+        while queue:
+            state = queue.popleft()
+            delta = {}
+            for char in alphabet:
+                if char in transitions[state]:
+                    delta[char] = transitions[state][char]
+                elif state > 0:
+                    delta[char] = self.delta[fail[state]].get(char, 0)
+            self.delta[state] = delta
+            queue.extend(transitions[state].values())
+        self.outputs = [tuple(output) for output in outputs]
+
+    def iter_matches(self, text):
+        """Yields the index of every pattern found in the text, once per occurrence
+
+        Parameters
+        ----------
+        text : str
+
+        Returns
+        -------
+        pattern_indices : generator(int)
+        """
+        delta = self.delta
+        outputs = self.outputs
+        state = 0
+        for char in text:
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                yield from outputs[state]
+
+
+class RawTextFilter:
+    def __init__(self, nodes, inflected_forms=None):
+        """Conservative pre-filter of raw text by the synonyms of all nodes
+
+        A text passes if, for a synonym of any node, all words of the synonym occur in the lower case text.
+        Asset.find_nodes can only associate a node if one of its synonyms is among the words of the asset,
+        and every such word is built from words occurring in the text, so texts that do not pass can be
+        skipped before tokenization without losing an asset.
+
+        Parameters
+        ----------
+        nodes : Nodes
+        inflected_forms : function(str)
+            returns the words that lemmatization may map to a given word. Required to filter text that is
+            analyzed as lemmas, e.g. NLP.inflected_forms
+        """
+        # every surface form of a synonym is a group of words that have to be found
+        groups = set()
+        self.matches_everything = False
+        for node in nodes.nodelist:
+            for synonym in node.synonyms:
+                tokens = synonym_words(synonym)
+                key = '_'.join(tokens)
+                forms = {key}
+                if inflected_forms is not None:
+                    forms.update(inflected_forms(key))
+                for form in forms:
+                    # the tokenizer replaces double quotes by `` and '', these words have no fixed raw text
+                    words = frozenset(word for word in form.split('_') if word not in ('', '``', "''"))
+                    if len(words) == 0:
+                        self.matches_everything = True
+                    groups.add(words)
+                for token in tokens:
+                    if token not in synonym.lower():
+                        # the tokenizer changed the synonym, its words may not occur in the raw text
+                        self.matches_everything = True
+
+        self.words = sorted(set(word for words in groups for word in words))
+        word_index = dict((word, index) for index, word in enumerate(self.words))
+        self.groups = [tuple(word_index[word] for word in words) for words in groups if len(words) > 0]
+        self.groups_by_word = [[] for _ in self.words]
+        for group_index, group in enumerate(self.groups):
+            for index in group:
+                self.groups_by_word[index].append(group_index)
+        self.automaton = AhoCorasickAutomaton(self.words)
+
+    def matches(self, text):
+        """Returns false if no node can be found in the text
+
+        Parameters
+        ----------
+        text : str
+
+        Returns
+        -------
+        : bool
+        """
+        if self.matches_everything:
+            return True
+        missing = [len(group) for group in self.groups]
+        found = [False] * len(self.words)
+        for index in self.automaton.iter_matches(text.lower()):
+            if not found[index]:
+                found[index] = True
+                for group_index in self.groups_by_word[index]:
+                    missing[group_index] -= 1
+                    if missing[group_index] == 0:
+                        return True
+        return False
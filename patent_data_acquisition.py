@@ -6,11 +6,41 @@
 import sys
 
 # related third party imports
-from multiprocessing import Pool, cpu_count
+from multiprocessing import Pool, Queue, cpu_count
 
 # local application/library specific imports
 from preprocessing_methods import *
 from logfile import append_logfile
+from patent_parser.patent_records import read_patent_records
+from patent_parser.columnar_store import read_columnar_patents, is_columnar_file, partition_year
+from patent_parser.bulk_manifest import MANIFEST_FILE_NAME
+
+# columns of parsed patents used by the preprocessing, other columns of columnar patent files are not read
+PREPROCESSING_COLUMNS = ('date', 'title', 'abstract', 'claims', 'description', 'assignees',
+                         'internationalClassifications', 'cooperativeClassifications')
+
+
+def read_patents(file_path, patent_filter=None):
+    """Reads the patents of a record-framed or columnar patent file
+
+    Columnar patent files are read with column projection and the filter is evaluated on their
+    date, type and classification columns. Record-framed files are filtered after reading.
+
+    Parameters
+    ----------
+    file_path : str
+    patent_filter : PatentFilter
+        None returns all patents
+
+    Returns
+    -------
+    patents : generator(dict)
+    """
+    if is_columnar_file(file_path):
+        return read_columnar_patents(file_path, PREPROCESSING_COLUMNS, patent_filter)
+    if patent_filter is None:
+        return read_patent_records(file_path)
+    return (patent for patent in read_patent_records(file_path) if patent_filter.accepts(patent))
 
 
 def stream_preprocessing(stream_processing_job):
@@ -20,76 +50,84 @@ def stream_preprocessing(stream_processing_job):
     ----------
     stream_processing_job : dict
         This parameter has to be filled with items associated to the following keys
-        'nodes_to_analyze', 'file_path', 'preprocessing', 'remove_stopwords', 'filter_patents_by_node'
+        'file_path', 'preprocessing', 'remove_stopwords', 'filter_patents_by_node' and optionally
+        'patent_filter'. The nodes and NLP resources are loaded by init_worker_nlp.
 
     Returns
     -------
-    assets : list
+    asset_count : int
+        number of assets sent to the parent process, see open_asset_stream
     """
-    assets = []
-    nodes_to_analyze = stream_processing_job.get('nodes_to_analyze')
+    start = timeit.default_timer()
     file_path = stream_processing_job.get('file_path')
+    asset_stream = open_asset_stream(file_path)
     preprocessing = stream_processing_job.get('preprocessing')
     remove_stopwords = stream_processing_job.get('remove_stopwords')
     filter_patents_by_node = stream_processing_job.get('filter_patents_by_node')
-    nlp = NLP(nodes_to_analyze)
+    patent_filter = stream_processing_job.get('patent_filter')
+    nodes_to_analyze, nlp = get_worker_nlp()
     filtered_out = 0
+    patent_count = 0
+    startup = timeit.default_timer() - start
 
-    start = timeit.default_timer()
-
-    with open(file_path, "rb") as fp:
-        patent_file = pickle.load(fp)
-
-    for patent_entry in patent_file:
+    # patents are read one at a time from the record-framed or columnar patent file
+    for patent_entry in read_patents(file_path, patent_filter):
+        patent_count = patent_count + 1
         year = patent_entry.get("date").year
         title = patent_entry.get("title")
-        abstract = patent_entry.get("abstract")
-        claims = patent_entry.get("claims")
-        description = patent_entry.get("description")
+        # text fields may have been dropped by the field projection of the parser
+        abstract = patent_entry.get("abstract", "")
+        claims = patent_entry.get("claims", "")
+        description = patent_entry.get("description", "")
         assignees = patent_entry.get("assignees")
         ipc = patent_entry.get("internationalClassifications", "")
         cpc = patent_entry.get("cooperativeClassifications", "")
 
+        # patents without the words of any synonym cannot match a node and are skipped before tokenization,
+        # the node filter only considers title and abstract
+        if filter_patents_by_node:
+            raw_text = '\n'.join((title or '', abstract or ''))
+        else:
+            raw_text = '\n'.join((title or '', abstract or '', claims or '', description or ''))
+        if not nlp.raw_text_filter.matches(raw_text):
+            filtered_out = filtered_out + 1
+            continue
+
+        # every section is analyzed at most once, the node filter and the preprocessing share the results
+        title_analysis = nlp.analyze_section(title)
+        abstract_analysis = nlp.analyze_section(abstract)
+        claims_analysis = nlp.analyze_section(claims)
+        description_analysis = nlp.analyze_section(description)
+
         # Sentence_tokenize
         if preprocessing == "sentences_with_lemmas":
-            tokenized_title = nlp.tokenize_into_words(title)
-            tokenized_abstract = nlp.tokenize_into_words(abstract)
             proceed = False
 
             if filter_patents_by_node:
-                w = tokenized_title + tokenized_abstract
+                w = title_analysis.words() + abstract_analysis.words()
                 proceed = nodes_to_analyze.is_node_in_text(w)
 
             if not filter_patents_by_node or proceed:
-                title_sentences = nlp.tokenize_into_sentences(title)
-                abstract_sentences = nlp.tokenize_into_sentences(abstract)
-                claims_sentences = nlp.tokenize_into_sentences(claims)
-                description_sentences = nlp.tokenize_into_sentences(description)
-
                 title_sentences_with_lemmas = []
-                for sentence in title_sentences:
-                    lemmatized_sentence = nlp.lemmatize_words(sentence)
+                for lemmatized_sentence in title_analysis.lemmatized_sentences():
                     if remove_stopwords == "Nltk-Stopwords":
                         lemmatized_sentence = nlp.list_based_stopword_removal(lemmatized_sentence)
                     title_sentences_with_lemmas.append(lemmatized_sentence)
 
                 abstract_sentences_with_lemmas = []
-                for sentence in abstract_sentences:
-                    lemmatized_sentence = nlp.lemmatize_words(sentence)
+                for lemmatized_sentence in abstract_analysis.lemmatized_sentences():
                     if remove_stopwords == "Nltk-Stopwords":
                         lemmatized_sentence = nlp.list_based_stopword_removal(lemmatized_sentence)
                     abstract_sentences_with_lemmas.append(lemmatized_sentence)
 
                 claims_sentences_with_lemmas = []
-                for sentence in claims_sentences:
-                    lemmatized_sentence = nlp.lemmatize_words(sentence)
+                for lemmatized_sentence in claims_analysis.lemmatized_sentences():
                     if remove_stopwords == "Nltk-Stopwords":
                         lemmatized_sentence = nlp.list_based_stopword_removal(lemmatized_sentence)
                     claims_sentences_with_lemmas.append(lemmatized_sentence)
 
                 description_sentences_with_lemmas = []
-                for sentence in description_sentences:
-                    lemmatized_sentence = nlp.lemmatize_words(sentence)
+                for lemmatized_sentence in description_analysis.lemmatized_sentences():
                     if remove_stopwords == "Nltk-Stopwords":
                         lemmatized_sentence = nlp.list_based_stopword_removal(lemmatized_sentence)
                     description_sentences_with_lemmas.append(lemmatized_sentence)
@@ -102,15 +140,15 @@ def stream_preprocessing(stream_processing_job):
                     assignees=assignees, cpc=cpc, ipc=ipc)
 
                 if asset.matches_any_node():
-                    assets.append(asset)
+                    asset_stream.append(asset)
                 else:
                     filtered_out = filtered_out + 1
 
         # Word Tokenize
         elif preprocessing == "word_tokenize":
 
-            tokenized_title = nlp.tokenize_into_words(title)
-            tokenized_abstract = nlp.tokenize_into_words(abstract)
+            tokenized_title = title_analysis.words()
+            tokenized_abstract = abstract_analysis.words()
             proceed = False
 
             if filter_patents_by_node:
@@ -118,8 +156,8 @@ def stream_preprocessing(stream_processing_job):
                 proceed = nodes_to_analyze.is_node_in_text(w)
 
             if not filter_patents_by_node or proceed:
-                tokenized_claims = nlp.tokenize_into_words(claims)
-                tokenized_description = nlp.tokenize_into_words(description)
+                tokenized_claims = claims_analysis.words()
+                tokenized_description = description_analysis.words()
 
                 if remove_stopwords == "Nltk-Stopwords":
                     tokenized_title = nlp.list_based_stopword_removal(tokenized_title)
@@ -134,16 +172,16 @@ def stream_preprocessing(stream_processing_job):
                                              tokenized_description=tokenized_description,
                                              assignees=assignees, cpc=cpc, ipc=ipc)
                 if asset.matches_any_node():
-                    assets.append(asset)
+                    asset_stream.append(asset)
                 else:
                     filtered_out = filtered_out + 1
 
         # Pos Tagging (to do)
         elif preprocessing == "pos_tag":
-            pos_tagged_title = nlp.pos_tag_words(title)
-            pos_tagged_abstract = nlp.pos_tag_words(abstract)
-            pos_tagged_claims = nlp.pos_tag_words(claims)
-            pos_tagged_description = nlp.pos_tag_words(description)
+            pos_tagged_title = title_analysis.pos_tagged_words()
+            pos_tagged_abstract = abstract_analysis.pos_tagged_words()
+            pos_tagged_claims = claims_analysis.pos_tagged_words()
+            pos_tagged_description = description_analysis.pos_tagged_words()
             if remove_stopwords == "Nltk-Stopwords":
                 pos_tagged_title = nlp.list_based_stopword_removal_for_pos_tagged_words(pos_tagged_title)
                 pos_tagged_abstract = nlp.list_based_stopword_removal_for_pos_tagged_words(pos_tagged_abstract)
@@ -157,25 +195,23 @@ def stream_preprocessing(stream_processing_job):
                                      pos_tagged_description=pos_tagged_description,
                                      assignees=assignees, cpc=cpc, ipc=ipc)
             if asset.matches_any_node():
-                assets.append(asset)
+                asset_stream.append(asset)
             else:
                 filtered_out = filtered_out + 1
 
         # Lemmatize
         elif preprocessing == "lemmatize":
-            tokenized_title = nlp.tokenize_into_words(title)
-            tokenized_abstract = nlp.tokenize_into_words(abstract)
             proceed = False
 
             if filter_patents_by_node:
-                w = tokenized_title + tokenized_abstract
+                w = title_analysis.words() + abstract_analysis.words()
                 proceed = nodes_to_analyze.is_node_in_text(w)
 
             if not filter_patents_by_node or proceed:
-                lemmatized_title = nlp.lemmatize_words(title)
-                lemmatized_abstract = nlp.lemmatize_words(abstract)
-                lemmatized_claims = nlp.lemmatize_words(claims)
-                lemmatized_description = nlp.lemmatize_words(description)
+                lemmatized_title = title_analysis.lemmatized_words()
+                lemmatized_abstract = abstract_analysis.lemmatized_words()
+                lemmatized_claims = claims_analysis.lemmatized_words()
+                lemmatized_description = description_analysis.lemmatized_words()
                 if remove_stopwords == "Nltk-Stopwords":
                     lemmatized_title = nlp.list_based_stopword_removal(lemmatized_title)
                     lemmatized_abstract = nlp.list_based_stopword_removal(lemmatized_abstract)
@@ -190,20 +226,23 @@ def stream_preprocessing(stream_processing_job):
                                           assignees=assignees, cpc=cpc, ipc=ipc)
 
                 if asset.matches_any_node():
-                    assets.append(asset)
+                    asset_stream.append(asset)
                 else:
                     filtered_out = filtered_out + 1
 
         else:
             sys.exit("Pipeline should never reach this point!")
 
+    asset_stream.close()
+
     # Logfile
     stop = timeit.default_timer()
     runtime = stop - start
-    print('Finished: ' + file_path + " with: " + str(len(assets)) +
-          ' Assets found in ' + str(len(patent_file)) + ' patents. Duration: ' + str(runtime) +
-          ' ' + str(filtered_out) + ' assets filtered out by search expressions')
-    return assets
+    print('Finished: ' + file_path + " with: " + str(asset_stream.count) +
+          ' Assets found in ' + str(patent_count) + ' patents. Duration: ' + str(runtime) +
+          ' (startup: ' + str(startup) + ') ' + str(filtered_out) + ' assets filtered out by search expressions.'
+          + ' Lemma cache hit rate: ' + str(nlp.lemma_cache.hit_rate()))
+    return asset_stream.count
 
 
 class PatentData:
@@ -213,7 +252,7 @@ class PatentData:
 
     def preprocess_patent_files_from_dir(
             self, data_dir, preprocessing, remove_stopwords, nodes_to_analyze,
-            filter_patents_by_node):
+            filter_patents_by_node, patent_filter=None, lemma_cache_path=None, tokenizer=TOKENIZER_NLTK):
         """Method to extract, load and preprocess patent data parsed
         by our uspto_xml_parser with support for multiprocessing.
 
@@ -232,35 +271,61 @@ class PatentData:
 
         filter_patents_by_node: bool
 
+        patent_filter: PatentFilter
+            selects the patents to preprocess by date, type and classification. Year partitions of a
+            columnar patent store outside of the date range are skipped without being read.
+            None preprocesses all parsed patents.
+
+        lemma_cache_path: str
+            file of the lemma cache of the workers. If given, the workers warm-start their lemma cache
+            from the file and their lemmas are merged into it when they exit, so that later runs reuse them.
+
+        tokenizer: str
+            Specifies the tokenizer. Supported strings: 'nltk' (Punkt and Treebank) and 'regex', a faster
+            approximation of the nltk tokenizers. Their agreement and speed are measured by
+            benchmarks/bench_tokenizer.py.
+
         Returns
         -------
         nothing
 
         """
         start = timeit.default_timer()
+        stop_words = stream_stop_words(preprocessing, remove_stopwords)
+        if len(stop_words) > 0:
+            # the stopwords are removed from the word ids of the assets by this process
+            remove_stopwords = None
         stream_processing_jobs = []
 
         for root, dirs, files in os.walk(data_dir):
             for name in files:
-                file_path = data_dir + name
+                if name == MANIFEST_FILE_NAME or name.endswith('.part') or name.endswith('.tmp'):
+                    continue    # bookkeeping files of the patent parser
+                file_path = os.path.join(root, name)
+                if is_columnar_file(file_path) and patent_filter is not None:
+                    if not patent_filter.accepts_year(partition_year(file_path)):
+                        continue    # year partition outside of the date range
                 if os.path.getsize(file_path) > 0:
                     stream_processing_job = {"preprocessing": preprocessing,
                                              "remove_stopwords": remove_stopwords,
                                              "file_path": file_path,
-                                             "nodes_to_analyze": nodes_to_analyze,
-                                             "filter_patents_by_node": filter_patents_by_node}
+                                             "filter_patents_by_node": filter_patents_by_node,
+                                             "patent_filter": patent_filter}
                     stream_processing_jobs.append(stream_processing_job)
                 else:
                     print("Empty File!")
 
-        p = Pool(processes=cpu_count()-1, maxtasksperchild=1)
-        asset_cnt = 0
-        for assets in p.imap_unordered(stream_preprocessing, stream_processing_jobs):
-            nodes_to_analyze.enrich_with_assets(assets)
-            print("Imported " + str(len(assets)) + " assets into nodes")
-            asset_cnt = asset_cnt + len(assets)
+        # the nodes and NLP resources are loaded once per worker process and reused for all files,
+        # the assets are written into the nodes while the workers preprocess
+        asset_queue = Queue(maxsize=ASSET_QUEUE_SIZE)
+        p = Pool(processes=max(cpu_count() - 1, 1), initializer=init_worker_nlp,
+                 initargs=(nodes_to_analyze, lemma_cache_path, asset_queue, tokenizer))
+        asset_cnt = stream_assets_into_nodes(p, stream_preprocessing, stream_processing_jobs, asset_queue,
+                                             nodes_to_analyze, stop_words)
         p.close()
         p.join()
+        if lemma_cache_path is not None:
+            merge_worker_lemma_caches(lemma_cache_path)
 
         # Logfile
         stop = timeit.default_timer()
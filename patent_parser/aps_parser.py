@@ -2,6 +2,24 @@
 import datetime
 from io import StringIO, TextIOWrapper
 
+# local application/library specific imports
+from patent_parser.parse_options import text_field_projection, DocumentRejected
+from patent_parser.text_accumulator import TextAccumulator
+
+
+def parse_date(data):
+    """Parses a date field (YYYYMMDD), invalid dates are mapped to 1337-01-01"""
+    if len(data) == 8 and data.isascii() and data.isdigit():
+        try:
+            return datetime.date(int(data[:4]), int(data[4:6]), int(data[6:]))
+        except ValueError:
+            return datetime.date(1337, 1, 1)
+    # uncommon formats are left to strptime
+    try:
+        return datetime.datetime.strptime(data, "%Y%m%d").date()
+    except ValueError:
+        return datetime.date(1337, 1, 1)
+
 
 class APSFileHandler:
 
@@ -42,7 +60,7 @@ class APSFileHandler:
 
 class APSHandler(object):
 
-    def __init__(self):
+    def __init__(self, text_fields=None, patent_filter=None):
 
         # states
         self.state = ''
@@ -50,125 +68,151 @@ class APSHandler(object):
                        'PATN': 0, 'BSUM': 0, 'DETD': 0, 'CLMS': 0,
                        'DRWD': 0, 'DCLM': 0}
 
-        self.paragraph_codes = ['PAR', 'PAC', 'PAL', 'PA1', 'PA2', 'PA3', 'PA4', 'PA5',
-                                'FNT', 'TBL', 'EQU']
+        self.paragraph_codes = {'PAR', 'PAC', 'PAL', 'PA1', 'PA2', 'PA3', 'PA4', 'PA5',
+                                'FNT', 'TBL', 'EQU'}
+        # text fields to materialize, paragraphs of other text sections are skipped
+        self.text_fields = text_field_projection(text_fields)
+        # patent filter evaluated on the bibliographic data, rejected documents are aborted
+        self.patent_filter = patent_filter
+        self.text_states = {'ABST', 'BSUM', 'DETD', 'DRWD', 'CLMS', 'DCLM'}
         self.document_date = None
         self.patentType = ''
         self.inventors = []
         self.assignees = []
         self.internationalClassifications = []
-        self.claims = ''
-        self.abstract = ''
-        self.description = ''
+        self.claims = TextAccumulator()
+        self.abstract = TextAccumulator()
+        self.description = TextAccumulator()
         self.currentPatent = {}
 
+        # field handlers keyed on the first three characters of a line, i.e. the field code
+        self.field_handlers = {'WKU': self.publication_number_field,
+                               'APN': self.application_number_field,
+                               'APT': self.application_type_field,
+                               'APD': self.application_date_field,
+                               'ISD': self.issue_date_field,
+                               'TTL': self.title_field,
+                               'NAM': self.name_field,
+                               'ICL': self.classification_field,
+                               '   ': self.continuation_field}
+        for code in self.paragraph_codes:
+            self.field_handlers[code] = self.paragraph_field
+
     def clear(self):
         self.inventors = []
         self.assignees = []
         self.internationalClassifications = []
-        self.claims = ''
-        self.abstract = ''
-        self.description = ''
+        self.claims.clear()
+        self.abstract.clear()
+        self.description.clear()
         self.currentPatent = {}
 
     def feed(self, text):
-        lines = text.split('\n')
-        for line in lines:
+        field_handlers = self.field_handlers
+        states = self.states
+        for line in text.split('\n'):
             line = line.rstrip()
-            data = ''
-            if ' ' in line:  # data field
-                data = line[3:]
-                if len(data) == 0 or data[0] is not ' ':
-                    data = line[1:]
-                data = data.lstrip()
-            else:  # change state
-                if line in self.states:
-                    self.state = line
-                    if line == 'PATN':
-                        self.clear()
-
-            if line.startswith('WKU'):
-                if self.state == 'PATN':
-                    self.currentPatent['publicationNumber'] = data
-
-            if line.startswith('APN'):
-                if self.state == 'PATN':
-                    self.currentPatent['applicationNumber'] = data
-
-            if line.startswith('APT'):
-                if self.state == 'PATN':
-                    if data.startswith('4'):
-                        self.patentType = "design"
-                    elif data.startswith('6'):
-                        self.patentType = "plant"
-                    else:
-                        self.patentType = 'utility'
-                    self.currentPatent['patentType'] = self.patentType
-
-            if line.startswith('APD'):
-                if self.state == 'PATN':
-                    try:
-                        self.document_date = datetime.datetime.strptime(data, "%Y%m%d").date()
-                    except ValueError:
-                        self.document_date = datetime.date(1337, 1, 1)
-                    self.currentPatent['date'] = self.document_date
-
-            if line.startswith('ISD'):
-                if self.state == 'PATN':
-                    try:
-                        self.document_date = datetime.datetime.strptime(data, "%Y%m%d").date()
-                    except ValueError:
-                        self.document_date = datetime.date(1337, 1, 1)
-                    self.currentPatent['publicationDate'] = self.document_date
-
-            elif line.startswith('TTL'):
-                if self.state == 'PATN':
-                    self.currentPatent['title'] = data
-
-            elif line.startswith('NAM'):
-                if self.state == 'INVT':
-                    tokens = data.split(';')
-                    if len(tokens) > 1:
-                        name = tokens[1].strip() + ' ' + tokens[0].strip()
-                    else:
-                        name = tokens[0].strip()
-                    self.inventors.append(name)
-
-                elif self.states['ASSG'] == 1:
-                    self.assignees.append(data)
-
-            elif line.startswith('ICL'):
-                if self.state == 'CLAS':
-                    self.internationalClassifications.append(data)
-
+            handler = field_handlers.get(line[:3])
+            if handler is not None:
+                data = ''
+                if ' ' in line:  # data field
+                    data = line[3:]
+                    if len(data) == 0 or data[0] != ' ':
+                        data = line[1:]
+                    data = data.lstrip()
+                handler(line, data)
+            elif line in states:  # change state
+                self.change_state(line)
+
+    def change_state(self, state):
+        self.state = state
+        if state == 'PATN':
+            self.clear()
+        elif state in self.text_states and self.patent_filter is not None:
+            # the classifications precede all text sections
+            if not self.patent_filter.accepts_classifications(self.internationalClassifications, []):
+                raise DocumentRejected()
+
+    def publication_number_field(self, line, data):
+        if self.state == 'PATN':
+            self.currentPatent['publicationNumber'] = data
+
+    def application_number_field(self, line, data):
+        if self.state == 'PATN':
+            self.currentPatent['applicationNumber'] = data
+
+    def application_type_field(self, line, data):
+        if self.state == 'PATN':
+            if data.startswith('4'):
+                self.patentType = "design"
+            elif data.startswith('6'):
+                self.patentType = "plant"
             else:
-                is_paragrapf = self.is_paragraph_code(line)
-                if is_paragrapf or line[:4] == '    ':
-                    self.add_paragraph_data(data, is_paragrapf)
+                self.patentType = 'utility'
+            self.currentPatent['patentType'] = self.patentType
+            if self.patent_filter is not None and not self.patent_filter.accepts_patent_type(self.patentType):
+                raise DocumentRejected()
+
+    def application_date_field(self, line, data):
+        if self.state == 'PATN':
+            self.document_date = parse_date(data)
+            self.currentPatent['date'] = self.document_date
+            if self.patent_filter is not None and not self.patent_filter.accepts_date(self.document_date):
+                raise DocumentRejected()
+
+    def issue_date_field(self, line, data):
+        if self.state == 'PATN':
+            self.document_date = parse_date(data)
+            self.currentPatent['publicationDate'] = self.document_date
+
+    def title_field(self, line, data):
+        if self.state == 'PATN':
+            self.currentPatent['title'] = data
+
+    def name_field(self, line, data):
+        if self.state == 'INVT':
+            tokens = data.split(';')
+            if len(tokens) > 1:
+                name = tokens[1].strip() + ' ' + tokens[0].strip()
+            else:
+                name = tokens[0].strip()
+            self.inventors.append(name)
+
+        elif self.states['ASSG'] == 1:
+            self.assignees.append(data)
+
+    def classification_field(self, line, data):
+        if self.state == 'CLAS':
+            self.internationalClassifications.append(data)
+
+    def paragraph_field(self, line, data):
+        self.add_paragraph_data(data, True)
+
+    def continuation_field(self, line, data):
+        if line[3:4] == ' ':
+            self.add_paragraph_data(data, False)
 
     def is_paragraph_code(self, id_code):
         return id_code[:3] in self.paragraph_codes
 
     def add_paragraph_data(self, data, with_paragraph):
         if self.state == 'BSUM' or self.state == 'DETD' or self.state == 'DRWD':
-            self.description = APSHandler.append_data(self.description, data, with_paragraph)
+            if 'description' in self.text_fields:
+                self.description.append_paragraph(data, with_paragraph)
         elif self.state == 'ABST':
-            self.abstract = APSHandler.append_data(self.abstract, data, with_paragraph)
+            if 'abstract' in self.text_fields:
+                self.abstract.append_paragraph(data, with_paragraph)
         elif self.state == 'CLMS' or self.state == 'DCLM':
-            self.claims = APSHandler.append_data(self.claims, data, with_paragraph)
-
-    @staticmethod
-    def append_data(current_data, new_data, with_paragraph):
-        if with_paragraph and len(current_data) > 0:
-            current_data = current_data + '\n' + new_data
-        else:
-            current_data = current_data + ' ' + new_data
-        return current_data
+            if 'claims' in self.text_fields:
+                self.claims.append_paragraph(data, with_paragraph)
 
     def output(self):
-        self.currentPatent['abstract'] = self.abstract.strip()
-        self.currentPatent['description'] = self.description.strip()
-        self.currentPatent['claims'] = self.claims.strip()
+        if 'abstract' in self.text_fields:
+            self.currentPatent['abstract'] = self.abstract.value().strip()
+        if 'description' in self.text_fields:
+            self.currentPatent['description'] = self.description.value().strip()
+        if 'claims' in self.text_fields:
+            self.currentPatent['claims'] = self.claims.value().strip()
         self.currentPatent['inventors'] = self.inventors
         self.currentPatent['assignees'] = self.assignees
         self.currentPatent['internationalClassifications'] = self.internationalClassifications
@@ -0,0 +1,165 @@
+"""This module defines the manifest that makes decoding of a folder of patent bulks resumable.
+
+The manifest is a json file in the output folder with one entry per bulk zip file. Each entry records the
+size, modification time and sha1 hash of the source file, the parser version, the patent counts and the
+status of the last decoding run. A bulk only has to be decoded again if it is new, if its content changed
+or if it was decoded by another parser version. Bulks that could not be decoded are quarantined and
+skipped by later runs until their content changes.
+
+"""
+
+# standard library imports
+import os
+import json
+import hashlib
+
+# related third party imports
+# None
+
+# local application/library specific imports
+# None
+
+MANIFEST_FILE_NAME = 'manifest.json'
+
+STATUS_OK = 'ok'
+STATUS_QUARANTINED = 'quarantined'
+
+
+def file_signature(file_path):
+    """Returns the cheap signature (size and modification time) of a file
+
+    Parameters
+    ----------
+    file_path : str
+
+    Returns
+    -------
+    signature : dict
+    """
+    stat = os.stat(file_path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def file_hash(file_path, chunk_size=1 << 20):
+    """Returns the sha1 hash of the content of a file
+
+    Parameters
+    ----------
+    file_path : str
+    chunk_size : int
+
+    Returns
+    -------
+    hash : str
+    """
+    sha1 = hashlib.sha1()
+    with open(file_path, 'rb') as fp:
+        chunk = fp.read(chunk_size)
+        while len(chunk) > 0:
+            sha1.update(chunk)
+            chunk = fp.read(chunk_size)
+    return sha1.hexdigest()
+
+
+class BulkManifest:
+    def __init__(self, folder_out):
+        """Manifest of the bulk files decoded into folder_out
+
+        Parameters
+        ----------
+        folder_out : str
+        """
+        self.file_path = os.path.join(folder_out, MANIFEST_FILE_NAME)
+        self.entries = {}
+        if os.path.exists(self.file_path):
+            with open(self.file_path, 'r') as fp:
+                self.entries = json.load(fp)
+
+    def needs_decoding(self, zip_name, zip_path, parser_version, retry_quarantined=False):
+        """Checks if a bulk zip file has to be decoded (again)
+
+        Parameters
+        ----------
+        zip_name : str
+            name of the zip file, used as key in the manifest
+        zip_path : str
+        parser_version : str
+        retry_quarantined : bool
+            if true, quarantined bulks are decoded again even if their content did not change
+
+        Returns
+        -------
+        : bool
+        """
+        entry = self.entries.get(zip_name)
+        if entry is None:
+            return True
+        if not self._source_unchanged(entry, zip_path):
+            return True
+        if entry['status'] == STATUS_QUARANTINED:
+            return retry_quarantined or entry['parser_version'] != parser_version
+        # entries written before columnar outputs existed only record file_out
+        outputs = entry.get('outputs', [entry['file_out']])
+        return entry['parser_version'] != parser_version or not all(os.path.exists(path) for path in outputs)
+
+    @staticmethod
+    def _source_unchanged(entry, zip_path):
+        signature = file_signature(zip_path)
+        if signature['size'] != entry['size']:
+            return False
+        if signature['mtime'] == entry['mtime']:
+            return True
+        # the file has been touched (e.g. copied again), compare the content
+        if file_hash(zip_path) == entry['sha1']:
+            entry['mtime'] = signature['mtime']
+            return True
+        return False
+
+    def record(self, zip_name, signature, parser_version, decoding_result):
+        """Records the result of a decoding job
+
+        Outputs of the previous decoding of the bulk that the job did not write again (e.g. the record file
+        after a switch to the columnar format, or year partitions outside a new date range) are removed, so
+        that readers of folder_out never see a patent twice.
+
+        Parameters
+        ----------
+        zip_name : str
+        signature : dict
+            signature of the source file taken before the job was started
+        parser_version : str
+        decoding_result : dict
+            the dict returned by the decoding job
+
+        Returns
+        -------
+
+        """
+        outputs = decoding_result.get('outputs', [decoding_result['file_out']])
+        previous_entry = self.entries.get(zip_name)
+        if previous_entry is not None:
+            written = set(os.path.abspath(path) for path in outputs)
+            for path in previous_entry.get('outputs', [previous_entry['file_out']]):
+                if os.path.abspath(path) not in written and os.path.exists(path):
+                    os.remove(path)
+        self.entries[zip_name] = {'size': signature['size'],
+                                  'mtime': signature['mtime'],
+                                  'sha1': decoding_result.get('sha1'),
+                                  'parser_version': parser_version,
+                                  'file_out': decoding_result['file_out'],
+                                  'outputs': outputs,
+                                  'status': decoding_result['status'],
+                                  'error': decoding_result.get('error', ''),
+                                  'patents_parsed': decoding_result.get('patents_parsed', 0),
+                                  'patents_exported': decoding_result.get('patents_exported', 0)}
+
+    def quarantined(self):
+        """Returns the names of all quarantined bulk files"""
+        return [name for name, entry in self.entries.items() if entry['status'] == STATUS_QUARANTINED]
+
+    def save(self):
+        """Writes the manifest to disk, replacing the previous version atomically"""
+        tmp_path = self.file_path + '.tmp'
+        with open(tmp_path, 'w') as fp:
+            json.dump(self.entries, fp, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.file_path)
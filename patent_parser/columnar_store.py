@@ -0,0 +1,268 @@
+"""This module defines the columnar on-disk format of parsed patents.
+
+Patents of a bulk are stored column by column and partitioned by the year of their application date:
+
+    <folder_out>/<year>/<bulk name><suffix>
+
+If pyarrow is available, a partition file is an Arrow IPC file (suffix '.arrow') that is memory-mapped for
+reading. Otherwise a plain fallback format is used (suffix '.cols'): every batch of rows is stored as one
+pickled list per column, followed by a footer with the offsets of all column chunks.
+
+Readers only load the requested columns and evaluate the date, patent type and classification predicates
+of a PatentFilter on their columns before any other column of a batch is loaded.
+
+"""
+
+# standard library imports
+import os
+import pickle
+import struct
+
+# related third party imports
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# local application/library specific imports
+# None
+
+PATENT_COLUMNS = ('publicationNumber', 'publicationDate', 'applicationNumber', 'date', 'patentType', 'title',
+                  'abstract', 'claims', 'description', 'inventors', 'assignees',
+                  'internationalClassifications', 'cooperativeClassifications')
+
+ARROW_SUFFIX = '.arrow'
+COLUMNS_SUFFIX = '.cols'
+
+COLUMNS_MAGIC = b'ITRNCOL1'
+COLUMNS_TRAILER = struct.Struct('<Q8s')
+
+PARTIAL_FILE_SUFFIX = '.part'
+
+# columns needed to evaluate a PatentFilter
+FILTER_COLUMNS = ('date', 'patentType', 'internationalClassifications', 'cooperativeClassifications')
+
+if pa is not None:
+    ARROW_SCHEMA = pa.schema([('publicationNumber', pa.string()),
+                              ('publicationDate', pa.date32()),
+                              ('applicationNumber', pa.string()),
+                              ('date', pa.date32()),
+                              ('patentType', pa.string()),
+                              ('title', pa.string()),
+                              ('abstract', pa.string()),
+                              ('claims', pa.string()),
+                              ('description', pa.string()),
+                              ('inventors', pa.list_(pa.string())),
+                              ('assignees', pa.list_(pa.string())),
+                              ('internationalClassifications', pa.list_(pa.string())),
+                              ('cooperativeClassifications', pa.list_(pa.string()))])
+
+
+def is_columnar_file(file_path):
+    return file_path.endswith(ARROW_SUFFIX) or file_path.endswith(COLUMNS_SUFFIX)
+
+
+def partition_year(file_path):
+    """Returns the year of the partition a columnar patent file belongs to"""
+    return int(os.path.basename(os.path.dirname(file_path)))
+
+
+class ColumnarPatentWriter:
+    def __init__(self, file_out, batch_rows=1024, use_arrow=None):
+        """Writes parsed patents of a bulk into year partitions of a columnar patent store
+
+        Files are written with a '.part' suffix and renamed by close(), discard() removes them.
+
+        Parameters
+        ----------
+        file_out : str
+            <folder_out>/<bulk name>, the partition files are written to <folder_out>/<year>/
+        batch_rows : int
+            number of rows buffered per year before they are written as a batch
+        use_arrow : bool
+            write Arrow IPC files, None uses Arrow if pyarrow is available
+        """
+        self.folder_out = os.path.dirname(file_out)
+        self.part_name = os.path.basename(file_out)
+        self.batch_rows = batch_rows
+        self.use_arrow = pa is not None if use_arrow is None else use_arrow
+        if self.use_arrow and pa is None:
+            raise ImportError('pyarrow is required to write Arrow IPC files')
+        self.records_written = 0
+        # patents without application date have no partition and are not written
+        self.records_without_date = 0
+        self.rows = {}
+        self.files = {}
+
+    def file_paths(self):
+        """Returns the paths of all partition files written so far"""
+        suffix = ARROW_SUFFIX if self.use_arrow else COLUMNS_SUFFIX
+        return [os.path.join(self.folder_out, str(year), self.part_name + suffix) for year in sorted(self.files)]
+
+    def write(self, patent):
+        date = patent.get('date')
+        if date is None:
+            self.records_without_date += 1
+            return
+        year = date.year
+        if year not in self.rows:
+            self.rows[year] = []
+        self.rows[year].append(patent)
+        self.records_written += 1
+        if len(self.rows[year]) >= self.batch_rows:
+            self._flush(year)
+
+    def _flush(self, year):
+        rows = self.rows.pop(year, [])
+        if len(rows) == 0:
+            return
+        if year not in self.files:
+            os.makedirs(os.path.join(self.folder_out, str(year)), exist_ok=True)
+            if self.use_arrow:
+                self.files[year] = _ArrowPartitionFile(self._partition_path(year) + PARTIAL_FILE_SUFFIX)
+            else:
+                self.files[year] = _ColumnsPartitionFile(self._partition_path(year) + PARTIAL_FILE_SUFFIX)
+        self.files[year].write_batch({column: [row.get(column) for row in rows] for column in PATENT_COLUMNS})
+
+    def _partition_path(self, year):
+        suffix = ARROW_SUFFIX if self.use_arrow else COLUMNS_SUFFIX
+        return os.path.join(self.folder_out, str(year), self.part_name + suffix)
+
+    def close(self):
+        for year in list(self.rows):
+            self._flush(year)
+        for year, partition_file in self.files.items():
+            partition_file.close()
+            os.replace(self._partition_path(year) + PARTIAL_FILE_SUFFIX, self._partition_path(year))
+
+    def discard(self):
+        self.rows = {}
+        for year, partition_file in self.files.items():
+            partition_file.close()
+            os.remove(self._partition_path(year) + PARTIAL_FILE_SUFFIX)
+        self.files = {}
+
+
+class _ArrowPartitionFile:
+    def __init__(self, file_path):
+        self.sink = pa.OSFile(file_path, 'wb')
+        self.writer = pa.ipc.new_file(self.sink, ARROW_SCHEMA)
+
+    def write_batch(self, columns):
+        arrays = [pa.array(columns[field.name], type=field.type) for field in ARROW_SCHEMA]
+        self.writer.write_batch(pa.record_batch(arrays, schema=ARROW_SCHEMA))
+
+    def close(self):
+        self.writer.close()
+        self.sink.close()
+
+
+class _ColumnsPartitionFile:
+    def __init__(self, file_path):
+        self.fp = open(file_path, 'wb')
+        self.fp.write(COLUMNS_MAGIC)
+        self.batches = []
+
+    def write_batch(self, columns):
+        offsets = {}
+        for column in PATENT_COLUMNS:
+            chunk = pickle.dumps(columns[column], pickle.HIGHEST_PROTOCOL)
+            offsets[column] = (self.fp.tell(), len(chunk))
+            self.fp.write(chunk)
+        self.batches.append({'rows': len(columns[PATENT_COLUMNS[0]]), 'columns': offsets})
+
+    def close(self):
+        footer_offset = self.fp.tell()
+        pickle.dump({'columns': PATENT_COLUMNS, 'batches': self.batches}, self.fp, pickle.HIGHEST_PROTOCOL)
+        self.fp.write(COLUMNS_TRAILER.pack(footer_offset, COLUMNS_MAGIC))
+        self.fp.close()
+
+
+def read_columnar_patents(file_path, columns=None, patent_filter=None):
+    """Reads the patents of a columnar patent file one at a time
+
+    Parameters
+    ----------
+    file_path : str
+    columns : iterable(str)
+        columns to load, None loads all columns
+    patent_filter : PatentFilter
+        only patents accepted by the filter are returned, None returns all patents
+
+    Returns
+    -------
+    patents : generator(dict)
+        dicts with the requested columns, columns without value are left out as in parsed patent dicts
+    """
+    columns = PATENT_COLUMNS if columns is None else tuple(columns)
+    if file_path.endswith(ARROW_SUFFIX):
+        batches = _read_arrow_batches(file_path, columns, patent_filter)
+    else:
+        batches = _read_columns_batches(file_path, columns, patent_filter)
+    for batch in batches:
+        for row in range(len(batch[columns[0]])):
+            patent = {}
+            for column in columns:
+                value = batch[column][row]
+                if value is not None:
+                    patent[column] = value
+            yield patent
+
+
+def _row_mask(filter_columns, patent_filter):
+    """Evaluates a patent filter on the filter columns of a batch"""
+    mask = []
+    for patent_type, date, ipc, cpc in zip(filter_columns['patentType'], filter_columns['date'],
+                                           filter_columns['internationalClassifications'],
+                                           filter_columns['cooperativeClassifications']):
+        mask.append(patent_filter.accepts_patent_type('' if patent_type is None else patent_type)
+                    and patent_filter.accepts_date(date)
+                    and patent_filter.accepts_classifications(ipc or [], cpc or []))
+    return mask
+
+
+def _read_arrow_batches(file_path, columns, patent_filter):
+    source = pa.memory_map(file_path, 'r')
+    try:
+        reader = pa.ipc.open_file(source)
+        for batch_index in range(reader.num_record_batches):
+            batch = reader.get_batch(batch_index)
+            if patent_filter is not None:
+                mask = _row_mask({column: batch.column(column).to_pylist() for column in FILTER_COLUMNS},
+                                 patent_filter)
+                if not any(mask):
+                    continue
+                batch = batch.filter(pa.array(mask))
+            # only the requested columns of the selected rows are converted to python objects
+            yield {column: batch.column(column).to_pylist() for column in columns}
+    finally:
+        source.close()
+
+
+def _read_columns_batches(file_path, columns, patent_filter):
+    with open(file_path, 'rb') as fp:
+        fp.seek(-COLUMNS_TRAILER.size, os.SEEK_END)
+        footer_offset, magic = COLUMNS_TRAILER.unpack(fp.read(COLUMNS_TRAILER.size))
+        if magic != COLUMNS_MAGIC:
+            raise ValueError(file_path + ' is not a complete columnar patent file')
+        fp.seek(footer_offset)
+        footer = pickle.load(fp)
+
+        def read_column(batch_footer, column):
+            offset, length = batch_footer['columns'][column]
+            fp.seek(offset)
+            return pickle.loads(fp.read(length))
+
+        for batch_footer in footer['batches']:
+            if patent_filter is None:
+                yield {column: read_column(batch_footer, column) for column in columns}
+                continue
+            filter_columns = {column: read_column(batch_footer, column) for column in FILTER_COLUMNS}
+            mask = _row_mask(filter_columns, patent_filter)
+            if not any(mask):
+                continue
+            batch = {}
+            for column in columns:
+                values = filter_columns[column] if column in filter_columns else read_column(batch_footer, column)
+                batch[column] = [value for value, selected in zip(values, mask) if selected]
+            yield batch
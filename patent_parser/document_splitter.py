@@ -0,0 +1,134 @@
+"""This module defines the splitters that find the documents in USPTO bulk files.
+
+A bulk file is a concatenation of patent documents: XML files contain one XML document per patent, APS
+text files one PATN record per patent. The zip member is decompressed once into a temporary file that is
+memory-mapped, and the splitters scan the mapped buffer for document boundaries. They yield offset ranges
+into the buffer, so a document is copied only once, when it is handed to the parser.
+
+"""
+
+# standard library imports
+import os
+import mmap
+import shutil
+import tempfile
+
+# related third party imports
+# None
+
+# local application/library specific imports
+# None
+
+# common prefix of the declarations '<?xml version="1.0" encoding="UTF-8"?>' and '<?xml version="1.0"?>'
+XML_DECLARATION = b'<?xml version="1.0"'
+
+APS_RECORD_START = b'\nPATN'
+
+
+class MemberBuffer:
+    def __init__(self, zfile, name, tmp_dir=None):
+        """Decompresses a member of a zip file into a temporary file and memory-maps it
+
+        Use as context manager, the temporary file is removed on exit.
+
+        Parameters
+        ----------
+        zfile : zipfile.ZipFile
+        name : str
+            name of the member
+        tmp_dir : str
+            directory of the temporary file, None for the default temporary directory
+        """
+        self.zfile = zfile
+        self.name = name
+        self.tmp_dir = tmp_dir
+        self.tmp_path = None
+        self.tmp_file = None
+        self.buffer = None
+
+    def __enter__(self):
+        fd, self.tmp_path = tempfile.mkstemp(suffix='.tmp', prefix='.member-', dir=self.tmp_dir)
+        self.tmp_file = os.fdopen(fd, 'w+b')
+        with self.zfile.open(self.name, 'r') as member:
+            shutil.copyfileobj(member, self.tmp_file, 1 << 20)
+        self.tmp_file.flush()
+        if self.tmp_file.tell() == 0:
+            self.buffer = b''   # empty files cannot be memory-mapped
+        else:
+            self.buffer = mmap.mmap(self.tmp_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.buffer
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.tmp_file.close()
+        os.remove(self.tmp_path)
+
+
+def split_xml_documents(buffer):
+    """Finds the documents of a file with concatenated XML documents
+
+    A document starts at an XML declaration, the first document at the start of the buffer.
+
+    Parameters
+    ----------
+    buffer : bytes or mmap.mmap
+
+    Returns
+    -------
+    ranges : generator((int, int))
+        start and end offset of every document
+    """
+    start = 0
+    end = buffer.find(XML_DECLARATION, 1)
+    while end != -1:
+        yield start, end
+        start = end
+        end = buffer.find(XML_DECLARATION, start + 1)
+    if start < len(buffer):
+        yield start, len(buffer)
+
+
+def split_aps_records(buffer):
+    """Finds the patent records of an APS text file
+
+    A record starts at a line consisting of 'PATN' and optional trailing whitespace. Lines before the
+    first record (the file header) are skipped.
+
+    Parameters
+    ----------
+    buffer : bytes or mmap.mmap
+
+    Returns
+    -------
+    ranges : generator((int, int))
+        start and end offset of every record
+    """
+    start = _find_aps_record(buffer, 0)
+    while start != -1:
+        end = _find_aps_record(buffer, start + 1)
+        if end == -1:
+            yield start, len(buffer)
+            return
+        yield start, end
+        start = end
+
+
+def _find_aps_record(buffer, position):
+    """Returns the offset of the next 'PATN' line at or after position, -1 if there is none"""
+    if position == 0 and buffer[:4] == APS_RECORD_START[1:] and _is_blank_line_rest(buffer, 4):
+        return 0
+    position = buffer.find(APS_RECORD_START, max(position - 1, 0))
+    while position != -1:
+        if _is_blank_line_rest(buffer, position + 5):
+            return position + 1
+        position = buffer.find(APS_RECORD_START, position + 1)
+    return -1
+
+
+def _is_blank_line_rest(buffer, position):
+    """Returns True if the line ends at position apart from trailing whitespace, as APSHandler rstrips lines"""
+    end = buffer.find(b'\n', position)
+    if end == -1:
+        end = len(buffer)
+    return buffer[position:end].strip() == b''
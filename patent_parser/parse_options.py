@@ -0,0 +1,122 @@
+"""This module defines the options shared by the patent handlers of the different bulk formats.
+
+"""
+
+# standard library imports
+# None
+
+# related third party imports
+# None
+
+# local application/library specific imports
+# None
+
+# text fields a handler can materialize, ordered by their size in a typical patent
+TEXT_FIELDS = ('abstract', 'claims', 'description')
+
+
+def text_field_projection(text_fields=None):
+    """Validates the text fields a handler has to materialize
+
+    Parameters
+    ----------
+    text_fields : iterable(str)
+        subset of TEXT_FIELDS, None materializes all text fields
+
+    Returns
+    -------
+    text_fields : frozenset(str)
+    """
+    if text_fields is None:
+        return frozenset(TEXT_FIELDS)
+    text_fields = frozenset(text_fields)
+    unknown_fields = text_fields.difference(TEXT_FIELDS)
+    if len(unknown_fields) > 0:
+        raise ValueError('unknown text fields: ' + ', '.join(sorted(unknown_fields)))
+    return text_fields
+
+
+class DocumentRejected(Exception):
+    """Raised by a handler to abort parsing a document that is rejected by its patent filter"""
+    pass
+
+
+class PatentFilter:
+    def __init__(self, classification_prefixes=('H', 'G', 'Y'), patent_types=('utility',),
+                 date_from=None, date_to=None):
+        """Selects the patents to export based on their bibliographic data
+
+        Handlers evaluate the filter as soon as the respective fields are known, which is before the text
+        sections of a document. Rejected documents are aborted without accumulating any text.
+
+        Parameters
+        ----------
+        classification_prefixes : iterable(str)
+            a patent is accepted if any of its international or cooperative classifications starts with
+            one of the prefixes. None accepts all classifications.
+        patent_types : iterable(str)
+            accepted patent types ('utility', 'design', 'plant', ...). None accepts all types.
+        date_from : datetime.date
+            earliest accepted application date, None for no lower bound
+        date_to : datetime.date
+            latest accepted application date, None for no upper bound
+        """
+        self.classification_prefixes = None if classification_prefixes is None \
+            else tuple(sorted(classification_prefixes))
+        self.patent_types = None if patent_types is None else frozenset(patent_types)
+        self.date_from = date_from
+        self.date_to = date_to
+
+    def accepts_patent_type(self, patent_type):
+        return self.patent_types is None or patent_type in self.patent_types
+
+    def accepts_date(self, date):
+        if date is None:
+            return self.date_from is None and self.date_to is None
+        if self.date_from is not None and date < self.date_from:
+            return False
+        if self.date_to is not None and date > self.date_to:
+            return False
+        return True
+
+    def accepts_year(self, year):
+        """Checks if any date of a year can be accepted"""
+        if self.date_from is not None and year < self.date_from.year:
+            return False
+        if self.date_to is not None and year > self.date_to.year:
+            return False
+        return True
+
+    def accepts_classifications(self, international_classifications, cooperative_classifications):
+        if self.classification_prefixes is None:
+            return True
+        for classification in international_classifications:
+            if classification.startswith(self.classification_prefixes):
+                return True
+        for classification in cooperative_classifications:
+            if classification.startswith(self.classification_prefixes):
+                return True
+        return False
+
+    def accepts(self, patent):
+        """Evaluates the complete filter on a parsed patent
+
+        Parameters
+        ----------
+        patent : dict
+
+        Returns
+        -------
+        : bool
+        """
+        return self.accepts_patent_type(patent.get('patentType', '')) \
+            and self.accepts_date(patent.get('date')) \
+            and self.accepts_classifications(patent.get('internationalClassifications', []),
+                                             patent.get('cooperativeClassifications', []))
+
+    def signature(self):
+        """Describes the filter settings, used to detect bulks decoded with other settings"""
+        return repr((self.classification_prefixes,
+                     None if self.patent_types is None else tuple(sorted(self.patent_types)),
+                     None if self.date_from is None else self.date_from.isoformat(),
+                     None if self.date_to is None else self.date_to.isoformat()))
@@ -0,0 +1,82 @@
+"""This module defines the record-framed file format of parsed patent files.
+
+A parsed patent file is a sequence of pickled patent dicts, one pickle record per patent. The parser
+appends each patent as soon as it has been parsed and readers process one patent at a time, so neither
+side has to keep a whole weekly bulk in memory.
+
+Files written by earlier versions of the parser contain one pickled list of patent dicts.
+read_patent_records supports both layouts.
+
+"""
+
+# standard library imports
+import pickle
+
+# related third party imports
+# None
+
+# local application/library specific imports
+# None
+
+
+class PatentRecordWriter:
+    def __init__(self, file_path):
+        """Appends parsed patents to a record-framed patent file
+
+        Parameters
+        ----------
+        file_path : str
+            path of the file, an existing file is overwritten
+        """
+        self.file_path = file_path
+        self.records_written = 0
+        self.write_buffer = open(file_path, 'wb')
+
+    def write(self, patent):
+        """Appends a single patent record
+
+        Parameters
+        ----------
+        patent : dict
+
+        Returns
+        -------
+
+        """
+        pickle.dump(patent, self.write_buffer, pickle.HIGHEST_PROTOCOL)
+        self.records_written += 1
+
+    def close(self):
+        if not self.write_buffer.closed:
+            self.write_buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def read_patent_records(file_path):
+    """Reads the patents of a parsed patent file one at a time
+
+    Parameters
+    ----------
+    file_path : str
+
+    Returns
+    -------
+    patents : generator(dict)
+    """
+    with open(file_path, 'rb') as fp:
+        while True:
+            try:
+                record = pickle.load(fp)
+            except EOFError:
+                return
+            if isinstance(record, list):
+                # file written by earlier parser versions: one pickled list per bulk
+                for patent in record:
+                    yield patent
+            else:
+                yield record
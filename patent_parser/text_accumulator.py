@@ -0,0 +1,55 @@
+"""This module defines the text accumulator shared by the patent handlers.
+
+SAX and APS handlers receive the text of a section in many small pieces. Growing a string with
+str + str copies the whole string for every piece, which is quadratic in the length of a section.
+The accumulator collects the pieces and joins them once when the section is complete.
+
+"""
+
+# standard library imports
+# None
+
+# related third party imports
+# None
+
+# local application/library specific imports
+# None
+
+
+class TextAccumulator:
+    def __init__(self):
+        self.chunks = []
+        # last character of the accumulated text, '' if the text is empty
+        self.last_char = ''
+
+    def clear(self):
+        self.chunks = []
+        self.last_char = ''
+
+    def is_empty(self):
+        return self.last_char == ''
+
+    def append(self, data):
+        if len(data) > 0:
+            self.chunks.append(data)
+            self.last_char = data[-1]
+
+    def append_collapsing_newlines(self, data):
+        """Appends data unless it is a newline directly following another newline"""
+        if data == '\n' and self.last_char == '\n':
+            return
+        self.append(data)
+
+    def append_paragraph(self, data, with_paragraph):
+        """Appends data as new paragraph (separated by a newline) or as continuation (separated by a blank)"""
+        if with_paragraph and not self.is_empty():
+            self.append('\n')
+        else:
+            self.append(' ')
+        self.append(data)
+
+    def value(self):
+        text = ''.join(self.chunks)
+        # keep the joined text, so that repeated calls do not join again
+        self.chunks = [text] if len(text) > 0 else []
+        return text
@@ -8,10 +8,11 @@ https://github.com/hopped/uspto-patents-parsing-tools
 
 # standard library imports
 import os
+import mmap
 import zipfile
-import io
+from collections import deque
 from io import BytesIO
-import pickle
+from itertools import islice
 from multiprocessing import Pool, cpu_count
 from time import time
 
@@ -21,7 +22,30 @@ from lxml import etree
 # local application/library specific imports
 from patent_parser.xml_handler_V4 import SimpleXMLHandler
 from patent_parser.xml_handler_V2_5 import SimpleXMLHandlerV25
-from patent_parser.aps_parser import APSFileHandler, APSHandler
+from patent_parser.aps_parser import APSHandler
+from patent_parser.patent_records import PatentRecordWriter
+from patent_parser.columnar_store import ColumnarPatentWriter
+from patent_parser.parse_options import text_field_projection, PatentFilter, DocumentRejected
+from patent_parser.document_splitter import MemberBuffer, split_xml_documents, split_aps_records
+from patent_parser.bulk_manifest import BulkManifest, file_hash, file_signature, STATUS_OK, STATUS_QUARANTINED
+
+# version of the parser output, bulks decoded by another version are decoded again
+PARSER_VERSION = '2'
+
+PARTIAL_FILE_SUFFIX = '.part'
+
+FORMAT_APS = 'aps'
+FORMAT_XML_V25 = 'xml_v2.5'
+FORMAT_XML_V4 = 'xml_v4'
+
+# output formats: record-framed pickle files or year-partitioned columnar files (columnar_store)
+OUTPUT_RECORDS = 'records'
+OUTPUT_COLUMNAR = 'columnar'
+
+# size of the document batches parsed by one worker when a single bulk is parsed across a process pool
+BATCH_BYTES = 16 << 20
+# batches submitted to the pool per worker process and not yet yielded, bounds the parsed patents in memory
+BATCHES_IN_FLIGHT_PER_PROCESS = 2
 
 
 class XMLFileHandler:
@@ -61,86 +85,281 @@ class XMLFileHandler:
         yield output
 
 
-def _run_decoding_job(job):
+def _document_format(member_name):
+    """determine the document format of a bulk file member based on file naming"""
+    if os.path.basename(member_name).startswith('pftaps'):
+        return FORMAT_APS
+    elif os.path.basename(member_name).startswith('pg0'):
+        return FORMAT_XML_V25
+    return FORMAT_XML_V4
+
+
+def _parse_document(document, document_format, text_fields, patent_filter):
+    """Parses a single patent document
+
+    Parameters
+    ----------
+    document : bytes
+    document_format : str
+        FORMAT_APS, FORMAT_XML_V25 or FORMAT_XML_V4
+    text_fields : iterable(str)
+    patent_filter : PatentFilter
+
+    Returns
+    -------
+    patent : dict
+        None if the document has been rejected by the patent filter
+    """
+    # the handlers evaluate the patent filter on the bibliographic data and abort rejected
+    # documents before their text sections
+    try:
+        if document_format == FORMAT_APS:
+            myparser = APSHandler(text_fields, patent_filter)
+            myparser.feed(document.decode('utf-8', errors='replace'))
+            return myparser.output()
+
+        if document_format == FORMAT_XML_V25:
+            xml_handler = SimpleXMLHandlerV25(text_fields, patent_filter)
+        else:
+            xml_handler = SimpleXMLHandler(text_fields, patent_filter)
+        myparser = etree.XMLParser(target=xml_handler, resolve_entities=False, load_dtd=False, recover=True)
+        return etree.fromstring(document, myparser)
+    except DocumentRejected:
+        return None
+
+
+def _parse_documents(buffer, document_ranges, document_format, text_fields, patent_filter):
+    """Parses the documents at the given offset ranges of a buffer
+
+    Returns
+    -------
+    patents : generator(dict)
+        the accepted patents in document order, None for every rejected document
+    """
+    for document_start, document_end in document_ranges:
+        patent = _parse_document(buffer[document_start:document_end], document_format, text_fields, patent_filter)
+        # documents without complete bibliographic data are checked after parsing
+        if patent is not None and patent_filter.accepts(patent):
+            yield patent
+        else:
+            yield None
+
+
+def _run_batch_job(batch_job):
+    """Parses a batch of documents of a decompressed bulk member, called by an individual worker process
+
+    Parameters
+    ----------
+    batch_job : dict
+        This parameter has to be filled with items associated to the following keys
+        'batch_index', 'buffer_path', 'document_ranges', 'document_format', 'text_fields', 'patent_filter'
+
+    Returns
+    -------
+    batch_index : int
+    patents : list(dict)
+        the accepted patents in document order, None for every rejected document
+    """
+    with open(batch_job['buffer_path'], 'rb') as fp:
+        buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            patents = list(_parse_documents(buffer, batch_job['document_ranges'], batch_job['document_format'],
+                                            batch_job['text_fields'], batch_job['patent_filter']))
+        finally:
+            buffer.close()
+    return batch_job['batch_index'], patents
+
+
+def _parse_documents_in_pool(pool, buffer_path, document_ranges, document_format, text_fields, patent_filter):
+    """Parses the documents of a decompressed bulk member in batches across a process pool
+
+    The workers memory-map the same temporary file. A sliding window of BATCHES_IN_FLIGHT_PER_PROCESS batches
+    per worker process is submitted to the pool and the batches are yielded in document order, so
+    the output is identical to _parse_documents.
+
+    Returns
+    -------
+    patents : generator(dict)
+        the accepted patents in document order, None for every rejected document
+    """
+    batch_jobs = _batch_jobs(buffer_path, document_ranges, document_format, text_fields, patent_filter)
+    # the pool does not expose its size otherwise
+    max_batches_in_flight = BATCHES_IN_FLIGHT_PER_PROCESS * pool._processes
+    batches_in_flight = deque(pool.apply_async(_run_batch_job, (batch_job,))
+                              for batch_job in islice(batch_jobs, max_batches_in_flight))
+    while len(batches_in_flight) > 0:
+        batch_index, patents = batches_in_flight.popleft().get()
+        # the next batch is submitted before the patents are yielded, so the workers stay busy
+        for batch_job in islice(batch_jobs, 1):
+            batches_in_flight.append(pool.apply_async(_run_batch_job, (batch_job,)))
+        for patent in patents:
+            yield patent
+
+
+def _batch_jobs(buffer_path, document_ranges, document_format, text_fields, patent_filter):
+    """Returns the batch jobs of the documents of a decompressed bulk member, see _run_batch_job
+
+    Returns
+    -------
+    batch_jobs : generator(dict)
+    """
+    batch_index = 0
+    batch_ranges = []
+    batch_bytes = 0
+    for document_range in document_ranges:
+        batch_ranges.append(document_range)
+        batch_bytes += document_range[1] - document_range[0]
+        if batch_bytes >= BATCH_BYTES:
+            yield _batch_job(batch_index, buffer_path, batch_ranges, document_format, text_fields, patent_filter)
+            batch_index += 1
+            batch_ranges = []
+            batch_bytes = 0
+    if len(batch_ranges) > 0:
+        yield _batch_job(batch_index, buffer_path, batch_ranges, document_format, text_fields, patent_filter)
+
+
+def _batch_job(batch_index, buffer_path, document_ranges, document_format, text_fields, patent_filter):
+    return {'batch_index': batch_index, 'buffer_path': buffer_path, 'document_ranges': document_ranges,
+            'document_format': document_format, 'text_fields': text_fields, 'patent_filter': patent_filter}
+
+
+def _run_decoding_job(job, pool=None):
+    """Decodes all patents of a bulk zip file into a record-framed patent file or a columnar patent store
+
+    Parameters
+    ----------
+    job : dict
+        This parameter has to be filled with items associated to the following keys
+        'zip_file', 'file_out' and optionally 'text_fields', 'patent_filter' and 'output_format'
+    pool : multiprocessing.Pool
+        if given, the documents of the bulk are parsed in batches across the pool, otherwise
+        the bulk is parsed by the calling process
+
+    Returns
+    -------
+    result : dict
+        'zip_file', 'file_out', 'outputs' (the files written), 'sha1', 'status' ('ok' or 'quarantined'),
+        'error', 'patents_parsed', 'patents_exported' and 'patents_rejected', for the columnar format also
+        'patents_without_date' (patents that have no year partition and are skipped)
+    """
     file_out = job['file_out']
     zip_file = job['zip_file']
-    write_buffer = io.open(file_out, 'wb')
+    text_fields = job.get('text_fields')
+    patent_filter = job.get('patent_filter', PatentFilter())
+    output_format = job.get('output_format', OUTPUT_RECORDS)
+    result = {'zip_file': zip_file, 'file_out': file_out, 'outputs': [], 'status': STATUS_QUARANTINED, 'error': '',
+              'patents_parsed': 0, 'patents_exported': 0, 'patents_rejected': 0}
     try:
+        result['sha1'] = file_hash(zip_file)
         zfile = zipfile.ZipFile(zip_file, 'r')
-    except zipfile.BadZipfile:
-        return 'error'
+    except (zipfile.BadZipfile, OSError) as e:
+        result['error'] = repr(e)
+        print(zip_file + ': ' + result['error'])
+        return result
     print('process ' + str(zip_file))
     patents_within_document = 0
     relevant_documents = 0
-    classification_matches = 0
-    cooperative_classification_matches = 0
-    patents = []
+    rejected_documents = 0
     start = time()
-    for name in zfile.namelist():
-        if not name.endswith('.xml') and not name.endswith('.sgml') and not name.endswith('.txt'):
-            continue
-        # determine hadler for the document format based on file naming
-        if os.path.basename(name).startswith('pftaps'):
-            f = APSFileHandler(zfile.open(name, 'r'))
-        else:
-            f = XMLFileHandler(zfile.open(name, 'r'))
-
-        for elem in f.list_xmls():
-            # debug start
-            # z = codecs.open('debug.txt', 'w', 'utf-8')
-            # z.write(elem.getvalue())
-            # z.close()
-            # debug end
-            if os.path.basename(name).startswith('pftaps'):
-                myparser = APSHandler()
-                myparser.feed(elem.getvalue())
-                result = myparser.output()
-            else:
-                if os.path.basename(name).startswith('pg0'):
-                    xml_handler = SimpleXMLHandlerV25()
+    # write to temporary files first, so that an interrupted run never leaves a valid-looking output
+    if output_format == OUTPUT_COLUMNAR:
+        writer = ColumnarPatentWriter(file_out)
+    else:
+        writer = PatentRecordWriter(file_out + PARTIAL_FILE_SUFFIX)
+    decoded = False
+    try:
+        for name in zfile.namelist():
+            if not name.endswith('.xml') and not name.endswith('.sgml') and not name.endswith('.txt'):
+                continue
+            document_format = _document_format(name)
+            # the member is decompressed once and split into documents by offset ranges
+            member_buffer = MemberBuffer(zfile, name, os.path.dirname(os.path.abspath(file_out)))
+            with member_buffer as buffer:
+                if document_format == FORMAT_APS:
+                    document_ranges = split_aps_records(buffer)
+                else:
+                    document_ranges = split_xml_documents(buffer)
+
+                if pool is None:
+                    patents = _parse_documents(buffer, document_ranges, document_format, text_fields, patent_filter)
                 else:
-                    xml_handler = SimpleXMLHandler()
-
-                myparser = etree.XMLParser(target=xml_handler, resolve_entities=False, load_dtd=False, recover=True)
-                result = etree.parse(elem, myparser)
-            relevant_classification = False
-            for ipc in result.get('internationalClassifications', []):
-                if ipc[0] == 'H' or ipc[0] == 'G' or ipc[0] == 'Y':
-                    relevant_classification = True
-                    classification_matches += 1
-                    break
-
-            for ipc in result.get('cooperativeClassifications', []):
-                if ipc[0] == 'H' or ipc[0] == 'G' or ipc[0] == 'Y':
-                    relevant_classification = True
-                    cooperative_classification_matches += 1
-                    break
-
-            if result.get('patentType', '') == 'utility' and relevant_classification:
-                patents.append(result)
-                relevant_documents += 1
-
-            write_buffer.flush()
-            patents_within_document = patents_within_document + 1
+                    patents = _parse_documents_in_pool(pool, member_buffer.tmp_path, document_ranges,
+                                                       document_format, text_fields, patent_filter)
+                for patent in patents:
+                    patents_within_document = patents_within_document + 1
+                    if patent is not None:
+                        writer.write(patent)
+                        relevant_documents += 1
+                    else:
+                        rejected_documents += 1
+        decoded = True
+    except Exception as e:
+        # the bulk is corrupt or cannot be parsed: report the bulk for quarantine
+        result['error'] = repr(e)
+        print(zip_file + ': ' + result['error'])
+        return result
+    finally:
         zfile.close()
-    pickle.dump(patents, write_buffer, pickle.HIGHEST_PROTOCOL)
+        if not decoded:
+            # drop the partial output, also if the decoding is interrupted
+            if output_format == OUTPUT_COLUMNAR:
+                writer.discard()
+            else:
+                writer.close()
+                os.remove(file_out + PARTIAL_FILE_SUFFIX)
+    writer.close()
+    if output_format == OUTPUT_COLUMNAR:
+        result['outputs'] = writer.file_paths()
+        if writer.records_without_date > 0:
+            relevant_documents -= writer.records_without_date
+            print(file_out + ': ' + str(writer.records_without_date) + ' patents without application date skipped.')
+        result['patents_without_date'] = writer.records_without_date
+    else:
+        os.replace(file_out + PARTIAL_FILE_SUFFIX, file_out)
+        result['outputs'] = [file_out]
     print(file_out + ': ' + str(patents_within_document) + ' patents parsed. ' + str(
-        relevant_documents) + ' patents exported.   '
-          + str(classification_matches) + ' patents with matching international classifications.   '
-          + str(cooperative_classification_matches) + ' patents with matching cooperative classifications')
+        relevant_documents) + ' patents exported.   ' + str(rejected_documents) + ' patents rejected by filter.')
     elapsed = (time() - start)
     print(str(elapsed) + ' seconds elapsed in total.')
-    return file_out
+    result['status'] = STATUS_OK
+    result['patents_parsed'] = patents_within_document
+    result['patents_exported'] = relevant_documents
+    result['patents_rejected'] = rejected_documents
+    return result
 
 
 class PatentExtractor:
-    def __init__(self):
+    def __init__(self, text_fields=None, patent_filter=None, output_format=OUTPUT_RECORDS):
+        """Decodes USPTO bulk files into record-framed patent files or a columnar patent store
+
+        Parameters
+        ----------
+        text_fields : iterable(str)
+            text fields ('abstract', 'claims', 'description') to materialize. Text sections that are not
+            listed are skipped while parsing and not exported. None exports all text fields.
+        patent_filter : PatentFilter
+            selects the patents exported from bulk files. None exports utility patents with H, G or Y
+            classifications.
+        output_format : str
+            output format of decoded bulks: OUTPUT_RECORDS writes one record-framed patent file per bulk,
+            OUTPUT_COLUMNAR writes the patents of a bulk into the year partitions of a columnar patent store
+            (see columnar_store). decode_patent_file always writes a record-framed patent file.
+        """
+        if output_format not in (OUTPUT_RECORDS, OUTPUT_COLUMNAR):
+            raise ValueError('unknown output format: ' + str(output_format))
         self.patents_count = 0
         self.parser = None
+        self.text_fields = text_field_projection(text_fields)
+        self.patent_filter = PatentFilter() if patent_filter is None else patent_filter
+        self.output_format = output_format
+
+    def _output_version(self):
+        """Identifies parser version and options, bulks decoded with other settings are decoded again"""
+        return PARSER_VERSION + ':' + ','.join(sorted(self.text_fields)) + ':' + self.patent_filter.signature() \
+            + ':' + self.output_format
 
     def decode_patent_file(self, file_in, file_out):
         dtd = False
-        write_buffer = io.open(file_out, 'wb')
         self.patents_count = 0
 
         if file_in is not None:
@@ -148,47 +367,111 @@ class PatentExtractor:
             f = open(file_in, 'r')
             # determine hadler for the document format based on file naming
             if os.path.basename(file_in).startswith('pftaps'):
-                self.parser = APSHandler()
+                self.parser = APSHandler(self.text_fields)
                 for line in f.readlines():
                     self.parser.feed(line)
                 result = self.parser.output()
             else:
                 if os.path.basename(file_in).startswith('pg0'):
-                    xml_handler = SimpleXMLHandlerV25()
+                    xml_handler = SimpleXMLHandlerV25(self.text_fields)
                 else:
-                    xml_handler = SimpleXMLHandler()
+                    xml_handler = SimpleXMLHandler(self.text_fields)
 
                 self.parser = etree.XMLParser(target=xml_handler, resolve_entities=False, load_dtd=dtd, recover=True)
                 result = etree.parse(f, self.parser)
-            pickle.dump(result, write_buffer, pickle.HIGHEST_PROTOCOL)
-            write_buffer.flush()
+            with PatentRecordWriter(file_out) as writer:
+                writer.write(result)
             elapsed = (time() - start)
             print(str(elapsed) + ' seconds elapsed in total.')
 
-    @staticmethod
-    def decode_patent_zip(file_in, file_out):
+    def decode_patent_zip(self, file_in, file_out, processes=1):
+        """Decodes a single bulk zip file
+
+        Parameters
+        ----------
+        file_in : str
+        file_out : str
+        processes : int
+            number of worker processes. With more than one process the documents of the bulk are
+            parsed in batches across a process pool, the output is identical to the serial decoding.
+
+        Returns
+        -------
+
+        """
         decode_jobs = []
-        decode_job = {'file_out': file_out, 'zip_file': file_in}
+        decode_job = {'file_out': file_out, 'zip_file': file_in, 'text_fields': self.text_fields,
+                      'patent_filter': self.patent_filter, 'output_format': self.output_format}
         decode_jobs.append(decode_job)
-        results = _run_decoding_job(decode_job)
+        if processes > 1:
+            pool = Pool(processes=processes)
+            results = _run_decoding_job(decode_job, pool)
+            pool.close()
+            pool.join()
+        else:
+            results = _run_decoding_job(decode_job)
         print(results)
 
-    @staticmethod
-    def decode_patent_folder(folder_in, folder_out):
+    def decode_patent_folder(self, folder_in, folder_out, retry_quarantined=False, split_bulks=False):
+        """Decodes all bulk zip files of folder_in that are new or changed since the last run
+
+        The state of every bulk is kept in the manifest of folder_out. Bulks that cannot be decoded are
+        quarantined and skipped by subsequent runs until their content changes or retry_quarantined is set.
+        Bulks are scheduled largest first.
+
+        Parameters
+        ----------
+        folder_in : str
+        folder_out : str
+        retry_quarantined : bool
+        split_bulks : bool
+            if false, every worker process decodes a whole bulk. If true, the bulks are decoded one after
+            another and the documents of each bulk are parsed in batches across all worker processes,
+            which keeps all cores busy if there are only a few (large) bulks to decode.
+
+        Returns
+        -------
+
+        """
         if folder_in is not None:
+            os.makedirs(folder_out, exist_ok=True)
+            manifest = BulkManifest(folder_out)
             decode_jobs = []
-            for zip_file in os.listdir(folder_in):
-                file_out = folder_out + '/' + zip_file.replace('.zip', '')
-                zip_file = folder_in + '/' + zip_file
-                if not zip_file.endswith('zip'):
+            skipped = 0
+            for zip_name in sorted(os.listdir(folder_in)):
+                if not zip_name.endswith('zip'):
+                    continue
+                zip_file = os.path.join(folder_in, zip_name)
+                if not manifest.needs_decoding(zip_name, zip_file, self._output_version(), retry_quarantined):
+                    skipped += 1
                     continue
-                if zip_file.endswith('pa030501.zip'):
-                    continue  # that file is corrupt
-                decode_job = {'file_out': file_out, 'zip_file': zip_file}
+                decode_job = {'file_out': os.path.join(folder_out, zip_name.replace('.zip', '')),
+                              'zip_file': zip_file,
+                              'zip_name': zip_name,
+                              'text_fields': self.text_fields,
+                              'patent_filter': self.patent_filter,
+                              'output_format': self.output_format,
+                              'signature': file_signature(zip_file)}
                 decode_jobs.append(decode_job)
+            # persist refreshed modification times of unchanged bulks
+            manifest.save()
+            print(str(len(decode_jobs)) + ' bulks to decode, ' + str(skipped) + ' bulks up to date.')
 
-            pool = Pool(processes=cpu_count() - 1)
-            results = pool.map(_run_decoding_job, decode_jobs)
+            # start with the largest bulks, so that a large bulk does not determine the wall time at the end
+            decode_jobs.sort(key=lambda job: job['signature']['size'], reverse=True)
+            pool = Pool(processes=max(cpu_count() - 1, 1))
+            if split_bulks:
+                results = (_run_decoding_job(job, pool) for job in decode_jobs)
+            else:
+                results = pool.imap_unordered(_run_decoding_job, decode_jobs)
+            jobs_by_zip_file = {job['zip_file']: job for job in decode_jobs}
+            for result in results:
+                job = jobs_by_zip_file[result['zip_file']]
+                manifest.record(job['zip_name'], job['signature'], self._output_version(), result)
+                # save after each bulk, so that an interrupted run can be resumed
+                manifest.save()
             pool.close()
             pool.join()
-            print(results)
+            quarantined = manifest.quarantined()
+            if len(quarantined) > 0:
+                print('Quarantined bulks: ' + ', '.join(quarantined))
@@ -1,22 +1,32 @@
 # standard library imports
 import datetime
 
+# local application/library specific imports
+from patent_parser.parse_options import text_field_projection, DocumentRejected
+from patent_parser.text_accumulator import TextAccumulator
+
 
 class SimpleXMLHandlerV25(object):
 
-    def __init__(self):
+    def __init__(self, text_fields=None, patent_filter=None):
         self.inventors = self.assignees = self.internationalClassifications = self.cooperativeClassifications = \
-            self.patentType = self.description = self.document_id = self.document_date = self.personName = \
+            self.patentType = self.document_id = self.document_date = self.personName = \
             self.orgName = self.classification = None
         self.currentTag = ''
         self.currentContent = {}
-        self.claims = ''
-        self.abstract = ''
+        self.claims = TextAccumulator()
+        self.abstract = TextAccumulator()
+        self.description = TextAccumulator()
         self.currentPatent = {}
         self.descriptionActive = False
         self.abstractActive = False
         self.claimsActive = False
         self.citationActive = False
+        # text fields to materialize, other text sections are skipped without buffering
+        self.textFields = text_field_projection(text_fields)
+        self.skippedSection = None
+        # patent filter evaluated on the bibliographic data, rejected documents are aborted
+        self.patentFilter = patent_filter
 
         self.tagToField = {'B130': 'kind',
                            'B190': 'country',
@@ -34,7 +44,13 @@ class SimpleXMLHandlerV25(object):
                            'B512': 'IPC-further'
                            }
 
+        self.sectionFields = {'SDOAB': 'abstract',
+                              'SDOCL': 'claims',
+                              'SDODE': 'description'}
+
     def start(self, tag, attributes):
+        if self.skippedSection is not None:
+            return
         if tag == 'PATDOC':
             self.currentPatent = {}
             self.currentContent = {}
@@ -49,28 +65,35 @@ class SimpleXMLHandlerV25(object):
 
         if tag != 'PDAT' and tag != 'DNUM' and tag != 'STEXT':
             self.currentTag = self.tagToField.get(tag, '')
-        if tag == 'SDOCL':
+        if tag in self.sectionFields and self.sectionFields[tag] not in self.textFields:
+            self.skippedSection = tag
+        elif tag == 'SDOCL':
             self.claimsActive = True
-            self.claims = ''
+            self.claims.clear()
         elif tag == 'SDOAB':
             self.abstractActive = True
-            self.abstract = ''
+            self.abstract.clear()
         elif tag == 'SDODE':
             self.descriptionActive = True
-            self.description = ''
+            self.description.clear()
 
     def data(self, data):
+        if self.skippedSection is not None:
+            return
         if self.descriptionActive:
-            self.description = self.description + data
+            self.description.append(data)
         elif self.abstractActive:
-            self.abstract = self.abstract + data
+            self.abstract.append(data)
         elif self.claimsActive:
-            if not (self.claims.endswith('\n') and data == '\n'):
-                self.claims = self.claims + data
+            self.claims.append_collapsing_newlines(data)
         elif len(self.currentTag) > 0 and data != '\n':
             self.currentContent[self.currentTag] = data
 
     def end(self, tag):
+        if self.skippedSection is not None:
+            if tag == self.skippedSection:
+                self.skippedSection = None
+            return
         if tag == 'B100':
             self.document_id = self.currentContent['country'] + self.currentContent['doc-number'] + self.currentContent[
                 'kind']
@@ -91,6 +114,8 @@ class SimpleXMLHandlerV25(object):
             self.currentPatent['publicationNumber'] = self.document_id
             self.currentPatent['publicationDate'] = self.document_date
             self.currentPatent['patentType'] = self.patentType
+            if self.patentFilter is not None and not self.patentFilter.accepts_patent_type(self.patentType):
+                raise DocumentRejected()
 
         elif tag == 'B540':
             self.currentPatent['title'] = self.currentContent.get(self.tagToField.get(tag, ''))
@@ -102,6 +127,8 @@ class SimpleXMLHandlerV25(object):
                 self.document_date = datetime.date(1337, 1, 1)
             self.currentPatent['date'] = self.document_date
             self.currentPatent['applicationNumber'] = self.currentContent['applicationNumber']
+            if self.patentFilter is not None and not self.patentFilter.accepts_date(self.document_date):
+                raise DocumentRejected()
 
         elif tag == 'PARTY-US':
             self.personName = self.currentContent.get('first-name', '')
@@ -127,15 +154,15 @@ class SimpleXMLHandlerV25(object):
             self.currentPatent['assignees'] = self.assignees
 
         elif tag == 'SDOAB':
-            self.currentPatent['abstract'] = self.abstract.strip()
+            self.currentPatent['abstract'] = self.abstract.value().strip()
             self.abstractActive = False
 
         elif tag == 'SDODE':
-            self.currentPatent['description'] = self.description.strip()
+            self.currentPatent['description'] = self.description.value().strip()
             self.descriptionActive = False
 
         elif tag == 'SDOCL':
-            self.currentPatent['claims'] = self.claims.strip()
+            self.currentPatent['claims'] = self.claims.value().strip()
             self.claimsActive = False
 
         elif tag == 'B510':
@@ -147,5 +174,12 @@ class SimpleXMLHandlerV25(object):
             self.currentPatent['internationalClassifications'] = self.internationalClassifications
             self.internationalClassifications = []
 
+        # all classifications are known at the end of the bibliographic data, before any text section
+        elif tag == 'SDOBI':
+            if self.patentFilter is not None:
+                if not self.patentFilter.accepts_classifications(
+                        self.currentPatent.get('internationalClassifications', []), []):
+                    raise DocumentRejected()
+
     def close(self):
         return self.currentPatent
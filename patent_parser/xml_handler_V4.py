@@ -1,21 +1,31 @@
 # standard library imports
 import datetime
 
+# local application/library specific imports
+from patent_parser.parse_options import text_field_projection, DocumentRejected
+from patent_parser.text_accumulator import TextAccumulator
+
 
 class SimpleXMLHandler(object):
-    def __init__(self):
+    def __init__(self, text_fields=None, patent_filter=None):
         self.inventors = self.assignees = self.internationalClassifications = self.cooperativeClassifications = \
-            self.patentType = self.description = self.document_id = self.document_date = self.personName = \
+            self.patentType = self.document_id = self.document_date = self.personName = \
             self.orgName = self.classification = None
         self.currentTag = ''
         self.currentContent = {}
-        self.claims = ''
-        self.abstract = ''
+        self.claims = TextAccumulator()
+        self.abstract = TextAccumulator()
+        self.description = TextAccumulator()
         self.currentPatent = {}
         self.descriptionActive = False
         self.abstractActive = False
         self.claimsActive = False
         self.citationActive = False
+        # text fields to materialize, other text sections are skipped without buffering
+        self.textFields = text_field_projection(text_fields)
+        self.skippedSection = None
+        # patent filter evaluated on the bibliographic data, rejected documents are aborted
+        self.patentFilter = patent_filter
         self.tagReplacements = {'organization-name': 'orgname',
                                 'applicants': 'inventors',
                                 'country-code': 'country',
@@ -53,7 +63,13 @@ class SimpleXMLHandler(object):
                            'classification-value': 'classification-value'
                            }
 
+        self.sectionFields = {'abstract': 'abstract',
+                              'claims': 'claims',
+                              'description': 'description'}
+
     def start(self, tag, attributes):
+        if self.skippedSection is not None:
+            return
         if tag == 'us-patent-grant':
             self.currentPatent = {}
             self.currentContent = {}
@@ -67,32 +83,39 @@ class SimpleXMLHandler(object):
             self.citationActive = False
 
         self.currentTag = self.tagToField.get(self.tagReplacements.get(tag, tag), '')
-        if tag == 'application-reference':
+        if tag in self.sectionFields and self.sectionFields[tag] not in self.textFields:
+            self.skippedSection = tag
+        elif tag == 'application-reference':
             self.patentType = attributes.get('appl-type', 'undef')
         elif tag == 'claims':
             self.claimsActive = True
-            self.claims = ''
+            self.claims.clear()
         elif tag == 'abstract':
             self.abstractActive = True
-            self.abstract = ''
+            self.abstract.clear()
         elif tag == 'description':
             self.descriptionActive = True
-            self.description = ''
+            self.description.clear()
         elif tag == 'citation':
             self.citationActive = True
 
     def data(self, data):
+        if self.skippedSection is not None:
+            return
         if self.descriptionActive:
-            self.description = self.description + data
+            self.description.append(data)
         elif self.abstractActive:
-            self.abstract = self.abstract + data
+            self.abstract.append(data)
         elif self.claimsActive:
-            if not (self.claims.endswith('\n') and data == '\n'):
-                self.claims = self.claims + data
+            self.claims.append_collapsing_newlines(data)
         elif len(self.currentTag) > 0 and data != '\n':
             self.currentContent[self.currentTag] = data
 
     def end(self, tag):
+        if self.skippedSection is not None:
+            if tag == self.skippedSection:
+                self.skippedSection = None
+            return
         if tag == 'document-id':
             self.document_id = self.currentContent['country'] + self.currentContent['doc-number'] \
                                + self.currentContent['kind']
@@ -109,6 +132,10 @@ class SimpleXMLHandler(object):
             self.currentPatent['applicationNumber'] = self.document_id
             self.currentPatent['date'] = self.document_date
             self.currentPatent['patentType'] = self.patentType
+            if self.patentFilter is not None:
+                if not (self.patentFilter.accepts_patent_type(self.patentType)
+                        and self.patentFilter.accepts_date(self.document_date)):
+                    raise DocumentRejected()
 
         elif tag == 'invention-title':
             self.currentPatent['title'] = self.currentContent.get(tag, '')
@@ -137,15 +164,15 @@ class SimpleXMLHandler(object):
             self.currentPatent['assignees'] = self.assignees
 
         elif tag == 'abstract':
-            self.currentPatent['abstract'] = self.abstract.strip()
+            self.currentPatent['abstract'] = self.abstract.value().strip()
             self.abstractActive = False
 
         elif tag == 'description':
-            self.currentPatent['description'] = self.description.strip()
+            self.currentPatent['description'] = self.description.value().strip()
             self.descriptionActive = False
 
         elif tag == 'claims':
-            self.currentPatent['claims'] = self.claims.strip()
+            self.currentPatent['claims'] = self.claims.value().strip()
             self.claimsActive = False
 
         elif tag == 'classification-ipcr':
@@ -182,5 +209,13 @@ class SimpleXMLHandler(object):
         elif tag == 'citation':
             self.citationActive = False
 
+        # all classifications are known at the end of the bibliographic data, before any text section
+        elif tag == 'us-bibliographic-data-grant':
+            if self.patentFilter is not None:
+                if not self.patentFilter.accepts_classifications(
+                        self.currentPatent.get('internationalClassifications', []),
+                        self.currentPatent.get('cooperativeClassifications', [])):
+                    raise DocumentRejected()
+
     def close(self):
         return self.currentPatent
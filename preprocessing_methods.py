@@ -3,12 +3,21 @@
 """
 
 # standard library imports
+import os
+import pickle
+import queue
+import re
 import string
+import timeit
+import traceback
+from collections import OrderedDict
+from functools import partial
+from multiprocessing.util import Finalize
 
 # related third party imports
 from nltk.corpus import wordnet, stopwords
 from nltk.tokenize import MWETokenizer
-from nltk.tokenize import sent_tokenize
+from nltk.tokenize import sent_tokenize, word_tokenize
 from nltk.stem import WordNetLemmatizer
 from nltk.tag.perceptron import PerceptronTagger
 
@@ -16,12 +25,219 @@ from nltk.tag.perceptron import PerceptronTagger
 from nodes import *
 
 
+class LemmaCache:
+    def __init__(self, lemmatizer, max_size=200000):
+        """Bounded cache of lemmas by word and wordnet part of speech
+
+        The least recently used lemma is evicted when the cache is full.
+
+        Parameters
+        ----------
+        lemmatizer : WordNetLemmatizer
+        max_size : int
+            maximum number of cached lemmas
+        """
+        self.lemmatizer = lemmatizer
+        self.max_size = max_size
+        self.lemmas = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lemmatize(self, word, pos):
+        key = (word, pos)
+        lemma = self.lemmas.get(key)
+        if lemma is not None:
+            self.lemmas.move_to_end(key)
+            self.hits += 1
+            return lemma
+        self.misses += 1
+        lemma = self.lemmatizer.lemmatize(word=word, pos=pos)
+        self.lemmas[key] = lemma
+        if len(self.lemmas) > self.max_size:
+            self.lemmas.popitem(last=False)
+        return lemma
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups > 0 else 0.0
+
+    def load(self, file_path):
+        """Warm-starts the cache with the lemmas of a cache file, a missing file is ignored
+
+        Parameters
+        ----------
+        file_path : str
+
+        Returns
+        -------
+
+        """
+        if not os.path.exists(file_path):
+            return
+        with open(file_path, 'rb') as fp:
+            lemmas = pickle.load(fp)
+        for key, lemma in lemmas:
+            self.lemmas[key] = lemma
+            # lemmas of the file are more recent than cached lemmas of the same word
+            self.lemmas.move_to_end(key)
+        while len(self.lemmas) > self.max_size:
+            self.lemmas.popitem(last=False)
+
+    def save(self, file_path):
+        """Writes the cached lemmas to a cache file, replacing the previous file atomically
+
+        Parameters
+        ----------
+        file_path : str
+
+        Returns
+        -------
+
+        """
+        tmp_path = file_path + '.' + str(os.getpid()) + '.tmp'
+        with open(tmp_path, 'wb') as fp:
+            # least recently used first, so that loading keeps the recency order
+            pickle.dump(list(self.lemmas.items()), fp, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, file_path)
+
+
+# lemma cache files of the worker processes: the lemma cache file followed by this suffix and the process id
+WORKER_LEMMA_CACHE_SUFFIX = '.worker.'
+
+
+def merge_worker_lemma_caches(lemma_cache_path):
+    """Merges the lemma caches written by the exited worker processes into the lemma cache file
+
+    The lemmas of the workers are more recent than the lemmas of the lemma cache file, so they are kept
+    if the merged cache is full. The files of the workers are removed.
+
+    Parameters
+    ----------
+    lemma_cache_path : str
+        file of the lemma cache, see init_worker_nlp
+
+    Returns
+    -------
+
+    """
+    directory, file_name = os.path.split(os.path.abspath(lemma_cache_path))
+    worker_paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                          if name.startswith(file_name + WORKER_LEMMA_CACHE_SUFFIX) and not name.endswith('.tmp'))
+    if len(worker_paths) == 0:
+        return
+    lemma_cache = LemmaCache(None)
+    lemma_cache.load(lemma_cache_path)
+    for worker_path in worker_paths:
+        lemma_cache.load(worker_path)
+    lemma_cache.save(lemma_cache_path)
+    for worker_path in worker_paths:
+        os.remove(worker_path)
+
+
+# tokenizers of the preprocessing: nltk (Punkt and Treebank) or the faster RegexTokenizer
+TOKENIZER_NLTK = 'nltk'
+TOKENIZER_REGEX = 'regex'
+TOKENIZERS = (TOKENIZER_NLTK, TOKENIZER_REGEX)
+
+
+class RegexTokenizer:
+    """Approximation of the nltk sentence and word tokenizers by compiled regular expressions
+
+    Sentences end at '.', '!' or '?' followed by white space and an upper case letter, a digit or an
+    opening bracket or quote, unless the period belongs to a known abbreviation. Words are split like the
+    Treebank tokenizer does: clitics ("n't", "'s", ...) are separated, periods are only split off at
+    the end of a sentence, numbers with separators and hyphenated words are kept and double quotes are
+    replaced by `` and ''. The agreement with nltk is measured by benchmarks/bench_tokenizer.py.
+    """
+
+    # abbreviations of the english Punkt model frequent in patents and articles
+    ABBREVIATIONS = {'al', 'approx', 'ca', 'cf', 'co', 'corp', 'dr', 'e.g', 'eq', 'eqs', 'etc', 'fig', 'figs',
+                     'i.e', 'inc', 'jr', 'ltd', 'mr', 'mrs', 'ms', 'no', 'nos', 'pat', 'prof', 'ref', 'sr', 'st',
+                     'u.s', 'vol', 'vs'}
+
+    SENTENCE_END = re.compile(r'[.!?]["\')\]]*\s+(?=["\'(\[]*[A-Z0-9])')
+
+    WORD = re.compile(r"""
+        (?:[^\W\d_]\.){2,}(?!["')\]}>]*\s*$)         # abbreviation inside of a sentence, e.g. u.s.
+      | (?:[^\W\d_]\.)+[^\W\d_](?=\.["')\]}>]*\s*$)  # abbreviation at the end of a sentence
+      | (?i:can)(?=(?i:not)\b)
+      | \w+(?=(?i:n't)\b)
+      | (?i:n't)\b
+      | '(?i:s|m|d|ll|re|ve)\b
+      | \d+(?:[.,]\d+)+                                 # numbers, e.g. 5,123,456 and 3.5
+      | \w+(?:-\w+|'(?!(?i:s|m|d|ll|re|ve)\b)\w+)*     # words, hyphenated words and names like o'neill
+        (?:\.(?![.\])}>"']|\s*$))?                      # with the period of an abbreviation
+      | \.\.\.|--|``|''
+      | \S
+    """, re.VERBOSE)
+
+    OPENING_QUOTE = re.compile(r'^"|(?<=[\s(\[{<])"')
+
+    def sentences(self, text):
+        """Splits a text into sentences
+
+        Parameters
+        ----------
+        text : str
+
+        Returns
+        -------
+        sentences : list(str)
+        """
+        sentences = []
+        start = 0
+        for match in self.SENTENCE_END.finditer(text):
+            if text[match.start()] == '.':
+                preceding = text[start:match.start()].split()
+                if len(preceding) > 0 and preceding[-1].lower().lstrip('("\'[') in self.ABBREVIATIONS:
+                    continue
+            sentences.append(text[start:match.end()].strip())
+            start = match.end()
+        last = text[start:].strip()
+        if len(last) > 0:
+            sentences.append(last)
+        return sentences
+
+    def words(self, sentence):
+        """Splits a sentence into words
+
+        Parameters
+        ----------
+        sentence : str
+
+        Returns
+        -------
+        words : list(str)
+        """
+        if '"' in sentence:
+            sentence = self.OPENING_QUOTE.sub('``', sentence).replace('"', "''")
+        return self.WORD.findall(sentence)
+
+
 class NLP:
-    def __init__(self, nodes):
+    def __init__(self, nodes, lemma_cache_size=200000, tokenizer=TOKENIZER_NLTK):
+        if tokenizer == TOKENIZER_NLTK:
+            self.sent_tokenize = sent_tokenize
+            # sentences are already split, word_tokenize must not split them again
+            self.word_tokenize = partial(word_tokenize, preserve_line=True)
+        elif tokenizer == TOKENIZER_REGEX:
+            regex_tokenizer = RegexTokenizer()
+            self.sent_tokenize = regex_tokenizer.sentences
+            self.word_tokenize = regex_tokenizer.words
+        else:
+            raise ValueError("unknown tokenizer '" + str(tokenizer) + "', supported: " + ', '.join(TOKENIZERS))
+        self.tokenizer = tokenizer
         self.mwe_tokenizer = MWETokenizer(self._build_mwe(nodes.nodelist))
         self.lemmatizer = WordNetLemmatizer()
         self.tagger = PerceptronTagger()
         self.stop_words = set(stopwords.words("english"))
+        # lemmas and wordnet parts of speech of frequent words are looked up instead of computed
+        self.lemma_cache = LemmaCache(self.lemmatizer, lemma_cache_size)
+        self.wordnet_pos_by_tag = {}
+        # words by the lemma the wordnet exception lists map them to, see inflected_forms
+        self.exception_forms = None
+        # documents without any synonym of a node are skipped before tokenization
+        self.raw_text_filter = RawTextFilter(nodes, self.inflected_forms)
 
     @staticmethod
     def _build_mwe(nodelist):
@@ -41,10 +257,22 @@ class NLP:
         # (separator = "_") to above list.
         for node in nodelist:
             for idx in range(len(node.synonyms)):
-                mwe = [word_tokenize(node.synonyms[idx].lower())]
-                multi_word_expressions.append(tuple(mwe[0]))
+                multi_word_expressions.append(tuple(synonym_words(node.synonyms[idx])))
         return multi_word_expressions
 
+    def analyze_section(self, text_input):
+        """Returns the analysis of a text section (e.g. title or abstract), see SectionAnalysis
+
+        Parameters
+        ----------
+        text_input : str
+
+        Returns
+        -------
+        analysis : SectionAnalysis
+        """
+        return SectionAnalysis(self, text_input)
+
     def tokenize_into_words(self, text_input):
         """Splits strings into list of words with regard to multi word expressions
         generated from nodelist.
@@ -57,7 +285,9 @@ class NLP:
         -------
         tokenized_string : list(str)
         """
-        tokenized_string = self.mwe_tokenizer.tokenize(word_tokenize(text_input.lower()))
+        sentences = self.sent_tokenize(text_input.lower())
+        tokens = [token for sentence in sentences for token in self.word_tokenize(sentence)]
+        tokenized_string = self.mwe_tokenizer.tokenize(tokens)
         return tokenized_string
 
     @staticmethod
@@ -106,6 +336,56 @@ class NLP:
         else:
             return wordnet.NOUN  # Alternatively: "" or None.
 
+    def wordnet_pos(self, treebank_tag):
+        """Cached version of get_wordnet_pos"""
+        wordnet_pos = self.wordnet_pos_by_tag.get(treebank_tag)
+        if wordnet_pos is None:
+            wordnet_pos = self.get_wordnet_pos(treebank_tag)
+            self.wordnet_pos_by_tag[treebank_tag] = wordnet_pos
+        return wordnet_pos
+
+    def lemmatize(self, word, treebank_tag):
+        """Returns the lemma of a part of speech tagged word, looked up in the lemma cache
+
+        Parameters
+        ----------
+        word : str
+        treebank_tag : str
+
+        Returns
+        -------
+        lemma : str
+        """
+        return self.lemma_cache.lemmatize(word, self.wordnet_pos(treebank_tag))
+
+    def inflected_forms(self, lemma):
+        """Returns the words that the lemmatizer may map to the given lemma
+
+        The wordnet lemmatizer either looks up a word in the exception lists or applies one of the
+        morphological substitutions once, so the words are the lemma with a substitution reversed and the
+        exceptions of the lemma.
+
+        Parameters
+        ----------
+        lemma : str
+
+        Returns
+        -------
+        inflected_forms : set(str)
+        """
+        if self.exception_forms is None:
+            self.exception_forms = {}
+            for exceptions in wordnet._exception_map.values():
+                for form, lemmas in exceptions.items():
+                    for exception_lemma in lemmas:
+                        self.exception_forms.setdefault(exception_lemma, set()).add(form)
+        inflected_forms = set(self.exception_forms.get(lemma, ()))
+        for substitutions in wordnet.MORPHOLOGICAL_SUBSTITUTIONS.values():
+            for old, new in substitutions:
+                if lemma.endswith(new):
+                    inflected_forms.add(lemma[:len(lemma) - len(new)] + old)
+        return inflected_forms
+
     def pos_tag_words(self, text_input):
         """Assigns part of speech tags to tokenized words.
 
@@ -118,13 +398,7 @@ class NLP:
         pos_tagged_words : list(str)
         """
 
-        sentences = sent_tokenize(text_input)
-        pos_tagged_words = []
-        for sentence in sentences:
-            sentence_pos = self.tagger.tag(self.mwe_tokenizer.tokenize(word_tokenize(sentence)))
-            for t in sentence_pos:
-                pos_tagged_words.append(t)
-        return pos_tagged_words
+        return self.analyze_section(text_input).pos_tagged_words()
 
     def lemmatize_words(self, text_input):
         """Identifies the lemma of each word based on specified lemmatizer
@@ -139,13 +413,7 @@ class NLP:
         lemmatized_words : list(str)
         """
 
-        lemmatized_words = []
-        for w in self.pos_tag_words(text_input):
-            if w[0] not in string.punctuation:
-                lemmatized_word = self.lemmatizer.lemmatize(word=w[0],
-                                                            pos=self.get_wordnet_pos(w[1]))
-                lemmatized_words.append(lemmatized_word.lower())
-        return lemmatized_words
+        return self.analyze_section(text_input).lemmatized_words()
 
     def list_based_stopword_removal(self, text_input):
         """Removes stopwords based on specified stopword list.
@@ -183,3 +451,322 @@ class NLP:
             if word[0] not in self.stop_words:
                 filtered_words.append(word)
         return filtered_words
+
+
+class SectionAnalysis:
+    def __init__(self, nlp, text_input):
+        """Analysis of a text section: sentence split, word tokenization, multi word expressions,
+        part of speech tags and lemmas.
+
+        Every step runs at most once per section and only when its result is requested, so the node
+        filter and all preprocessing modes share the intermediate results.
+
+        Parameters
+        ----------
+        nlp : NLP
+        text_input : str
+        """
+        self.nlp = nlp
+        self.text = text_input
+        self._sentences = None
+        self._sentence_tokens = None
+        self._tagged_sentences = None
+        self._lemmatized_sentences = None
+        self._words = None
+
+    def sentences(self):
+        """Returns the sentences of the section
+
+        Returns
+        -------
+        sentences : list(str)
+        """
+        if self._sentences is None:
+            self._sentences = self.nlp.sent_tokenize(self.text)
+        return self._sentences
+
+    def sentence_tokens(self):
+        """Returns the word tokens of every sentence
+
+        Returns
+        -------
+        sentence_tokens : list(list(str))
+        """
+        if self._sentence_tokens is None:
+            self._sentence_tokens = [self.nlp.word_tokenize(sentence) for sentence in self.sentences()]
+        return self._sentence_tokens
+
+    def words(self):
+        """Returns the lower case words of the section with multi word expressions of the nodes joined,
+        as used to filter by node
+
+        Returns
+        -------
+        words : list(str)
+        """
+        if self._words is None:
+            tokens = [token.lower() for sentence in self.sentence_tokens() for token in sentence]
+            self._words = self.nlp.mwe_tokenizer.tokenize(tokens)
+        return self._words
+
+    def tagged_sentences(self):
+        """Returns the part of speech tagged words of every sentence
+
+        Returns
+        -------
+        tagged_sentences : list(list((str, str)))
+        """
+        if self._tagged_sentences is None:
+            self._tagged_sentences = [self.nlp.tagger.tag(self.nlp.mwe_tokenizer.tokenize(tokens))
+                                      for tokens in self.sentence_tokens()]
+        return self._tagged_sentences
+
+    def pos_tagged_words(self):
+        """Returns the part of speech tagged words of the section
+
+        Returns
+        -------
+        pos_tagged_words : list((str, str))
+        """
+        return [tagged_word for sentence in self.tagged_sentences() for tagged_word in sentence]
+
+    def lemmatized_sentences(self):
+        """Returns the lower case lemmas of every sentence, punctuation is removed
+
+        Returns
+        -------
+        lemmatized_sentences : list(list(str))
+        """
+        if self._lemmatized_sentences is None:
+            lemmatize = self.nlp.lemmatize
+            self._lemmatized_sentences = []
+            for sentence in self.tagged_sentences():
+                lemmatized_sentence = []
+                for word, tag in sentence:
+                    if word not in string.punctuation:
+                        lemmatized_sentence.append(lemmatize(word, tag).lower())
+                self._lemmatized_sentences.append(lemmatized_sentence)
+        return self._lemmatized_sentences
+
+    def lemmatized_words(self):
+        """Returns the lower case lemmas of the section, punctuation is removed
+
+        Returns
+        -------
+        lemmatized_words : list(str)
+        """
+        return [lemma for sentence in self.lemmatized_sentences() for lemma in sentence]
+
+
+# assets are sent to the parent process in batches of this size
+ASSET_BATCH_SIZE = 200
+# maximum number of asset batches waiting for the parent process, workers block when it is reached
+ASSET_QUEUE_SIZE = 16
+
+# nodes, NLP resources and asset queue of a preprocessing worker process, see init_worker_nlp
+_worker_nodes = None
+_worker_nlp = None
+_worker_asset_queue = None
+
+
+class AssetStream:
+    def __init__(self, asset_queue, file_path, batch_size=ASSET_BATCH_SIZE):
+        """Sends the assets of a preprocessed file in batches to the parent process
+
+        Parameters
+        ----------
+        asset_queue : multiprocessing.Queue
+        file_path : str
+            file the assets are extracted from
+        batch_size : int
+        """
+        self.asset_queue = asset_queue
+        self.file_path = file_path
+        self.batch_size = batch_size
+        self.batch = []
+        self.count = 0
+
+    def append(self, asset):
+        self.batch.append(asset)
+        self.count = self.count + 1
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if len(self.batch) > 0:
+            self.asset_queue.put(('assets', self.batch))
+            self.batch = []
+
+    def close(self):
+        """Sends the remaining assets and tells the parent process that the file is finished"""
+        self.flush()
+        self.asset_queue.put(('done', self.file_path, self.count))
+
+
+def init_worker_nlp(nodes, lemma_cache_path=None, asset_queue=None, tokenizer=TOKENIZER_NLTK):
+    """Initializer of preprocessing worker processes
+
+    Loads the part of speech tagger, the lemmatizer, the stopwords and the multi word expressions of the
+    nodes once per process. They are reused for all files preprocessed by the process, so jobs only have
+    to carry a file path and options.
+
+    Parameters
+    ----------
+    nodes : Nodes
+        nodes that have to be analyzed
+    lemma_cache_path : str
+        if given, the lemma cache is warm-started from this file. Every worker writes its lemma cache to a
+        file of its own when it exits, they are merged into this file by merge_worker_lemma_caches.
+    asset_queue : multiprocessing.Queue
+        queue of the asset batches sent to the parent process, see open_asset_stream
+    tokenizer : str
+        tokenizer of the NLP resources, see TOKENIZERS
+
+    Returns
+    -------
+
+    """
+    global _worker_nodes, _worker_nlp, _worker_asset_queue
+    start = timeit.default_timer()
+    _worker_nodes = nodes
+    _worker_asset_queue = asset_queue
+    _worker_nlp = NLP(nodes, tokenizer=tokenizer)
+    # wordnet is loaded lazily by the first lemmatization
+    _worker_nlp.lemmatizer.lemmatize('networks')
+    if lemma_cache_path is not None:
+        _worker_nlp.lemma_cache.load(lemma_cache_path)
+        Finalize(None, _worker_nlp.lemma_cache.save,
+                 args=(lemma_cache_path + WORKER_LEMMA_CACHE_SUFFIX + str(os.getpid()),), exitpriority=10)
+    print('Worker ' + str(os.getpid()) + ': NLP resources loaded. Duration: '
+          + str(timeit.default_timer() - start))
+
+
+def get_worker_nlp():
+    """Returns the nodes and the NLP resources loaded by init_worker_nlp
+
+    Returns
+    -------
+    nodes : Nodes
+    nlp : NLP
+    """
+    if _worker_nlp is None:
+        raise RuntimeError('the process has not been initialized by init_worker_nlp')
+    return _worker_nodes, _worker_nlp
+
+
+def open_asset_stream(file_path):
+    """Returns the stream of the assets of a file to the parent process, see stream_assets_into_nodes
+
+    Parameters
+    ----------
+    file_path : str
+
+    Returns
+    -------
+    asset_stream : AssetStream
+    """
+    if _worker_asset_queue is None:
+        raise RuntimeError('the process has not been initialized with an asset queue by init_worker_nlp')
+    return AssetStream(_worker_asset_queue, file_path)
+
+
+def run_stream_job(stream_preprocessing, stream_processing_job):
+    """Runs a preprocessing job in a worker process, see stream_assets_into_nodes
+
+    A failed job sends an error message with its traceback through the asset queue, so the parent process
+    stops reading assets as soon as the job fails.
+
+    Parameters
+    ----------
+    stream_preprocessing : function
+    stream_processing_job : dict
+
+    Returns
+    -------
+    asset_count : int
+    """
+    try:
+        return stream_preprocessing(stream_processing_job)
+    except Exception:
+        _worker_asset_queue.put(('error', stream_processing_job.get('file_path'), traceback.format_exc()))
+        raise
+
+
+def stream_stop_words(preprocessing, remove_stopwords):
+    """Returns the stopwords that are removed from the word ids of the streamed assets by the parent process
+
+    The workers keep the stopwords of streamed assets, they are removed by Nodes.append_asset as a set of
+    word ids. The words of pos tagged assets are pairs of word and tag, so their stopwords are still
+    removed by the workers.
+
+    Parameters
+    ----------
+    preprocessing : str
+    remove_stopwords : str
+        stopword-list of the preprocessing, see NLP.list_based_stopword_removal
+
+    Returns
+    -------
+    stop_words : set(str)
+    """
+    if remove_stopwords == "Nltk-Stopwords" and preprocessing != "pos_tag":
+        return set(stopwords.words("english"))
+    return set()
+
+
+def stream_assets_into_nodes(pool, stream_preprocessing, stream_processing_jobs, asset_queue, nodes, stop_words=()):
+    """Runs preprocessing jobs in a pool and writes the assets into the nodes as the workers send them
+
+    The workers send their assets in batches through the bounded asset queue, so neither the workers nor
+    the parent process hold the assets of a whole file, and the NLP of the workers overlaps with the
+    writing of the assets. The assets are committed when all jobs are finished, see Nodes.close. If a job
+    fails, the pool is terminated, the assets written since the last commit are discarded and a RuntimeError
+    with the traceback of the worker is raised.
+
+    Parameters
+    ----------
+    pool : multiprocessing.Pool
+        pool initialized by init_worker_nlp with the asset queue
+    stream_preprocessing : function
+        preprocesses a job and sends its assets through an AssetStream
+    stream_processing_jobs : list(dict)
+    asset_queue : multiprocessing.Queue
+    nodes : Nodes
+    stop_words : iterable(str)
+        words removed from the word ids of the assets when they are written, see Nodes.set_stop_words
+
+    Returns
+    -------
+    asset_count : int
+    """
+    nodes.set_stop_words(stop_words)
+    result = pool.map_async(partial(run_stream_job, stream_preprocessing), stream_processing_jobs, chunksize=1)
+    finished_jobs = 0
+    asset_count = 0
+    try:
+        while finished_jobs < len(stream_processing_jobs):
+            try:
+                message = asset_queue.get(timeout=1)
+            except queue.Empty:
+                # a worker process that died without an error message does not finish its asset stream
+                if result.ready() and not result.successful():
+                    result.get()
+                continue
+            if message[0] == 'assets':
+                nodes.enrich_with_assets(message[1])
+                asset_count = asset_count + len(message[1])
+            elif message[0] == 'error':
+                raise RuntimeError('preprocessing of ' + str(message[1]) + ' failed:\n' + message[2])
+            else:
+                finished_jobs = finished_jobs + 1
+                print("Imported " + str(message[2]) + " assets of " + message[1] + " into nodes")
+        result.get()
+    except BaseException:
+        # the assets of the unfinished jobs are not committed
+        pool.terminate()
+        nodes.discard_assets()
+        raise
+    finally:
+        nodes.set_stop_words(())
+    nodes.close()
+    return asset_count
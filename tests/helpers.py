@@ -0,0 +1,21 @@
+"""Helpers shared by the tests of the assets and nodes.
+
+"""
+
+# standard library imports
+# None
+
+# related third party imports
+# None
+
+# local application/library specific imports
+from assets import Asset
+
+
+class WordAsset(Asset):
+    def __init__(self, year, words):
+        Asset.__init__(self, year)
+        self.words = words
+
+    def words_to_analyze(self):
+        return self.words
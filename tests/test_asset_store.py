@@ -0,0 +1,245 @@
+"""Tests of the asset store of the nodes.
+
+"""
+
+# standard library imports
+import collections
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+# related third party imports
+# None
+
+# local application/library specific imports
+from nodes import Node, Nodes
+from tests.helpers import WordAsset
+
+
+class AssetStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def new_nodes(self):
+        nodes = Nodes(self.tmp.name + '/')
+        nodes.add_node(Node('Alpha', '"alpha"'))
+        nodes.add_node(Node('Beta', '"beta"'))
+        return nodes
+
+    def reopened_nodes(self):
+        nodes = self.new_nodes()
+        with contextlib.redirect_stdout(io.StringIO()):
+            nodes.read_assets()
+        return nodes
+
+    @staticmethod
+    def append(nodes, year, words):
+        asset = WordAsset(year, words)
+        asset.find_nodes(nodes)
+        with contextlib.redirect_stdout(io.StringIO()):
+            nodes.enrich_with_assets([asset])
+
+    @staticmethod
+    def words(node, year, *slice_arguments):
+        return [asset.words_to_analyze() for asset in node.get_assets(year, *slice_arguments)]
+
+
+class TestRoundTrip(AssetStoreTestCase):
+    def test_append_commit_reopen(self):
+        with self.new_nodes() as nodes:
+            self.append(nodes, 2000, ['alpha', 'one'])
+            self.append(nodes, 2001, ['alpha', 'beta', 'two'])
+            self.append(nodes, 2000, ['beta', 'three'])
+            self.append(nodes, 2000, ['none'])
+        nodes = self.reopened_nodes()
+        alpha, beta = nodes.nodes['Alpha'], nodes.nodes['Beta']
+        self.assertEqual(alpha.asset_count, {2000: 1, 2001: 1})
+        self.assertEqual(beta.asset_count, {2000: 1, 2001: 1})
+        self.assertEqual(self.words(alpha, 2000), [['alpha', 'one']])
+        self.assertEqual(self.words(beta, 2000), [['beta', 'three']])
+        self.assertEqual(self.words(alpha, 2001), self.words(beta, 2001))
+        self.assertEqual(list(beta.get_words(2001)), ['alpha', 'beta', 'two'])
+        self.assertEqual(list(nodes.get_years()), [2000, 2001])
+
+    def test_assets_matching_several_nodes_are_stored_once(self):
+        with self.new_nodes() as nodes:
+            self.append(nodes, 2000, ['alpha', 'beta'])
+        self.assertEqual(nodes.nodes['Alpha'].postings, nodes.nodes['Beta'].postings)
+        self.assertEqual(len(nodes.asset_store.read_manifest()['segments']), 1)
+
+    def test_assets_can_be_read_before_the_commit(self):
+        nodes = self.new_nodes()
+        nodes.remove_assets()
+        self.append(nodes, 2000, ['alpha', 'one'])
+        self.assertEqual(self.words(nodes.nodes['Alpha'], 2000), [['alpha', 'one']])
+
+
+class TestCrashRecovery(AssetStoreTestCase):
+    def test_assets_after_the_last_commit_are_truncated(self):
+        with self.new_nodes() as nodes:
+            self.append(nodes, 2000, ['alpha', 'one'])
+        committed = nodes.asset_store.read_manifest()
+        # a crash after the assets and the vocabulary were written but before the commit
+        self.append(nodes, 2000, ['alpha', 'lost'])
+        self.append(nodes, 2001, ['beta', 'lost'])
+        nodes.asset_writer.sync()
+        nodes.vocabulary.flush()
+        segment_path = nodes.asset_store.segment_path(2000)
+        self.assertGreater(os.path.getsize(segment_path), committed['segments'][2000]['size'])
+
+        nodes = self.reopened_nodes()
+        self.assertEqual(self.words(nodes.nodes['Alpha'], 2000), [['alpha', 'one']])
+        self.assertEqual(nodes.nodes['Beta'].asset_count, {})
+        self.assertEqual(len(nodes.vocabulary), 2)
+        with nodes:
+            self.append(nodes, 2000, ['alpha', 'two'])
+        self.assertEqual(os.path.getsize(segment_path), nodes.asset_store.read_manifest()['segments'][2000]['size'])
+        nodes = self.reopened_nodes()
+        self.assertEqual(self.words(nodes.nodes['Alpha'], 2000), [['alpha', 'one'], ['alpha', 'two']])
+
+
+class TestVerifyChecksums(AssetStoreTestCase):
+    def setUp(self):
+        AssetStoreTestCase.setUp(self)
+        with self.new_nodes() as nodes:
+            for number in range(20):
+                self.append(nodes, 2000, ['alpha', 'word%d' % number])
+        self.segment_path = nodes.asset_store.segment_path(2000)
+
+    def test_intact_store(self):
+        nodes = self.new_nodes()
+        with contextlib.redirect_stdout(io.StringIO()):
+            nodes.read_assets(verify_checksums=True)
+        self.assertEqual(nodes.nodes['Alpha'].asset_count, {2000: 20})
+
+    def test_changed_segment(self):
+        with open(self.segment_path, 'r+b') as fp:
+            fp.seek(os.path.getsize(self.segment_path) // 2)
+            fp.write(b'xx')
+        nodes = self.new_nodes()
+        # only the checksums detect a change of the content
+        with contextlib.redirect_stdout(io.StringIO()):
+            nodes.read_assets()
+        self.assertRaises(RuntimeError, nodes.read_assets, True)
+
+    def test_truncated_segment(self):
+        os.truncate(self.segment_path, 10)
+        self.assertRaises(RuntimeError, self.new_nodes().read_assets)
+
+
+class TestGetAssetsSlices(AssetStoreTestCase):
+    def test_slices(self):
+        with self.new_nodes() as nodes:
+            for number in range(30):
+                self.append(nodes, 2000, ['alpha', 'word%d' % number])
+        alpha = self.reopened_nodes().nodes['Alpha']
+        assets = self.words(alpha, 2000)
+        self.assertEqual(len(assets), 30)
+        for slice_arguments in ((None, None, 3), (5, 12, None), (-4, None, None), (20, 5, -5), (7, 8, None),
+                                (40, None, None)):
+            self.assertEqual(self.words(alpha, 2000, *slice_arguments), assets[slice(*slice_arguments)])
+        self.assertEqual(self.words(alpha, 1999, 0, 1), [])
+
+
+class TestCumulativeView(AssetStoreTestCase):
+    @staticmethod
+    def recount(node, year_cum):
+        counts = collections.Counter()
+        for year in node.asset_count:
+            if year <= year_cum:
+                for asset in node.get_assets(year):
+                    counts.update(asset.word_ids)
+        return counts
+
+    def check(self, nodes, years):
+        for node in nodes.nodelist:
+            for year_cum in years:
+                self.assertEqual(node.get_word_id_counts_cumulative(year_cum), self.recount(node, year_cum))
+                self.assertEqual([asset.words_to_analyze() for asset in node.get_assets_cumulative(year_cum)],
+                                 [asset.words_to_analyze() for year in node.asset_count if year <= year_cum
+                                  for asset in node.get_assets(year)])
+
+    def test_counts_match_a_recount_after_interleaved_appends(self):
+        nodes = self.new_nodes()
+        nodes.remove_assets()
+        years = range(2000, 2006)
+        for number in range(60):
+            words = ['alpha' if number % 2 == 0 else 'beta', 'word%d' % (number % 7), 'word%d' % (number % 3)]
+            self.append(nodes, 2000 + number * 7 % 6, words)
+            if number % 10 == 9:
+                self.check(nodes, years)
+        nodes.close()
+        self.check(self.reopened_nodes(), years)
+
+    def test_counts_with_descending_years_and_without_cache(self):
+        with self.new_nodes() as nodes:
+            for number in range(30):
+                self.append(nodes, 2000 + number % 5, ['alpha', 'beta', 'word%d' % number])
+        nodes = self.reopened_nodes()
+        nodes.cumulative_view.max_cached_word_ids = 0
+        self.check(nodes, [2004, 2001, 2003, 2000])
+        self.assertEqual(nodes.cumulative_view.assets_by_year, {})
+
+
+class TestReopenAndAppend(AssetStoreTestCase):
+    def test_append_without_reading_the_assets_keeps_the_committed_assets(self):
+        with self.new_nodes() as nodes:
+            self.append(nodes, 2000, ['alpha', 'one'])
+        with self.new_nodes() as nodes:
+            self.append(nodes, 2000, ['alpha', 'beta', 'three'])
+        nodes = self.reopened_nodes()
+        self.assertEqual(self.words(nodes.nodes['Alpha'], 2000), [['alpha', 'one'], ['alpha', 'beta', 'three']])
+        self.assertEqual(self.words(nodes.nodes['Beta'], 2000), [['alpha', 'beta', 'three']])
+        self.assertEqual(nodes.nodes['Alpha'].asset_count, {2000: 2})
+
+    def test_append_after_reading_the_assets(self):
+        with self.new_nodes() as nodes:
+            self.append(nodes, 2000, ['alpha', 'one'])
+        with self.reopened_nodes() as nodes:
+            self.append(nodes, 2001, ['alpha', 'two'])
+        nodes = self.reopened_nodes()
+        self.assertEqual(self.words(nodes.nodes['Alpha'], 2000) + self.words(nodes.nodes['Alpha'], 2001),
+                         [['alpha', 'one'], ['alpha', 'two']])
+
+    def test_failed_session_is_discarded(self):
+        with self.new_nodes() as nodes:
+            self.append(nodes, 2000, ['alpha', 'one'])
+        with self.assertRaises(ValueError):
+            with self.reopened_nodes() as nodes:
+                self.append(nodes, 2000, ['alpha', 'lost'])
+                raise ValueError()
+        # the next append of the same nodes restores the committed assets first
+        self.append(nodes, 2000, ['alpha', 'two'])
+        nodes.close()
+        nodes = self.reopened_nodes()
+        self.assertEqual(self.words(nodes.nodes['Alpha'], 2000), [['alpha', 'one'], ['alpha', 'two']])
+
+
+class TestOutdatedStores(AssetStoreTestCase):
+    def write_file(self, name):
+        with open(self.tmp.name + '/perNode/' + name, 'wb') as fp:
+            fp.write(b'assets')
+
+    def test_per_node_asset_files_are_rejected(self):
+        nodes = self.new_nodes()
+        self.write_file('AssetWords_Alpha_2000')
+        self.assertRaises(RuntimeError, nodes.read_assets)
+        self.assertRaises(RuntimeError, self.append, nodes, 2000, ['alpha'])
+
+    def test_segments_without_manifest_are_rejected(self):
+        nodes = self.new_nodes()
+        self.write_file('Assets_2000')
+        self.assertRaises(RuntimeError, nodes.read_assets)
+
+    def test_empty_store_is_read(self):
+        nodes = self.reopened_nodes()
+        self.assertEqual(nodes.nodes['Alpha'].asset_count, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""Tests of the manifest of decoded patent bulks.
+
+"""
+
+# standard library imports
+import os
+import tempfile
+import unittest
+
+# related third party imports
+# None
+
+# local application/library specific imports
+from patent_parser.bulk_manifest import BulkManifest, STATUS_OK
+
+
+def touch(file_path):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'wb') as fp:
+        fp.write(b'x')
+
+
+class TestBulkManifestRecord(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.folder_out = self.tmp.name
+        self.signature = {'size': 1, 'mtime': 1.0}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def record(self, manifest, outputs):
+        for path in outputs:
+            touch(path)
+        manifest.record('bulk.zip', self.signature, 'v1',
+                        {'file_out': os.path.join(self.folder_out, 'bulk'), 'outputs': outputs,
+                         'status': STATUS_OK})
+
+    def test_switch_from_records_to_columnar_removes_record_file(self):
+        manifest = BulkManifest(self.folder_out)
+        record_file = os.path.join(self.folder_out, 'bulk')
+        self.record(manifest, [record_file])
+        partitions = [os.path.join(self.folder_out, year, 'bulk.cols') for year in ('1975', '1976')]
+        self.record(manifest, partitions)
+        self.assertFalse(os.path.exists(record_file))
+        self.assertTrue(all(os.path.exists(path) for path in partitions))
+        self.assertEqual(manifest.entries['bulk.zip']['outputs'], partitions)
+
+    def test_new_date_range_removes_stale_partitions(self):
+        manifest = BulkManifest(self.folder_out)
+        old_partition, kept_partition = [os.path.join(self.folder_out, year, 'bulk.cols') for year in ('1975', '1976')]
+        self.record(manifest, [old_partition, kept_partition])
+        self.record(manifest, [kept_partition])
+        self.assertFalse(os.path.exists(old_partition))
+        self.assertTrue(os.path.exists(kept_partition))
+
+    def test_entry_without_outputs_removes_file_out(self):
+        manifest = BulkManifest(self.folder_out)
+        record_file = os.path.join(self.folder_out, 'bulk')
+        touch(record_file)
+        # entries written before columnar outputs existed only record file_out
+        manifest.entries['bulk.zip'] = {'file_out': record_file}
+        partition = os.path.join(self.folder_out, '1976', 'bulk.cols')
+        self.record(manifest, [partition])
+        self.assertFalse(os.path.exists(record_file))
+        self.assertTrue(os.path.exists(partition))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+"""Tests of the columnar patent store.
+
+"""
+
+# standard library imports
+import datetime
+import os
+import tempfile
+import unittest
+
+# related third party imports
+# None
+
+# local application/library specific imports
+from patent_parser.columnar_store import ColumnarPatentWriter, read_columnar_patents
+
+
+class TestColumnarPatentWriter(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file_out = os.path.join(self.tmp.name, 'bulk')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_patents_are_partitioned_by_year(self):
+        writer = ColumnarPatentWriter(self.file_out, batch_rows=2, use_arrow=False)
+        for number, year in enumerate((1975, 1976, 1975, 1975)):
+            writer.write({'publicationNumber': str(number), 'date': datetime.date(year, 1, 6), 'title': 'title'})
+        writer.close()
+        paths = writer.file_paths()
+        self.assertEqual([os.path.basename(os.path.dirname(path)) for path in paths], ['1975', '1976'])
+        self.assertEqual([patent['publicationNumber'] for patent in read_columnar_patents(paths[0])],
+                         ['0', '2', '3'])
+
+    def test_patents_without_date_are_skipped(self):
+        writer = ColumnarPatentWriter(self.file_out, use_arrow=False)
+        writer.write({'publicationNumber': '1', 'date': datetime.date(1976, 1, 6)})
+        writer.write({'publicationNumber': '2'})
+        writer.write({'publicationNumber': '3', 'date': None})
+        writer.close()
+        self.assertEqual(writer.records_written, 1)
+        self.assertEqual(writer.records_without_date, 2)
+        self.assertEqual([patent['publicationNumber'] for patent in read_columnar_patents(writer.file_paths()[0])],
+                         ['1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
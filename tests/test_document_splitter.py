@@ -0,0 +1,35 @@
+"""Tests of the splitting of bulk members into documents.
+
+"""
+
+# standard library imports
+import unittest
+
+# related third party imports
+# None
+
+# local application/library specific imports
+from patent_parser.document_splitter import split_aps_records
+
+
+def aps_records(buffer):
+    return [buffer[start:end] for start, end in split_aps_records(buffer)]
+
+
+class TestSplitApsRecords(unittest.TestCase):
+    def test_records_start_at_patn_lines(self):
+        buffer = b'HHHHHT header\nPATN\nWKU  1\nPATN\r\nWKU  2\nPATN'
+        self.assertEqual(aps_records(buffer), [b'PATN\nWKU  1\n', b'PATN\r\nWKU  2\n', b'PATN'])
+
+    def test_trailing_whitespace_after_patn(self):
+        # APSHandler rstrips the lines, so these lines start records as well
+        buffer = b'PATN \nWKU  1\nPATN\t\r\nWKU  2\nPATN  '
+        self.assertEqual(aps_records(buffer), [b'PATN \nWKU  1\n', b'PATN\t\r\nWKU  2\n', b'PATN  '])
+
+    def test_patn_as_prefix_of_a_line(self):
+        buffer = b'PATN\nPATNX\nTTL  PATN\n'
+        self.assertEqual(aps_records(buffer), [buffer])
+
+
+if __name__ == '__main__':
+    unittest.main()
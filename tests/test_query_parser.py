@@ -0,0 +1,57 @@
+"""Tests of the parser of node queries.
+
+"""
+
+# standard library imports
+import contextlib
+import io
+import unittest
+
+# related third party imports
+# None
+
+# local application/library specific imports
+from nodes import Node, QueryParser, synonym_key
+
+
+def parse(query):
+    return QueryParser(query, synonym_key).parse()
+
+
+class TestQueryParser(unittest.TestCase):
+    def test_precedence(self):
+        # NOT binds stronger than AND, and AND binds stronger than OR
+        self.assertEqual(parse('"a" OR "b" AND NOT "c"'),
+                         ('or', [('synonym', 'a'), ('and', [('synonym', 'b'), ('not', ('synonym', 'c'))])]))
+        self.assertEqual(parse('("a" or "b") and "c"'),
+                         ('and', [('or', [('synonym', 'a'), ('synonym', 'b')]), ('synonym', 'c')]))
+
+    def test_not(self):
+        self.assertEqual(parse('NOT NOT "a"'), ('not', ('not', ('synonym', 'a'))))
+        node = Node('Cloud', '"cloud computing" AND NOT "quantum"')
+        self.assertTrue(node.matches({'cloud_computing'}))
+        self.assertFalse(node.matches({'cloud_computing', 'quantum'}))
+
+    def test_synonyms_are_tokenized(self):
+        self.assertEqual(parse('"Neural Network"'), ('synonym', 'neural_network'))
+
+    def test_errors(self):
+        for query in ('"a" AND', '("a" OR "b"', '"a" "b"', '"a" OR )', '', '"a" XOR "b"', '"a'):
+            with self.subTest(query=query):
+                self.assertRaises(ValueError, parse, query)
+
+    def test_code_injection_is_rejected(self):
+        for query in ('__import__("os").system("true")', '"a" or __import__("os")', '"a") or (1'):
+            with self.subTest(query=query):
+                self.assertRaises(ValueError, parse, query)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertRaises(ValueError, Node, 'Injection', '"a" OR True')
+
+    def test_quotes_in_synonyms_stay_constants(self):
+        node = Node('Quote', '"x\' in words or \'y"')
+        self.assertFalse(node.matches(set()))
+        self.assertTrue(node.matches({synonym_key("x' in words or 'y")}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""Tests of the regex tokenizer of the preprocessing.
+
+"""
+
+# standard library imports
+import unittest
+
+# related third party imports
+# None
+
+# local application/library specific imports
+from preprocessing_methods import RegexTokenizer
+
+
+class TestRegexTokenizerSentences(unittest.TestCase):
+    def setUp(self):
+        self.tokenizer = RegexTokenizer()
+
+    def test_sentence_ends(self):
+        self.assertEqual(self.tokenizer.sentences('A claim ends here. Another begins! Is it? (Yes) it is.'),
+                         ['A claim ends here.', 'Another begins!', 'Is it?', '(Yes) it is.'])
+
+    def test_abbreviations_do_not_end_sentences(self):
+        self.assertEqual(self.tokenizer.sentences('See Fig. 3 of Smith et al. in 2001. The device works.'),
+                         ['See Fig. 3 of Smith et al. in 2001.', 'The device works.'])
+
+    def test_lower_case_words_do_not_start_sentences(self):
+        self.assertEqual(self.tokenizer.sentences('The value is approx. five. it is small.'),
+                         ['The value is approx. five. it is small.'])
+
+
+class TestRegexTokenizerWords(unittest.TestCase):
+    def setUp(self):
+        self.tokenizer = RegexTokenizer()
+
+    def test_abbreviations(self):
+        self.assertEqual(self.tokenizer.words('The U.S. patent, e.g. this one, is cited.'),
+                         ['The', 'U.S.', 'patent', ',', 'e.g.', 'this', 'one', ',', 'is', 'cited', '.'])
+        self.assertEqual(self.tokenizer.words('See Fig. 3 of Smith et al. for details.'),
+                         ['See', 'Fig.', '3', 'of', 'Smith', 'et', 'al.', 'for', 'details', '.'])
+
+    def test_sentence_final_periods(self):
+        self.assertEqual(self.tokenizer.words('The device works.'), ['The', 'device', 'works', '.'])
+        # the period of an abbreviation at the end of a sentence is split off like by the Treebank tokenizer
+        self.assertEqual(self.tokenizer.words('Made in the U.S.'), ['Made', 'in', 'the', 'U.S', '.'])
+        self.assertEqual(self.tokenizer.words('It ends here...'), ['It', 'ends', 'here', '...'])
+
+    def test_clitics(self):
+        self.assertEqual(self.tokenizer.words("It isn't John's car and we can't stop; they'll go."),
+                         ['It', 'is', "n't", 'John', "'s", 'car', 'and', 'we', 'ca', "n't", 'stop', ';', 'they',
+                          "'ll", 'go', '.'])
+        self.assertEqual(self.tokenizer.words("We cannot meet O'Neill."), ['We', 'can', 'not', 'meet', "O'Neill", '.'])
+
+    def test_quotes_are_replaced(self):
+        self.assertEqual(self.tokenizer.words('He said "stop" now.'),
+                         ['He', 'said', '``', 'stop', "''", 'now', '.'])
+        self.assertEqual(self.tokenizer.words('"Stop" (he said "now").'),
+                         ['``', 'Stop', "''", '(', 'he', 'said', '``', 'now', "''", ')', '.'])
+
+    def test_numbers_and_hyphenated_words(self):
+        self.assertEqual(self.tokenizer.words('The state-of-the-art value is 3.5 and 5,123,456 units.'),
+                         ['The', 'state-of-the-art', 'value', 'is', '3.5', 'and', '5,123,456', 'units', '.'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""Tests of the vocabulary of the asset words.
+
+"""
+
+# standard library imports
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+# related third party imports
+# None
+
+# local application/library specific imports
+from assets import Vocabulary
+from nodes import Node, Nodes
+from tests.helpers import WordAsset
+
+
+class TestVocabulary(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp.name, 'vocabulary')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_ids_survive_flush_and_load(self):
+        vocabulary = Vocabulary(self.file_path)
+        ids = vocabulary.word_ids(['alpha', 'one', 'alpha'])
+        vocabulary.flush()
+        ids.extend(vocabulary.word_ids(['beta']))
+        vocabulary.flush()
+        loaded = Vocabulary(self.file_path)
+        loaded.load()
+        self.assertEqual(loaded.words_of(ids), ['alpha', 'one', 'alpha', 'beta'])
+
+    def test_flush_without_loading_the_file_fails(self):
+        vocabulary = Vocabulary(self.file_path)
+        vocabulary.word_ids(['alpha', 'one'])
+        vocabulary.flush()
+        fresh = Vocabulary(self.file_path)
+        fresh.word_ids(['beta'])
+        self.assertRaises(RuntimeError, fresh.flush)
+
+    def test_load_truncates_uncommitted_words(self):
+        vocabulary = Vocabulary(self.file_path)
+        vocabulary.word_ids(['alpha'])
+        vocabulary.flush()
+        committed_size = vocabulary.file_size()
+        vocabulary.word_ids(['beta'])
+        vocabulary.flush()
+        loaded = Vocabulary(self.file_path)
+        loaded.load(committed_size)
+        self.assertEqual(loaded.words, ['alpha'])
+        self.assertTrue(loaded.is_synchronized())
+
+
+class TestNodesVocabulary(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def new_nodes(self):
+        nodes = Nodes(self.tmp.name + '/')
+        nodes.add_node(Node('Alpha', '"alpha" OR "beta"'))
+        return nodes
+
+    def append(self, nodes, year, words):
+        asset = WordAsset(year, words)
+        asset.find_nodes(nodes)
+        nodes.enrich_with_assets([asset])
+
+    def test_appending_to_an_existing_store_continues_its_ids(self):
+        with self.new_nodes() as nodes:
+            self.append(nodes, 2000, ['alpha', 'one'])
+        # a new session appends without reading the assets first
+        with self.new_nodes() as nodes:
+            self.append(nodes, 2000, ['beta', 'three'])
+        nodes = self.new_nodes()
+        with contextlib.redirect_stdout(io.StringIO()):
+            nodes.read_assets()
+        words = [asset.words_to_analyze() for asset in nodes.nodes['Alpha'].get_assets(2000)]
+        self.assertIn(['beta', 'three'], words)
+
+    def test_node_lookup_by_ids_matches_the_lookup_by_words(self):
+        nodes = self.new_nodes()
+        nodes.add_node(Node('Gamma', '"gamma" AND NOT "beta"'))
+        for words in (['alpha', 'gamma'], ['gamma', 'beta'], ['gamma'], ['one']):
+            word_ids = nodes.vocabulary.word_ids(words)
+            self.assertEqual(nodes.find_node_names_by_ids(word_ids), nodes.find_node_names(words))
+
+    def test_stop_words_are_removed_from_the_word_ids(self):
+        nodes = self.new_nodes()
+        nodes.add_node(Node('The', '"the"'))
+        nodes.remove_assets()
+        nodes.set_stop_words(['the', 'of'])
+        self.append(nodes, 2000, ['the', 'alpha', 'of', 'one'])
+        # the asset matches only by a stop word
+        self.append(nodes, 2000, ['the', 'two'])
+        words = [asset.words_to_analyze() for asset in nodes.nodes['Alpha'].get_assets(2000)]
+        self.assertEqual(words, [['alpha', 'one']])
+        self.assertEqual(nodes.nodes['The'].asset_count, {})
+
+
+if __name__ == '__main__':
+    unittest.main()